@@ -4,11 +4,16 @@ Endpoints específicos para Alexa Skill - retornam texto formatado para fala
 import os
 from dotenv import load_dotenv
 import json
-import requests
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
 from google import genai
+from shared_cache import shared_cache, shared_cached
+from profiling import timed
+from materias import lookup_materia
+from records import AgendaItem
+from supabase_rest import is_configured, supabase_get, supabase_stream
+from tenants import current_tenant
 
 # Carrega variáveis do arquivo .env (apenas em desenvolvimento local)
 # Em produção (Render, Railway, etc), as variáveis vêm do ambiente
@@ -24,6 +29,10 @@ SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY") or os.environ.get("LLM_API_KEY")  # Gemini API Key
 GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.0-flash-exp")  # Modelo padrão
+SUMMARY_CACHE_TTL = int(os.environ.get("SUMMARY_CACHE_TTL", "600"))  # Resumos gerados (segundos)
+SUPABASE_CACHE_TTL = int(os.environ.get("SUPABASE_CACHE_TTL", "120"))  # Consultas ao Supabase (segundos)
+FALLBACK_CACHE_TTL = int(os.environ.get("FALLBACK_CACHE_TTL", "60"))  # Textos sem LLM por falha ou orçamento
+DAY_SUMMARY_PREFIX = "resumo:dia"  # Resumos por data, reaproveitados pelos balanços semanais/mensais
 
 # Log de configuração (para debug)
 logger.info(f"Supabase URL configured: {bool(SUPABASE_URL)}")
@@ -41,55 +50,60 @@ if GEMINI_API_KEY:
         logger.error(f"Failed to initialize Gemini client: {e}")
         gemini_client = None
 
+
+def _has_sessions(result: Dict) -> bool:
+    """Só guarda em cache resumos que encontraram sessões"""
+    return bool(result.get("sessions_count"))
+
+
+def summary_ttl(llm_used: bool, ttl: int = SUMMARY_CACHE_TTL) -> int:
+    """
+    Validade de um texto gerado: se o Gemini está configurado mas não produziu o texto
+    (erro ou orçamento esgotado), o fallback expira logo para ser refeito com o LLM
+    """
+    return FALLBACK_CACHE_TTL if gemini_client and not llm_used else ttl
+
+
+def _summary_result_ttl(result: Dict) -> int:
+    return summary_ttl(result.get("gemini_used", False))
+
+
+@shared_cached("supabase:sessoes_hoje", SUPABASE_CACHE_TTL, cache_if=bool)
 def get_sessions_today() -> List[Dict]:
     """
     Busca sessões do dia atual do Supabase
     Retorna lista de sessões
     """
-    if not SUPABASE_URL or not SUPABASE_KEY:
+    if not is_configured():
         logger.error("Supabase credentials not configured")
         return []
     
     today = datetime.now().date()
-    url = f"{SUPABASE_URL}/rest/v1/sessions"
     
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    params = {
-        "opening_date": f"gte.{today.isoformat()}",
-        "opening_date": f"lt.{(today + timedelta(days=1)).isoformat()}",
-        "order": "opening_date.desc",
-        "limit": "10"
-    }
+    # Lista de tuplas: as duas condições de opening_date são enviadas
+    params = [
+        ("opening_date", f"gte.{today.isoformat()}"),
+        ("opening_date", f"lt.{(today + timedelta(days=1)).isoformat()}"),
+        ("order", "opening_date.desc"),
+        ("limit", "10")
+    ]
     
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        return supabase_get("sessions", params)
     except Exception as e:
         logger.error(f"Error fetching sessions: {e}")
         return []
 
 
+@shared_cached("supabase:sessoes_recentes", SUPABASE_CACHE_TTL, cache_if=bool)
 def get_recent_sessions(days: int = 1, limit: int = 5) -> List[Dict]:
     """
     Busca sessões recentes dos últimos N dias
     """
-    if not SUPABASE_URL or not SUPABASE_KEY:
+    if not is_configured():
         return []
     
     start_date = (datetime.now() - timedelta(days=days)).date()
-    url = f"{SUPABASE_URL}/rest/v1/sessions"
-    
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json"
-    }
     
     params = {
         "opening_date": f"gte.{start_date.isoformat()}",
@@ -98,9 +112,7 @@ def get_recent_sessions(days: int = 1, limit: int = 5) -> List[Dict]:
     }
     
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        return supabase_get("sessions", params)
     except Exception as e:
         logger.error(f"Error fetching recent sessions: {e}")
         return []
@@ -112,12 +124,12 @@ def format_text_for_alexa(sessions_data: str, prompt_type: str = "daily_summary"
     Cria um texto natural e conversacional a partir dos dados das sessões
     """
     if not sessions_data or sessions_data == "Nenhuma sessão encontrada.":
-        return "Não encontrei sessões recentes na Câmara Municipal de Campina Grande."
+        return f"Não encontrei sessões recentes na {current_tenant().name}."
     
     lines = sessions_data.split("\n")
     
     if prompt_type == "daily_summary":
-        intro = "Hoje na Câmara Municipal de Campina Grande, "
+        intro = f"Hoje na {current_tenant().name}, "
         if len(lines) == 1:
             return intro + lines[0].lower() + "."
         else:
@@ -130,15 +142,19 @@ def format_text_for_alexa(sessions_data: str, prompt_type: str = "daily_summary"
         return "Nas sessões recentes da Câmara Municipal: " + ". ".join([line.lower() for line in lines[:3]]) + "."
 
 
+@timed("format_sessions_for_llm")
 def format_sessions_for_llm(sessions: List[Dict]) -> str:
     """
     Formata dados das sessões em texto estruturado para o LLM processar
     Inclui informações da ordem do dia (ementas) quando disponível
+    Matérias identificadas (materia_id) usam o rótulo e a ementa encurtada do cache de
+    matérias, e uma matéria repetida no mesmo dia é citada só pelo rótulo
     """
     if not sessions:
         return "Nenhuma sessão encontrada."
     
     formatted = []
+    seen_materias = set()
     for session in sessions:
         date_str = session.get("opening_date", "")
         if date_str:
@@ -160,11 +176,18 @@ def format_sessions_for_llm(sessions: List[Dict]) -> str:
         if ordem_dia:
             session_text += f"\n\nPauta da sessão ({len(ordem_dia)} itens):"
             for i, item in enumerate(ordem_dia[:5], 1):  # Limita a 5 itens principais
-                ementa = item.get("ementa", "").strip()
-                content = item.get("content", "").strip()
-                resultado = item.get("result", "").strip()
+                # Itens podem ser AgendaItem ou dicts vindos do cache (com valores nulos)
+                ementa = (item.get("ementa") or "").strip()
+                content = (item.get("content") or "").strip()
+                resultado = (item.get("result") or "").strip()
+                materia = lookup_materia(item)
                 
-                if ementa:
+                if materia and materia["materia_id"] in seen_materias:
+                    item_text = f"\n{i}. {materia['rotulo']} (matéria já citada acima)"
+                elif materia:
+                    seen_materias.add(materia["materia_id"])
+                    item_text = f"\n{i}. {materia['rotulo']}: {materia['ementa_curta']}"
+                elif ementa:
                     item_text = f"\n{i}. {ementa}"
                 elif content:
                     item_text = f"\n{i}. {content}"
@@ -186,7 +209,8 @@ def format_sessions_for_llm(sessions: List[Dict]) -> str:
     return "\n\n---\n\n".join(formatted)
 
 
-def generate_news_report(sessions_data: str, prompt_type: str = "daily_summary") -> str:
+@timed("generate_news_report")
+def generate_news_report(sessions_data: str, prompt_type: str = "daily_summary") -> Tuple[str, bool]:
     """
     Usa Gemini para gerar um relatório em formato de notícia a partir dos dados das sessões
     Se não houver GEMINI_API_KEY, usa formatação simples
@@ -196,16 +220,22 @@ def generate_news_report(sessions_data: str, prompt_type: str = "daily_summary")
         prompt_type: Tipo de prompt ("daily_summary", "session_details", etc.)
     
     Returns:
-        Texto formatado para a Alexa falar
+        (texto formatado para a Alexa falar, True se o texto veio do Gemini)
     """
     # Se não tiver cliente Gemini, usa formatação simples
     if not gemini_client:
         logger.info("Gemini client not available, usando formatação simples")
-        return format_text_for_alexa(sessions_data, prompt_type)
+        return format_text_for_alexa(sessions_data, prompt_type), False
+    
+    # Orçamento de chamadas ao LLM por câmara
+    tenant = current_tenant()
+    if not tenant.llm_budget.try_acquire():
+        logger.warning(f"LLM budget exhausted for tenant {tenant.slug}, usando formatação simples")
+        return format_text_for_alexa(sessions_data, prompt_type), False
     
     prompts = {
         "daily_summary": """Você é um jornalista objetivo e imparcial especializado em cobertura política municipal. 
-Com base nos dados abaixo sobre sessões da Câmara Municipal de Campina Grande, 
+Com base nos dados abaixo sobre sessões da {camara}, 
 gere um resumo jornalístico em formato de notícia radiofônica, curto (máximo 150 palavras), 
 em português brasileiro.
 
@@ -223,7 +253,7 @@ Dados das sessões:
 Gere apenas o texto da notícia, sem títulos ou formatação.""",
         
         "single_day": """Você é um jornalista objetivo e imparcial especializado em cobertura política municipal.
-Com base nos dados abaixo sobre sessões da Câmara Municipal de Campina Grande realizadas em um dia específico,
+Com base nos dados abaixo sobre sessões da {camara} realizadas em um dia específico,
 gere um resumo jornalístico em formato de notícia radiofônica, curto (máximo 150 palavras), 
 em português brasileiro.
 
@@ -257,11 +287,45 @@ DIRETRIZES IMPORTANTES:
 Dados da sessão:
 {sessions_data}
 
-Gere apenas o texto explicativo."""
+Gere apenas o texto explicativo.""",
+
+        "weekly_digest": """Você é um jornalista objetivo e imparcial especializado em cobertura política municipal.
+Abaixo estão resumos diários das sessões da {camara} realizadas em uma semana.
+Com base apenas nesses resumos, gere um balanço da semana em formato de notícia radiofônica,
+curto (máximo 150 palavras), em português brasileiro.
+
+DIRETRIZES IMPORTANTES:
+- Seja objetivo e factual, sem adjetivos elogiosos ou valorativos
+- Agrupe os temas recorrentes em vez de repetir dia por dia
+- Mencione as principais matérias votadas e seus resultados
+- Use linguagem natural e conversacional, apropriada para ser ouvida
+- Não invente informações que não estejam nos resumos
+
+Resumos diários:
+{sessions_data}
+
+Gere apenas o texto da notícia para ser falado.""",
+
+        "monthly_digest": """Você é um jornalista objetivo e imparcial especializado em cobertura política municipal.
+Abaixo estão resumos diários das sessões da {camara} realizadas em um mês.
+Com base apenas nesses resumos, gere um balanço do mês em formato de notícia radiofônica,
+curto (máximo 200 palavras), em português brasileiro.
+
+DIRETRIZES IMPORTANTES:
+- Seja objetivo e factual, sem adjetivos elogiosos ou valorativos
+- Agrupe os temas por assunto, sem narrar dia por dia
+- Destaque as matérias aprovadas ou rejeitadas mais citadas
+- Use linguagem natural e conversacional, apropriada para ser ouvida
+- Não invente informações que não estejam nos resumos
+
+Resumos diários:
+{sessions_data}
+
+Gere apenas o texto da notícia para ser falado."""
     }
     
     prompt_template = prompts.get(prompt_type, prompts["daily_summary"])
-    prompt = prompt_template.format(sessions_data=sessions_data)
+    prompt = prompt_template.format(sessions_data=sessions_data, camara=tenant.name)
     
     try:
         # Usa biblioteca oficial do Google Generative AI
@@ -274,16 +338,17 @@ Gere apenas o texto explicativo."""
         
         if content:
             logger.info("Gemini gerou texto com sucesso")
-            return content.strip()
+            return content.strip(), True
         else:
             logger.warning("Gemini retornou conteúdo vazio, usando fallback")
-            return format_text_for_alexa(sessions_data, prompt_type)
+            return format_text_for_alexa(sessions_data, prompt_type), False
             
     except Exception as e:
         logger.error(f"Error calling Gemini API: {e}")
-        return format_text_for_alexa(sessions_data, prompt_type)  # Fallback
+        return format_text_for_alexa(sessions_data, prompt_type), False  # Fallback
 
 
+@shared_cached("resumo:hoje", _summary_result_ttl, cache_if=_has_sessions)
 def get_daily_summary() -> Dict[str, str]:
     """
     Endpoint principal: retorna resumo do dia formatado para Alexa
@@ -297,7 +362,7 @@ def get_daily_summary() -> Dict[str, str]:
     
     if not sessions:
         return {
-            "texto_alexa": "Não encontrei sessões recentes na Câmara Municipal de Campina Grande.",
+            "texto_alexa": f"Não encontrei sessões recentes na {current_tenant().name}.",
             "sessions_count": 0,
             "gemini_used": False
         }
@@ -306,61 +371,47 @@ def get_daily_summary() -> Dict[str, str]:
     sessions_text = format_sessions_for_llm(sessions)
     
     # Gera relatório (usa Gemini se disponível, senão formatação simples)
-    news_report = generate_news_report(sessions_text, "daily_summary")
+    news_report, llm_used = generate_news_report(sessions_text, "daily_summary")
     
     return {
         "texto_alexa": news_report,
         "sessions_count": len(sessions),
-        "gemini_used": bool(gemini_client)
+        "gemini_used": llm_used
     }
 
 
-def get_order_of_day(session_id: int) -> List[Dict]:
+def get_order_of_day(session_id: int) -> List[AgendaItem]:
     """
     Busca a ordem do dia (pauta) de uma sessão específica
+    Retorna registros compactos (AgendaItem), lidos incrementalmente
     """
-    if not SUPABASE_URL or not SUPABASE_KEY:
+    if not is_configured():
         return []
     
-    url = f"{SUPABASE_URL}/rest/v1/session_order_of_day"
-    
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     params = {
+        "select": AgendaItem.select(),
         "session_id": f"eq.{session_id}",
         "order": "order_number.asc",
         "limit": "100"
     }
     
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        return list(supabase_stream("session_order_of_day", params, AgendaItem))
     except Exception as e:
         logger.error(f"Error fetching order of day for session {session_id}: {e}")
         return []
 
 
+@timed("get_last_day_sessions")
+@shared_cached("supabase:ultimo_dia", SUPABASE_CACHE_TTL, cache_if=bool)
 def get_last_day_sessions() -> List[Dict]:
     """
     Busca todas as sessões do dia mais recente que tem registro
     E também busca a ordem do dia de cada sessão
     """
-    if not SUPABASE_URL or not SUPABASE_KEY:
+    if not is_configured():
         return []
     
-    url = f"{SUPABASE_URL}/rest/v1/sessions"
-    
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     # Busca a sessão mais recente primeiro
     params = {
         "order": "opening_date.desc",
@@ -368,9 +419,7 @@ def get_last_day_sessions() -> List[Dict]:
     }
     
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        latest = response.json()
+        latest = supabase_get("sessions", params)
         
         if not latest:
             return []
@@ -387,11 +436,12 @@ def get_last_day_sessions() -> List[Dict]:
         
         # Busca todas as sessões desse dia específico
         # Supabase precisa de parâmetros separados para range
-        url_with_filters = f"{url}?opening_date=gte.{target_date.isoformat()}&opening_date=lt.{next_date.isoformat()}&order=opening_date.desc&limit=20"
-        
-        response = requests.get(url_with_filters, headers=headers)
-        response.raise_for_status()
-        sessions = response.json()
+        sessions = supabase_get("sessions", [
+            ("opening_date", f"gte.{target_date.isoformat()}"),
+            ("opening_date", f"lt.{next_date.isoformat()}"),
+            ("order", "opening_date.desc"),
+            ("limit", "20")
+        ])
         
         # Para cada sessão, busca a ordem do dia
         for session in sessions:
@@ -407,6 +457,7 @@ def get_last_day_sessions() -> List[Dict]:
         return []
 
 
+@shared_cached("resumo:ultimo_dia", _summary_result_ttl, cache_if=_has_sessions)
 def get_single_day_summary() -> Dict[str, str]:
     """
     Retorna resumo apenas do último dia com sessões registradas
@@ -416,7 +467,7 @@ def get_single_day_summary() -> Dict[str, str]:
     
     if not sessions:
         return {
-            "texto_alexa": "Não encontrei sessões recentes na Câmara Municipal de Campina Grande.",
+            "texto_alexa": f"Não encontrei sessões recentes na {current_tenant().name}.",
             "sessions_count": 0,
             "gemini_used": False
         }
@@ -425,16 +476,24 @@ def get_single_day_summary() -> Dict[str, str]:
     sessions_text = format_sessions_for_llm(sessions)
     
     # Gera relatório com prompt específico para um único dia
-    news_report = generate_news_report(sessions_text, "single_day")
+    news_report, llm_used = generate_news_report(sessions_text, "single_day")
     
-    return {
+    result = {
         "texto_alexa": news_report,
         "sessions_count": len(sessions),
-        "gemini_used": bool(gemini_client),
+        "gemini_used": llm_used,
+        "pauta_completa": all(s.get("ordem_dia") for s in sessions),
         "date": sessions[0].get("opening_date", "").split("T")[0] if sessions else None
     }
+    
+    # Guarda também como resumo daquela data (usado pelos balanços da semana e do mês)
+    if result["date"]:
+        shared_cache.put(f"{DAY_SUMMARY_PREFIX}:{result['date']}", result, _summary_result_ttl(result))
+    
+    return result
 
 
+@shared_cached("resumo:sessoes", _summary_result_ttl, cache_if=_has_sessions)
 def get_sessions_summary() -> Dict[str, str]:
     """
     Retorna resumo das sessões recentes
@@ -450,11 +509,11 @@ def get_sessions_summary() -> Dict[str, str]:
         }
     
     sessions_text = format_sessions_for_llm(sessions)
-    news_report = generate_news_report(sessions_text, "session_details")
+    news_report, llm_used = generate_news_report(sessions_text, "session_details")
     
     return {
         "texto_alexa": news_report,
         "sessions_count": len(sessions),
-        "gemini_used": bool(gemini_client)
+        "gemini_used": llm_used
     }
 
@@ -0,0 +1,345 @@
+"""
+Endpoint nativo da Alexa Skill - recebe o envelope JSON da Alexa diretamente
+Dispensa a Lambda intermediária: verifica assinatura, roteia intents e devolve SSML
+"""
+import os
+import re
+import base64
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+import posixpath
+import logging
+
+import certifi
+import requests
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.x509.verification import PolicyBuilder, Store
+
+from alexa_endpoints import get_daily_summary, get_sessions_summary, get_single_day_summary
+from digests import get_month_digest, get_week_digest
+from speech_pages import CONTINUE_PROMPT, EXPIRED_TEXT, get_page, get_single_day_paginated
+from tenants import current_tenant
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+ALEXA_SKILL_ID = os.environ.get("ALEXA_SKILL_ID")  # Se definido, rejeita requisições de outras skills
+ALEXA_VERIFY_REQUESTS = os.environ.get("ALEXA_VERIFY_REQUESTS", "true").lower() != "false"
+ALEXA_TIMESTAMP_TOLERANCE = 150  # segundos, exigido pela certificação da Alexa
+ALEXA_CERT_HOST = "s3.amazonaws.com"
+ALEXA_CERT_PATH_PREFIX = "/echo.api/"
+ALEXA_CERT_SAN = "echo-api.amazon.com"
+
+SKILL_TITLE = "Câmara Radar"
+WELCOME_TEXT = (
+    "Bem-vindo ao Câmara Radar. Você pode pedir o resumo do último dia de sessões "
+    "ou perguntar quais sessões aconteceram."
+)
+HELP_TEXT = (
+    "Diga, por exemplo, me dê um resumo do dia, ou quais sessões aconteceram. "
+    "O que você gostaria de saber?"
+)
+REPROMPT_TEXT = "O que você gostaria de saber sobre a Câmara?"
+GOODBYE_TEXT = "Até a próxima."
+FALLBACK_TEXT = "Desculpe, não entendi. " + HELP_TEXT
+ERROR_TEXT = "Desculpe, ocorreu um erro ao buscar as informações."
+
+# Intent -> (função que gera o resumo, texto da resposta progressiva)
+INTENT_HANDLERS: Dict[str, Tuple[Callable[[], Dict], str]] = {
+    "ConsultarResumoIntent": (get_single_day_summary, "Um momento, estou buscando o resumo do último dia de sessões."),
+    "ConsultarSessoesIntent": (get_sessions_summary, "Um momento, estou consultando as sessões recentes."),
+    "ConsultarHojeIntent": (get_daily_summary, "Um momento, estou consultando as sessões de hoje."),
+    "ConsultarPautaCompletaIntent": (get_single_day_paginated, "Um momento, estou preparando a pauta completa."),
+    "ConsultarSemanaIntent": (get_week_digest, "Um momento, estou preparando o balanço da semana."),
+    "ConsultarMesIntent": (get_month_digest, "Um momento, estou preparando o balanço do mês."),
+}
+
+# Intents que pedem o próximo trecho da fala paginada
+CONTINUE_INTENTS = ("ContinuarIntent", "AMAZON.NextIntent", "AMAZON.YesIntent")
+
+
+class AlexaVerificationError(Exception):
+    """Requisição que não veio comprovadamente da Alexa"""
+
+
+# Cache de certificados: URL -> (certificado folha, validade)
+_cert_cache: Dict[str, Tuple[x509.Certificate, datetime]] = {}
+_cert_cache_lock = threading.Lock()
+
+
+def _validate_cert_url(cert_url: str) -> None:
+    """
+    Valida a URL da cadeia de certificados conforme as regras da Amazon
+    (https, host s3.amazonaws.com, caminho /echo.api/, porta 443)
+    """
+    parsed = urlparse(cert_url)
+    path = posixpath.normpath(parsed.path) if parsed.path else ""
+
+    if parsed.scheme.lower() != "https":
+        raise AlexaVerificationError("Certificate URL must use https")
+    if (parsed.hostname or "").lower() != ALEXA_CERT_HOST:
+        raise AlexaVerificationError("Certificate URL has invalid host")
+    if not path.startswith(ALEXA_CERT_PATH_PREFIX):
+        raise AlexaVerificationError("Certificate URL has invalid path")
+    if parsed.port not in (None, 443):
+        raise AlexaVerificationError("Certificate URL has invalid port")
+
+
+def _load_signing_certificate(cert_url: str) -> x509.Certificate:
+    """
+    Baixa e valida a cadeia de certificados da Alexa
+    O certificado validado fica em cache até expirar, evitando download a cada requisição
+    """
+    now = datetime.now(timezone.utc)
+
+    with _cert_cache_lock:
+        cached = _cert_cache.get(cert_url)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    _validate_cert_url(cert_url)
+
+    try:
+        response = requests.get(cert_url, timeout=5)
+        response.raise_for_status()
+        chain = x509.load_pem_x509_certificates(response.content)
+    except Exception as e:
+        raise AlexaVerificationError(f"Could not load certificate chain: {e}")
+
+    if not chain:
+        raise AlexaVerificationError("Empty certificate chain")
+
+    leaf, intermediates = chain[0], chain[1:]
+
+    # Valida validade, SAN echo-api.amazon.com e cadeia até uma CA confiável
+    with open(certifi.where(), "rb") as f:
+        store = Store(x509.load_pem_x509_certificates(f.read()))
+    verifier = PolicyBuilder().store(store).time(now).build_server_verifier(x509.DNSName(ALEXA_CERT_SAN))
+    try:
+        verifier.verify(leaf, intermediates)
+    except Exception as e:
+        raise AlexaVerificationError(f"Invalid certificate chain: {e}")
+
+    with _cert_cache_lock:
+        _cert_cache[cert_url] = (leaf, leaf.not_valid_after_utc)
+
+    return leaf
+
+
+# Caminhos do envelope lidos antes ou durante o atendimento: se presentes, devem ser objetos
+_ENVELOPE_OBJECTS = (
+    ("session",), ("session", "application"), ("session", "attributes"),
+    ("context",), ("context", "System"), ("context", "System", "application"),
+    ("request", "intent"),
+)
+
+
+def is_valid_envelope(envelope) -> bool:
+    """
+    Confere a forma do envelope antes de qualquer leitura: objeto com `request`, e
+    os demais objetos lidos (sessão, contexto, aplicação, intent) como objetos quando
+    presentes; atributos da sessão podem vir nulos
+    """
+    if not isinstance(envelope, dict) or not isinstance(envelope.get("request"), dict):
+        return False
+    for path in _ENVELOPE_OBJECTS:
+        node = envelope
+        for key in path:
+            if key not in node:
+                break
+            node = node[key]
+            if node is None and path[-1] == "attributes":
+                break
+            if not isinstance(node, dict):
+                return False
+    return True
+
+
+def verify_request(headers, raw_body: bytes, envelope: Dict) -> None:
+    """
+    Verifica se a requisição veio da Alexa (assinatura, timestamp e skill id)
+    Lança AlexaVerificationError se alguma checagem falhar
+    """
+    # Cada câmara pode ter sua própria skill; senão vale ALEXA_SKILL_ID
+    skill_id = current_tenant().alexa_skill_id or ALEXA_SKILL_ID
+    if skill_id:
+        application_id = (
+            envelope.get("context", {}).get("System", {}).get("application", {}).get("applicationId")
+            or envelope.get("session", {}).get("application", {}).get("applicationId")
+        )
+        if application_id != skill_id:
+            raise AlexaVerificationError("Unexpected application id")
+
+    if not ALEXA_VERIFY_REQUESTS:
+        return
+
+    # A Alexa envia o horário em UTC com fuso; sem fuso, o horário é ambíguo e é recusado
+    timestamp = envelope.get("request", {}).get("timestamp", "")
+    try:
+        request_time = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        skew = abs((datetime.now(timezone.utc) - request_time).total_seconds())
+    except (AttributeError, TypeError, ValueError):
+        raise AlexaVerificationError("Invalid request timestamp")
+    if skew > ALEXA_TIMESTAMP_TOLERANCE:
+        raise AlexaVerificationError("Request timestamp out of tolerance")
+
+    cert_url = headers.get("SignatureCertChainUrl")
+    signature = headers.get("Signature-256")
+    algorithm = hashes.SHA256()
+    if not signature:
+        # Cabeçalho legado (SHA-1), ainda enviado pela Alexa
+        signature = headers.get("Signature")
+        algorithm = hashes.SHA1()
+    if not cert_url or not signature:
+        raise AlexaVerificationError("Missing signature headers")
+
+    certificate = _load_signing_certificate(cert_url)
+
+    try:
+        certificate.public_key().verify(
+            base64.b64decode(signature),
+            raw_body,
+            padding.PKCS1v15(),
+            algorithm
+        )
+    except (InvalidSignature, ValueError) as e:
+        raise AlexaVerificationError(f"Invalid request signature: {e}")
+
+
+def to_ssml(text: str) -> str:
+    """
+    Converte texto (inclusive saída do Gemini) em SSML
+    Remove marcações de markdown, escapa caracteres especiais e separa parágrafos
+    """
+    text = re.sub(r"[*#_`]+", "", text or "")
+    text = text.replace("&", " e ").replace("<", " ").replace(">", " ")
+    paragraphs = [" ".join(p.split()) for p in re.split(r"\n\s*\n", text)]
+    paragraphs = [p for p in paragraphs if p]
+    if len(paragraphs) <= 1:
+        return f"<speak>{''.join(paragraphs)}</speak>"
+    return "<speak>" + "".join(f"<p>{p}</p>" for p in paragraphs) + "</speak>"
+
+
+def build_response(
+    text: str,
+    end_session: bool = True,
+    reprompt: Optional[str] = None,
+    session_attributes: Optional[Dict] = None
+) -> Dict:
+    """
+    Monta o envelope de resposta da Alexa com SSML e card simples
+    """
+    response = {
+        "outputSpeech": {"type": "SSML", "ssml": to_ssml(text)},
+        "card": {"type": "Simple", "title": SKILL_TITLE, "content": re.sub(r"[*#_`]+", "", text)},
+        "shouldEndSession": end_session,
+    }
+    if reprompt:
+        response["reprompt"] = {"outputSpeech": {"type": "SSML", "ssml": to_ssml(reprompt)}}
+
+    return {
+        "version": "1.0",
+        "sessionAttributes": session_attributes or {},
+        "response": response,
+    }
+
+
+def send_progressive_response(envelope: Dict, text: str) -> None:
+    """
+    Envia uma resposta progressiva (VoicePlayer.Speak) enquanto o resumo é gerado
+    Roda em thread separada; falhas são apenas registradas no log
+    """
+    system = envelope.get("context", {}).get("System", {})
+    api_endpoint = system.get("apiEndpoint")
+    api_token = system.get("apiAccessToken")
+    request_id = envelope.get("request", {}).get("requestId")
+
+    if not api_endpoint or not api_token or not request_id:
+        return
+
+    def _send():
+        try:
+            response = requests.post(
+                f"{api_endpoint}/v1/directives",
+                headers={"Authorization": f"Bearer {api_token}", "Content-Type": "application/json"},
+                json={
+                    "header": {"requestId": request_id},
+                    "directive": {"type": "VoicePlayer.Speak", "speech": to_ssml(text)},
+                },
+                timeout=2
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Could not send progressive response: {e}")
+
+    threading.Thread(target=_send, daemon=True).start()
+
+
+def handle_intent(envelope: Dict) -> Dict:
+    """
+    Roteia o IntentRequest para a função de resumo correspondente
+    """
+    intent_name = envelope.get("request", {}).get("intent", {}).get("name", "")
+
+    if intent_name in ("AMAZON.StopIntent", "AMAZON.CancelIntent", "AMAZON.NoIntent"):
+        return build_response(GOODBYE_TEXT)
+    if intent_name == "AMAZON.HelpIntent":
+        return build_response(HELP_TEXT, end_session=False, reprompt=REPROMPT_TEXT)
+
+    if intent_name in CONTINUE_INTENTS:
+        cursor = (envelope.get("session", {}).get("attributes") or {}).get("cursor")
+        page = get_page(cursor) if cursor else None
+        if not page:
+            return build_response(EXPIRED_TEXT)
+        return _build_summary_response(page)
+
+    handler = INTENT_HANDLERS.get(intent_name)
+    if not handler:
+        return build_response(FALLBACK_TEXT, end_session=False, reprompt=REPROMPT_TEXT)
+
+    summary_fn, progress_text = handler
+    send_progressive_response(envelope, progress_text)
+
+    try:
+        result = summary_fn()
+    except Exception as e:
+        logger.error(f"Error handling intent {intent_name}: {e}", exc_info=True)
+        return build_response(ERROR_TEXT)
+
+    return _build_summary_response(result)
+
+
+def _build_summary_response(result: Dict) -> Dict:
+    """
+    Converte o resultado de um endpoint em resposta da Alexa
+    Resultados paginados mantêm a sessão aberta com o cursor do próximo trecho
+    """
+    text = result.get("texto_alexa") or ERROR_TEXT
+    cursor = result.get("cursor")
+    if cursor:
+        return build_response(text, end_session=False, reprompt=CONTINUE_PROMPT, session_attributes={"cursor": cursor})
+    return build_response(text)
+
+
+def handle_alexa_request(envelope: Dict) -> Dict:
+    """
+    Ponto de entrada: trata LaunchRequest, IntentRequest e SessionEndedRequest
+    """
+    request_type = envelope.get("request", {}).get("type", "")
+
+    if request_type == "LaunchRequest":
+        return build_response(WELCOME_TEXT, end_session=False, reprompt=REPROMPT_TEXT)
+    if request_type == "IntentRequest":
+        return handle_intent(envelope)
+    if request_type == "SessionEndedRequest":
+        reason = envelope.get("request", {}).get("reason")
+        logger.info(f"Alexa session ended: {reason}")
+        return {"version": "1.0", "response": {}}
+
+    logger.warning(f"Unsupported Alexa request type: {request_type}")
+    return build_response(FALLBACK_TEXT, end_session=False, reprompt=REPROMPT_TEXT)
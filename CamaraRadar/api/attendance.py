@@ -0,0 +1,301 @@
+"""
+Análise de presença dos vereadores (tabela session_attendance)
+Mantém agregados por parlamentar atualizados incrementalmente, para que os
+endpoints respondam por consulta direta em vez de varrer a lista de presença
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+
+from records import AttendanceRow
+from supabase_rest import in_filter, is_configured, supabase_get, supabase_stream
+from tenants import TenantLocal
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+ATTENDANCE_REFRESH_SECONDS = int(os.environ.get("ATTENDANCE_REFRESH_SECONDS", "300"))
+ATTENDANCE_PAGE_SIZE = 1000
+RANKING_SIZE = 5
+
+
+def _rate(presencas: int, total: int) -> Optional[float]:
+    return round(presencas / total, 3) if total else None
+
+
+def _percent(rate: Optional[float]) -> str:
+    return f"{round((rate or 0) * 100)} por cento"
+
+
+class AttendanceIndex:
+    """
+    Agregados de presença por parliamentarian_id
+
+    O pipeline grava na session_attendance apenas os vereadores presentes, então as
+    faltas são deduzidas: o elenco de uma legislatura é o conjunto de vereadores que
+    aparecem em alguma lista dela, e quem do elenco não está na lista de uma sessão
+    faltou a ela. (Um suplente conta como ausente nas sessões anteriores à sua posse.)
+
+    A atualização busca apenas linhas novas via paginação por (created_at, external_id)
+    e lê cada página incrementalmente como registros compactos. Cada sessão guarda só
+    um inteiro com os bits (na ordem do elenco) dos presentes, então a memória cresce
+    com sessões e vereadores, não com linhas; reaplicar uma linha não muda nada.
+    Sessões novas posteriores às já contadas são somadas aos agregados; só um vereador
+    novo no elenco, ou uma lista que chega fora da ordem das datas, exige recalcular
+    tudo a partir dos bits, em ordem cronológica.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._parliamentarians: Dict[int, Dict] = {}
+        self._sessions: Dict[int, Dict] = {}  # session_id -> data, legislatura, sessão legislativa
+        self._present: Dict[int, int] = {}  # session_id -> bits dos presentes no elenco
+        self._rosters: Dict[str, Dict[int, int]] = {}  # legislatura -> parliamentarian_id -> bit
+        self._names: Dict[int, str] = {}
+        self._last_counted: Optional[Tuple[str, int]] = None  # (data, session_id) da última sessão contada
+        self._watermark = None  # (created_at, external_id) da última linha lida
+        self._last_refresh = 0.0
+        self._overview: Dict = {}
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Busca e aplica linhas novas de presença
+        Limitado a uma atualização a cada ATTENDANCE_REFRESH_SECONDS
+        """
+        if not is_configured():
+            return
+        if not force and time.time() - self._last_refresh < ATTENDANCE_REFRESH_SECONDS:
+            return
+
+        with self._lock:
+            if not force and time.time() - self._last_refresh < ATTENDANCE_REFRESH_SECONDS:
+                return
+            loaded, touched, roster_grew = 0, set(), False
+            try:
+                while True:
+                    page = self._fetch_page()
+                    if page:
+                        page_touched, page_grew = self._apply(page)
+                        touched |= page_touched
+                        roster_grew = roster_grew or page_grew
+                        # A marca d'água só avança depois que a página foi aplicada
+                        self._watermark = (page[-1].created_at, page[-1].external_id)
+                        loaded += len(page)
+                    if len(page) < ATTENDANCE_PAGE_SIZE:
+                        break
+                self._last_refresh = time.time()
+            except Exception as e:
+                logger.error(f"Error refreshing attendance index: {e}")
+            if touched:
+                self._update(touched, roster_grew)
+            if loaded:
+                self._overview = self._build_overview()
+                logger.info(f"Attendance index updated with {loaded} rows")
+
+    def _fetch_page(self) -> List[AttendanceRow]:
+        """Lê a próxima página após a marca d'água, como registros compactos"""
+        params = [
+            ("select", AttendanceRow.select()),
+            ("order", "created_at.asc,external_id.asc"),
+            ("limit", str(ATTENDANCE_PAGE_SIZE)),
+        ]
+        if self._watermark:
+            created_at, external_id = self._watermark
+            params.append(("or", f'(created_at.gt."{created_at}",and(created_at.eq."{created_at}",external_id.gt.{external_id}))'))
+        return list(supabase_stream("session_attendance", params, AttendanceRow))
+
+    def _fetch_sessions(self, session_ids) -> None:
+        """Data e legislatura das sessões ainda desconhecidas"""
+        ids = sorted(session_id for session_id in session_ids if session_id not in self._sessions)
+        for start in range(0, len(ids), 200):
+            for session in supabase_get("sessions", [
+                ("select", "session_id,opening_date,legislature,legislative_session"),
+                ("session_id", in_filter(ids[start:start + 200])),
+            ]):
+                self._sessions[session["session_id"]] = {
+                    "data": (session.get("opening_date") or "").split("T")[0],
+                    "legislatura": session.get("legislature") or "N/A",
+                    "sessao_legislativa": session.get("legislative_session") or "N/A",
+                }
+
+    def _apply(self, rows: List[AttendanceRow]) -> Tuple[Set[int], bool]:
+        """
+        Marca os presentes de cada sessão e amplia o elenco de cada legislatura
+        Retorna as sessões alteradas e se apareceu vereador novo em algum elenco
+        """
+        self._fetch_sessions({row.session_id for row in rows})
+        touched, roster_grew = set(), False
+        for row in rows:
+            if row.parliamentarian_id is None:
+                continue
+            session = self._sessions.setdefault(
+                row.session_id, {"data": "", "legislatura": "N/A", "sessao_legislativa": "N/A"}
+            )
+            roster = self._rosters.setdefault(session["legislatura"], {})
+            bit = roster.get(row.parliamentarian_id)
+            if bit is None:
+                bit = roster[row.parliamentarian_id] = len(roster)
+                roster_grew = True
+            if row.session_id not in self._present:
+                self._present[row.session_id] = 0
+                touched.add(row.session_id)
+            if row.present is not False and not self._present[row.session_id] >> bit & 1:
+                self._present[row.session_id] |= 1 << bit
+                touched.add(row.session_id)
+            if row.parliamentarian_name:
+                self._names[row.parliamentarian_id] = row.parliamentarian_name
+        return touched, roster_grew
+
+    def _order(self, session_id: int) -> Tuple[str, int]:
+        return self._sessions[session_id]["data"], session_id
+
+    def _update(self, touched: Set[int], roster_grew: bool) -> None:
+        """Soma as sessões novas ao fim da linha do tempo; senão recalcula tudo"""
+        ordered = sorted(touched, key=self._order)
+        if roster_grew or (self._last_counted is not None and self._order(ordered[0]) <= self._last_counted):
+            self._rebuild()
+            return
+        for session_id in ordered:
+            self._count_session(session_id)
+
+    def _rebuild(self) -> None:
+        """Recalcula presenças, faltas e sequências percorrendo as sessões em ordem de data"""
+        self._parliamentarians = {}
+        self._last_counted = None
+        for session_id in sorted(self._present, key=self._order):
+            self._count_session(session_id)
+
+    def _count_session(self, session_id: int) -> None:
+        """Soma uma sessão aos agregados de todo o elenco da sua legislatura"""
+        session = self._sessions[session_id]
+        present = self._present[session_id]
+        for parliamentarian_id, bit in self._rosters.get(session["legislatura"], {}).items():
+            stats = self._parliamentarians.get(parliamentarian_id)
+            if stats is None:
+                stats = self._parliamentarians[parliamentarian_id] = {
+                    "parliamentarian_id": parliamentarian_id,
+                    "nome": "",
+                    "presencas": 0,
+                    "ausencias": 0,
+                    "por_sessao_legislativa": {},
+                    "ausencias_seguidas": 0,
+                    "maior_sequencia_ausencias": 0,
+                    "ultima_sessao": None,
+                }
+            stats["nome"] = self._names.get(parliamentarian_id, stats["nome"])
+            by_session = stats["por_sessao_legislativa"].setdefault(
+                session["sessao_legislativa"], {"presencas": 0, "ausencias": 0}
+            )
+            if present >> bit & 1:
+                stats["presencas"] += 1
+                by_session["presencas"] += 1
+                stats["ausencias_seguidas"] = 0
+                stats["ultima_sessao"] = session["data"] or stats["ultima_sessao"]
+            else:
+                stats["ausencias"] += 1
+                by_session["ausencias"] += 1
+                stats["ausencias_seguidas"] += 1
+                stats["maior_sequencia_ausencias"] = max(
+                    stats["maior_sequencia_ausencias"], stats["ausencias_seguidas"]
+                )
+        self._last_counted = self._order(session_id)
+
+    def _build_overview(self) -> Dict:
+        """Pré-calcula o resumo geral (taxa média e ranking de faltas)"""
+        rates = []
+        for stats in self._parliamentarians.values():
+            rate = _rate(stats["presencas"], stats["presencas"] + stats["ausencias"])
+            if rate is not None:
+                rates.append(rate)
+
+        ranking = sorted(
+            self._parliamentarians.values(),
+            key=lambda s: (-s["ausencias"], s["nome"])
+        )[:RANKING_SIZE]
+
+        return {
+            "sessoes_com_presenca": len(self._present),
+            "vereadores": len(self._parliamentarians),
+            "taxa_media_presenca": round(sum(rates) / len(rates), 3) if rates else None,
+            "mais_ausencias": [
+                {"parliamentarian_id": s["parliamentarian_id"], "nome": s["nome"], "ausencias": s["ausencias"]}
+                for s in ranking if s["ausencias"] > 0
+            ],
+        }
+
+    def overview(self) -> Dict:
+        return self._overview
+
+    def get(self, parliamentarian_id: int) -> Optional[Dict]:
+        return self._parliamentarians.get(parliamentarian_id)
+
+
+attendance_indexes = TenantLocal(AttendanceIndex)  # Um índice por câmara
+
+
+def get_attendance_summary() -> Dict:
+    """
+    Resumo geral de presença dos vereadores
+    Responde a partir dos agregados pré-calculados
+    """
+    attendance_index = attendance_indexes.get()
+    attendance_index.refresh()
+    overview = attendance_index.overview()
+
+    if not overview.get("sessoes_com_presenca"):
+        return {
+            "texto_alexa": "Ainda não há listas de presença registradas.",
+            "sessoes_com_presenca": 0
+        }
+
+    text = (
+        f"Nas {overview['sessoes_com_presenca']} sessões com lista de presença registrada, "
+        f"a taxa média de presença dos vereadores foi de {_percent(overview['taxa_media_presenca'])}."
+    )
+    if overview["mais_ausencias"]:
+        names = [f"{v['nome']}, com {v['ausencias']} faltas" for v in overview["mais_ausencias"][:3]]
+        if len(names) == 1:
+            text += f" O vereador com mais faltas foi {names[0]}."
+        else:
+            text += " Os vereadores com mais faltas foram " + "; ".join(names) + "."
+
+    return {"texto_alexa": text, **overview}
+
+
+def get_parliamentarian_attendance(parliamentarian_id: int) -> Optional[Dict]:
+    """
+    Presença de um vereador específico (por parliamentarian_id)
+    Retorna None se o vereador não tiver presença registrada
+    """
+    attendance_index = attendance_indexes.get()
+    attendance_index.refresh()
+    stats = attendance_index.get(parliamentarian_id)
+    if not stats:
+        return None
+
+    total = stats["presencas"] + stats["ausencias"]
+    rate = _rate(stats["presencas"], total)
+    text = (
+        f"{stats['nome']} esteve presente em {stats['presencas']} de {total} sessões, "
+        f"uma taxa de presença de {_percent(rate)}."
+    )
+    if stats["ausencias_seguidas"] >= 2:
+        text += f" Faltou às últimas {stats['ausencias_seguidas']} sessões."
+
+    return {
+        "texto_alexa": text,
+        "parliamentarian_id": parliamentarian_id,
+        "nome": stats["nome"],
+        "presencas": stats["presencas"],
+        "ausencias": stats["ausencias"],
+        "taxa_presenca": rate,
+        "ausencias_seguidas": stats["ausencias_seguidas"],
+        "maior_sequencia_ausencias": stats["maior_sequencia_ausencias"],
+        "ultima_sessao": stats["ultima_sessao"],
+        "por_sessao_legislativa": {
+            legislative_session: {**counts, "taxa_presenca": _rate(counts["presencas"], counts["presencas"] + counts["ausencias"])}
+            for legislative_session, counts in stats["por_sessao_legislativa"].items()
+        },
+    }
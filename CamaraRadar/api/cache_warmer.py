@@ -0,0 +1,288 @@
+"""
+Aquecimento preditivo do cache com base no calendário de sessões
+Aprende os dias e horários habituais das sessões a partir do histórico de opening_date
+e, logo após o fim esperado de cada sessão, consulta o Supabase até encontrar os dados
+novos e gera antecipadamente os resumos de /api/ultimo-dia e /api/resumo
+Os resumos aquecidos valem até a próxima janela (os dados só mudam com sessão nova), e
+fora das janelas uma consulta leve por hora reaquece se algo mudar mesmo assim
+Cada câmara (tenant) tem seu próprio calendário e sua própria thread de aquecimento
+"""
+import os
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+from statistics import median
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from alexa_endpoints import (
+    SUMMARY_CACHE_TTL, get_daily_summary, get_last_day_sessions, get_recent_sessions,
+    get_sessions_today, get_single_day_summary, summary_ttl
+)
+from supabase_rest import supabase_get
+from tenants import Tenant, all_tenants, use_tenant
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+CACHE_WARMER_ENABLED = os.environ.get("CACHE_WARMER_ENABLED", "true").lower() != "false"
+WARM_TIMEZONE = ZoneInfo(os.environ.get("WARM_TIMEZONE", "America/Fortaleza"))  # Horário da Paraíba
+WARM_HISTORY_SIZE = int(os.environ.get("WARM_HISTORY_SIZE", "120"))  # Sessões usadas para aprender o calendário
+WARM_MIN_OCCURRENCES = int(os.environ.get("WARM_MIN_OCCURRENCES", "3"))
+WARM_DEFAULT_DURATION_HOURS = float(os.environ.get("WARM_DEFAULT_DURATION_HOURS", "3"))
+WARM_WINDOW_HOURS = float(os.environ.get("WARM_WINDOW_HOURS", "6"))  # Inclui a coleta diária das 18:30
+WARM_POLL_MINUTES = float(os.environ.get("WARM_POLL_MINUTES", "10"))
+WARM_MAX_TTL_HOURS = float(os.environ.get("WARM_MAX_TTL_HOURS", str(7 * 24)))  # Teto da validade aquecida
+WARM_REVALIDATE_MINUTES = float(os.environ.get("WARM_REVALIDATE_MINUTES", "0"))  # Opcional; 0 desativa
+WARM_RELEARN_HOURS = 24
+WARM_LOCK_DIR = tempfile.gettempdir()
+
+# (dia da semana, hora de início) -> duração esperada
+Slot = Tuple[int, int]
+
+
+def _parse(date_str: Optional[str]) -> Optional[datetime]:
+    if not date_str:
+        return None
+    try:
+        return datetime.fromisoformat(date_str.replace("Z", "+00:00")).astimezone(WARM_TIMEZONE)
+    except ValueError:
+        return None
+
+
+def learn_schedule(sessions: List[Dict]) -> Dict[Slot, timedelta]:
+    """
+    Encontra os horários recorrentes (dia da semana + hora) e a duração mediana de cada um
+    Horários com menos de WARM_MIN_OCCURRENCES sessões são ignorados
+    """
+    counts: Counter = Counter()
+    durations: Dict[Slot, List[float]] = defaultdict(list)
+
+    for session in sessions:
+        start = _parse(session.get("start_time")) or _parse(session.get("opening_date"))
+        if not start:
+            continue
+        slot = (start.weekday(), start.hour)
+        counts[slot] += 1
+        end = _parse(session.get("end_time"))
+        if end and end > start:
+            durations[slot].append((end - start).total_seconds())
+
+    return {
+        slot: timedelta(seconds=median(durations[slot])) if durations[slot]
+        else timedelta(hours=WARM_DEFAULT_DURATION_HOURS)
+        for slot, count in counts.items() if count >= WARM_MIN_OCCURRENCES
+    }
+
+
+def next_window(schedule: Dict[Slot, timedelta], now: datetime) -> Optional[Tuple[datetime, datetime]]:
+    """
+    Próxima janela de aquecimento (fim esperado da sessão até WARM_WINDOW_HOURS depois)
+    Se uma janela estiver em andamento, ela é retornada
+    """
+    windows = []
+    for (weekday, hour), duration in schedule.items():
+        days_ahead = (weekday - now.weekday()) % 7
+        for offset in (days_ahead - 7, days_ahead, days_ahead + 7):
+            day = (now + timedelta(days=offset)).date()
+            start = datetime(day.year, day.month, day.day, hour, tzinfo=WARM_TIMEZONE)
+            window_start = start + duration
+            window_end = window_start + timedelta(hours=WARM_WINDOW_HOURS)
+            if window_end > now:
+                windows.append((window_start, window_end))
+    return min(windows) if windows else None
+
+
+class CacheWarmer:
+    """Thread que dorme até a próxima janela e, dentro dela, aquece o cache"""
+
+    def __init__(self, tenant: Tenant):
+        self.tenant = tenant
+        self.lock_path = os.path.join(WARM_LOCK_DIR, f"camara-radar-warmer-{tenant.slug}.lock")
+        self.schedule: Dict[Slot, timedelta] = {}
+        self.learned_at: Optional[datetime] = None
+        self.last_fingerprint: Optional[Tuple] = None
+        self.last_warmed_at: Optional[datetime] = None
+        self.current_window: Optional[Tuple[datetime, datetime]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_fd = None
+
+    def start(self) -> None:
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"cache-warmer-{self.tenant.slug}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _acquire_leadership(self) -> bool:
+        """Só um worker por host aquece o cache de cada câmara (lock de arquivo não bloqueante)"""
+        if fcntl is None:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _learn(self) -> None:
+        sessions = supabase_get("sessions", [
+            ("select", "opening_date,start_time,end_time"),
+            ("order", "opening_date.desc"),
+            ("limit", str(WARM_HISTORY_SIZE)),
+        ])
+        self.schedule = learn_schedule(sessions)
+        self.learned_at = datetime.now(WARM_TIMEZONE)
+        slots = ", ".join(f"dia {d} às {h}h" for d, h in sorted(self.schedule))
+        logger.info(f"Cache warmer [{self.tenant.slug}] learned {len(self.schedule)} session slots: {slots or 'nenhum'}")
+
+    def _fingerprint(self) -> Optional[Tuple]:
+        """(sessão mais recente, itens de pauta coletados) - muda quando chegam dados novos"""
+        latest = supabase_get("sessions", [
+            ("select", "session_id"),
+            ("order", "opening_date.desc"),
+            ("limit", "1"),
+        ])
+        if not latest:
+            return None
+        session_id = latest[0]["session_id"]
+        agenda = supabase_get("session_order_of_day", [
+            ("select", "external_id"),
+            ("session_id", f"eq.{session_id}"),
+        ])
+        return (session_id, len(agenda))
+
+    def warm_ttl(self, now: datetime) -> float:
+        """
+        Validade das entradas aquecidas: até o início da próxima janela (quando pode haver
+        sessão nova), mais um intervalo de consulta de folga, limitada a WARM_MAX_TTL_HOURS
+        """
+        upcoming = next_window(self.schedule, now)
+        if upcoming and upcoming[0] <= now:  # janela em andamento: vale até a seguinte
+            upcoming = next_window(self.schedule, upcoming[1])
+        ceiling = WARM_MAX_TTL_HOURS * 3600
+        if not upcoming:
+            return ceiling
+        seconds = (upcoming[0] - now).total_seconds() + WARM_POLL_MINUTES * 60
+        return min(max(seconds, SUMMARY_CACHE_TTL), ceiling)
+
+    def warm(self) -> None:
+        """Regrava no cache compartilhado as consultas e os resumos do último dia e de hoje"""
+        ttl = self.warm_ttl(datetime.now(WARM_TIMEZONE))
+        # "Hoje" e "últimas 24h" usam a data local do servidor: não podem passar da meia-noite
+        now = datetime.now()
+        today_ttl = min(ttl, (datetime.combine(now.date() + timedelta(days=1), time.min) - now).total_seconds())
+
+        def summary_cache_ttl(limit: float):
+            return lambda result: summary_ttl(result.get("gemini_used", False), limit)  # fallback do LLM expira logo
+
+        get_last_day_sessions.refresh(cache_ttl=ttl)
+        get_sessions_today.refresh(cache_ttl=today_ttl)
+        get_recent_sessions.refresh(days=1, limit=5, cache_ttl=today_ttl)
+        get_single_day_summary.refresh(cache_ttl=summary_cache_ttl(ttl))
+        get_daily_summary.refresh(cache_ttl=summary_cache_ttl(today_ttl))
+        self.last_warmed_at = datetime.now(WARM_TIMEZONE)
+        logger.info(f"Cache warmed for {self.tenant.slug}: /api/ultimo-dia and /api/resumo "
+                    f"(valid for {ttl / 3600:.1f}h)")
+
+    def _revalidate(self) -> None:
+        """Fora das janelas: reaquece se os dados mudaram (coleta atrasada, correção de pauta)"""
+        try:
+            fingerprint = self._fingerprint()
+            if fingerprint and fingerprint != self.last_fingerprint:
+                self.warm()
+                self.last_fingerprint = fingerprint
+        except Exception as e:
+            logger.error(f"Cache warmer revalidation failed: {e}")
+
+    def _poll_window(self, window_end: datetime) -> None:
+        """Consulta periodicamente até a janela acabar ou a pauta da sessão nova chegar"""
+        while not self._stop.is_set() and datetime.now(WARM_TIMEZONE) < window_end:
+            try:
+                fingerprint = self._fingerprint()
+                if fingerprint and fingerprint != self.last_fingerprint:
+                    self.warm()
+                    self.last_fingerprint = fingerprint
+                    if fingerprint[1] > 0:
+                        return  # Sessão nova com pauta: nada mais a esperar nesta janela
+            except Exception as e:
+                logger.error(f"Cache warmer poll failed: {e}")
+            self._stop.wait(WARM_POLL_MINUTES * 60)
+
+    def _run(self) -> None:
+        # Consultas e chaves de cache da thread pertencem à câmara deste warmer
+        with use_tenant(self.tenant):
+            self._loop()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set() and not self._acquire_leadership():
+            self._stop.wait(WARM_RELEARN_HOURS * 3600)
+
+        while not self._stop.is_set():
+            now = datetime.now(WARM_TIMEZONE)
+            try:
+                if not self.learned_at or now - self.learned_at > timedelta(hours=WARM_RELEARN_HOURS):
+                    self._learn()
+                    if self.last_fingerprint is None:
+                        self.last_fingerprint = self._fingerprint()
+            except Exception as e:
+                logger.error(f"Cache warmer could not learn schedule: {e}")
+
+            self.current_window = next_window(self.schedule, now)
+            if not self.current_window:
+                self._stop.wait(WARM_RELEARN_HOURS * 3600)
+                continue
+
+            window_start, window_end = self.current_window
+            if now < window_start:
+                # Acorda no início da janela (ou antes, para revalidar ou reaprender o calendário)
+                wait = min((window_start - now).total_seconds(), WARM_RELEARN_HOURS * 3600)
+                revalidate = WARM_REVALIDATE_MINUTES > 0 and wait > WARM_REVALIDATE_MINUTES * 60
+                self._stop.wait(WARM_REVALIDATE_MINUTES * 60 if revalidate else wait)
+                if revalidate and not self._stop.is_set():
+                    self._revalidate()
+                continue
+
+            self._poll_window(window_end)
+            remaining = (window_end - datetime.now(WARM_TIMEZONE)).total_seconds()
+            if remaining > 0:
+                self._stop.wait(remaining)
+
+    def status(self) -> Dict:
+        return {
+            "leader": self._lock_fd is not None or (fcntl is None and self._thread is not None),
+            "slots": [
+                {"weekday": d, "hour": h, "duration_minutes": round(self.schedule[(d, h)].total_seconds() / 60)}
+                for d, h in sorted(self.schedule)
+            ],
+            "next_window": [w.isoformat() for w in self.current_window] if self.current_window else None,
+            "last_warmed_at": self.last_warmed_at.isoformat() if self.last_warmed_at else None,
+        }
+
+
+cache_warmers = {tenant.slug: CacheWarmer(tenant) for tenant in all_tenants()}
+
+
+def start_cache_warmer() -> None:
+    """Inicia o aquecimento em segundo plano das câmaras com Supabase configurado (se habilitado)"""
+    if not CACHE_WARMER_ENABLED:
+        return
+    for warmer in cache_warmers.values():
+        if warmer.tenant.supabase_configured:
+            warmer.start()
+
+
+def warmers_status() -> Dict[str, Dict]:
+    return {slug: warmer.status() for slug, warmer in cache_warmers.items()}
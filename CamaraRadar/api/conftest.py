@@ -0,0 +1,163 @@
+"""
+Fixtures compartilhadas dos testes
+FakeSupabase responde às consultas PostgREST usadas pelos módulos (filtros, `or`/`and`
+aninhados como na paginação por chave, order, limit/offset) a partir de tabelas em memória, e entrega as
+respostas em trechos pequenos para exercitar a leitura incremental
+"""
+import os
+import tempfile
+
+# Antes de importar os módulos da API: cache local por processo e nada em segundo plano
+os.environ.setdefault("SHARED_CACHE_ENABLED", "false")
+os.environ.setdefault("SHARED_CACHE_PATH", os.path.join(tempfile.gettempdir(), "camara-radar-test-cache.bin"))
+os.environ.setdefault("CACHE_WARMER_ENABLED", "false")
+
+import json
+from typing import Dict, List, Optional
+
+import pytest
+
+from shared_cache import shared_cache
+from tenants import current_tenant
+
+def _coerce(value: str, like):
+    if isinstance(like, bool):
+        return value == "true"
+    if isinstance(like, int):
+        return int(value)
+    if isinstance(like, float):
+        return float(value)
+    return value
+
+
+def _matches(row: Dict, column: str, expression: str) -> bool:
+    op, _, value = expression.partition(".")
+    current = row.get(column)
+    if op == "is":
+        return current is None if value == "null" else current == (value == "true")
+    if current is None:
+        return False
+    if op == "in":
+        return current in {_coerce(v, current) for v in value.strip("()").split(",") if v}
+    value = _coerce(value.strip('"'), current)
+    return {
+        "eq": current == value,
+        "neq": current != value,
+        "gt": current > value,
+        "gte": current >= value,
+        "lt": current < value,
+        "lte": current <= value,
+    }[op]
+
+
+def _split_terms(text: str) -> List[str]:
+    """Separa os termos de um or/and nas vírgulas fora de parênteses e aspas"""
+    terms, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            terms.append(text[start:i])
+            start = i + 1
+    terms.append(text[start:])
+    return terms
+
+
+def _matches_logic(row: Dict, term: str) -> bool:
+    """Avalia or(...)/and(...) aninhados, como os filtros lógicos do PostgREST"""
+    for op, combine in (("or", any), ("and", all)):
+        if term.startswith(op + "("):
+            return combine([_matches_logic(row, t) for t in _split_terms(term[len(op) + 1:-1])])
+    column, _, expression = term.partition(".")
+    return _matches(row, column, expression)
+
+
+class FakeResponse:
+    def __init__(self, rows: List[Dict], chunk_size: int):
+        self.content = json.dumps(rows, ensure_ascii=False).encode()
+        self.chunk_size = chunk_size
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=None):
+        for start in range(0, len(self.content), self.chunk_size):
+            yield self.content[start:start + self.chunk_size]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeSupabase:
+    """Substituto de requests.Session para o PostgREST do Supabase"""
+
+    def __init__(self, tables: Dict[str, List[Dict]], chunk_size: int = 7, max_rows: Optional[int] = None):
+        self.tables = tables
+        self.chunk_size = chunk_size
+        self.max_rows = max_rows  # como o db-max-rows do PostgREST: trunca em silêncio
+        self.requests: List[tuple] = []
+
+    def query(self, table: str, params) -> List[Dict]:
+        params = list(params.items() if isinstance(params, dict) else params)
+        rows = list(self.tables.get(table, []))
+        order, limit, offset, select = None, None, 0, None
+        for column, expression in params:
+            if column == "order":
+                order = expression
+            elif column == "limit":
+                limit = int(expression)
+            elif column == "offset":
+                offset = int(expression)
+            elif column == "select":
+                select = expression.split(",")
+            elif column in ("or", "and"):
+                rows = [r for r in rows if _matches_logic(r, column + expression)]
+            else:
+                rows = [r for r in rows if _matches(r, column, expression)]
+
+        for spec in reversed((order or "").split(",")):
+            if spec:
+                column, _, direction = spec.partition(".")
+                rows.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=direction == "desc")
+        rows = rows[offset:]
+        if limit is not None:
+            rows = rows[:limit]
+        if self.max_rows is not None:
+            rows = rows[:self.max_rows]
+        if select and select != ["*"]:
+            rows = [{c: r.get(c) for c in select} for r in rows]
+        return rows
+
+    def get(self, url, headers=None, params=None, timeout=None, stream=False):
+        table = url.rsplit("/", 1)[-1]
+        self.requests.append((table, params))
+        return FakeResponse(self.query(table, params or []), self.chunk_size)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    shared_cache._local.clear()
+    yield
+    shared_cache._local.clear()
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    """Instala um FakeSupabase (tabelas vazias) no tenant padrão e o devolve"""
+    fake = FakeSupabase({})
+    tenant = current_tenant()
+    monkeypatch.setattr(tenant, "http", fake)
+    monkeypatch.setattr(tenant, "supabase_url", "http://supabase.test")
+    monkeypatch.setattr(tenant, "supabase_key", "chave-de-teste")
+    return fake
@@ -0,0 +1,230 @@
+"""
+Balanços semanais e mensais (map-reduce sobre resumos diários)
+Map: um resumo por dia com sessão, reaproveitado do cache quando já existe
+Reduce: uma única chamada ao LLM sobre os textos diários (curtos), em vez de
+passar semanas de pauta completa em um só prompt
+Cada nível (dia, semana, mês) fica em cache separadamente
+"""
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import alexa_endpoints
+from alexa_endpoints import (
+    DAY_SUMMARY_PREFIX, SUMMARY_CACHE_TTL,
+    format_sessions_for_llm, generate_news_report, summary_ttl
+)
+from shared_cache import shared_cache
+from speech_dates import MESES, speakable_date
+from records import AgendaItem
+from supabase_rest import in_filter, is_configured, supabase_get, supabase_stream
+from tenants import bind_tenant, current_tenant
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+DIGEST_CLOSED_TTL = int(os.environ.get("DIGEST_CLOSED_TTL", str(30 * 24 * 3600)))  # Períodos encerrados
+DIGEST_MAP_WORKERS = int(os.environ.get("DIGEST_MAP_WORKERS", "3"))
+# A pauta é coletada depois da sessão; passado esse prazo, um dia sem pauta fica assim
+DIGEST_AGENDA_GRACE_DAYS = int(os.environ.get("DIGEST_AGENDA_GRACE_DAYS", "7"))
+AGENDA_PAGE_SIZE = 1000  # limite padrão de linhas por resposta do PostgREST
+
+
+def _settled(day: str, summary: Dict) -> bool:
+    """O resumo do dia não muda mais: todas as sessões já tinham pauta, ou o prazo da coleta passou"""
+    grace = date.today() - timedelta(days=DIGEST_AGENDA_GRACE_DAYS)
+    return bool(summary.get("pauta_completa")) or date.fromisoformat(day) < grace
+
+
+def _ttl_for(period_end: date, llm_used: bool, settled: bool = True) -> int:
+    """
+    Períodos já encerrados não mudam mais: ficam em cache por muito mais tempo, desde que
+    nenhum dia tenha sido resumido antes de a pauta ser coletada
+    Textos de fallback (Gemini com erro ou sem orçamento) expiram logo em qualquer caso
+    """
+    closed = period_end < date.today() and settled
+    return summary_ttl(llm_used, DIGEST_CLOSED_TTL if closed else SUMMARY_CACHE_TTL)
+
+
+def _fetch_sessions_by_day(start: date, end: date) -> Dict[str, List[Dict]]:
+    """Sessões do período agrupadas por data (mesma convenção de data de get_single_day_summary)"""
+    sessions = supabase_get("sessions", [
+        ("opening_date", f"gte.{start.isoformat()}"),
+        ("opening_date", f"lt.{(end + timedelta(days=1)).isoformat()}"),
+        ("order", "opening_date.asc"),
+        ("limit", "500"),
+    ])
+    by_day: Dict[str, List[Dict]] = {}
+    for session in sessions:
+        day = (session.get("opening_date") or "").split("T")[0]
+        if day:
+            by_day.setdefault(day, []).append(session)
+    return by_day
+
+
+def _summarize_day(day: str, sessions: List[Dict]) -> Dict:
+    """Map: resumo de um dia (mesmo prompt e formato de /api/ultimo-dia)"""
+    news_report, llm_used = generate_news_report(format_sessions_for_llm(sessions), "single_day")
+    return {
+        "texto_alexa": news_report,
+        "sessions_count": len(sessions),
+        "gemini_used": llm_used,
+        "pauta_completa": all(s.get("ordem_dia") for s in sessions),
+        "date": day
+    }
+
+
+def _fetch_agendas(session_ids: List[int]) -> Dict[int, List[AgendaItem]]:
+    """Pauta de um lote de sessões, paginando se passar do limite do PostgREST"""
+    agendas: Dict[int, List[AgendaItem]] = {}
+    offset = 0
+    while True:
+        count = 0
+        for item in supabase_stream("session_order_of_day", [
+            ("select", AgendaItem.select()),
+            ("session_id", in_filter(session_ids)),
+            ("order", "session_id.asc,order_number.asc,external_id.asc"),
+            ("limit", str(AGENDA_PAGE_SIZE)),
+            ("offset", str(offset)),
+        ], AgendaItem):
+            agendas.setdefault(item.session_id, []).append(item)
+            count += 1
+        if count < AGENDA_PAGE_SIZE:
+            return agendas
+        offset += AGENDA_PAGE_SIZE
+
+
+def _day_summaries(by_day: Dict[str, List[Dict]]) -> Tuple[Dict[str, Dict], int]:
+    """
+    Retorna os resumos de cada dia e quantos foram gerados agora pelo LLM
+    Só os dias sem resumo em cache têm a pauta buscada (em um único lote, paginado)
+    """
+    summaries: Dict[str, Dict] = {}
+    missing = []
+    for day in by_day:
+        cached = shared_cache.get(f"{DAY_SUMMARY_PREFIX}:{day}")
+        if cached:
+            summaries[day] = cached
+        else:
+            missing.append(day)
+
+    if not missing:
+        return summaries, 0
+
+    agendas = _fetch_agendas([s["session_id"] for day in missing for s in by_day[day]])
+    for day in missing:
+        for session in by_day[day]:
+            session["ordem_dia"] = agendas.get(session["session_id"], [])
+
+    with ThreadPoolExecutor(max_workers=DIGEST_MAP_WORKERS) as executor:
+        # Cada tarefa roda com o contexto da requisição (câmara atual)
+        summarize = bind_tenant(lambda day: (day, _summarize_day(day, by_day[day])))
+        results = executor.map(summarize, missing)
+        llm_calls = 0
+        for day, summary in results:
+            summaries[day] = summary
+            llm_calls += summary["gemini_used"]
+            shared_cache.put(
+                f"{DAY_SUMMARY_PREFIX}:{day}", summary,
+                _ttl_for(date.fromisoformat(day), summary["gemini_used"], _settled(day, summary))
+            )
+
+    return summaries, llm_calls
+
+
+def _reduce_fallback(summaries: Dict[str, Dict], intro: str) -> str:
+    """Sem LLM: primeira frase de cada resumo diário"""
+    parts = []
+    for day in sorted(summaries):
+        text = summaries[day]["texto_alexa"].strip()
+        first_sentence = text.split(". ")[0].rstrip(".")
+        parts.append(f"Em {speakable_date(day, with_year=False)}, {first_sentence[:1].lower()}{first_sentence[1:]}.")
+    return intro + " " + " ".join(parts)
+
+
+def _build_digest(start: date, end: date, prompt_type: str, label: str) -> Dict:
+    """Map-reduce do período [start, end]"""
+    if not is_configured():
+        return {"texto_alexa": f"Não encontrei sessões {label}.", "dias_com_sessao": 0, "sessions_count": 0}
+
+    by_day = _fetch_sessions_by_day(start, end)
+    base = {
+        "periodo": {"inicio": start.isoformat(), "fim": end.isoformat()},
+        "dias_com_sessao": len(by_day),
+        "sessions_count": sum(len(s) for s in by_day.values()),
+    }
+    if not by_day:
+        return {"texto_alexa": f"Não houve sessões na {current_tenant().name} {label}.", **base, "llm_calls": 0}
+
+    # A chave inclui os dias com sessão: se surgir um dia novo, o balanço é refeito
+    days_hash = hashlib.blake2b(",".join(sorted(by_day)).encode(), digest_size=6).hexdigest()
+    key = f"resumo:{prompt_type}:{start.isoformat()}:{days_hash}"
+
+    def compute() -> Dict:
+        summaries, generated = _day_summaries(by_day)
+        reduced = False
+        text = None
+        if len(summaries) == 1:
+            text = next(iter(summaries.values()))["texto_alexa"]
+        elif alexa_endpoints.gemini_client:
+            digest_input = "\n\n".join(
+                f"{speakable_date(day, with_year=False)}:\n{summaries[day]['texto_alexa']}" for day in sorted(summaries)
+            )
+            text, reduced = generate_news_report(digest_input, prompt_type)
+            if not reduced:
+                text = None
+        if text is None:
+            text = _reduce_fallback(summaries, f"Na {current_tenant().name}, {label}, houve sessões em {len(summaries)} dias.")
+
+        # Só é "do LLM" se o reduce (quando houve) e todos os resumos diários vieram do Gemini
+        llm_used = all(s.get("gemini_used") for s in summaries.values()) and (reduced or len(summaries) == 1)
+        logger.info(f"Digest {key} built with {generated} new LLM day summaries and {int(reduced)} reduce call")
+        settled = all(_settled(day, summary) for day, summary in summaries.items())
+        return {"texto_alexa": text, **base, "gemini_used": llm_used, "llm_calls": generated + reduced,
+                "pauta_completa": settled}
+
+    return shared_cache.get_or_compute(
+        key, compute, lambda digest: _ttl_for(end, digest["gemini_used"], digest["pauta_completa"])
+    )
+
+
+def _parse_day(value: Optional[str]) -> date:
+    if not value:
+        return date.today()
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError("Parâmetro 'data' deve estar no formato AAAA-MM-DD")
+
+
+def get_week_digest(day: Optional[str] = None) -> Dict:
+    """
+    Balanço da semana (segunda a domingo) que contém a data informada
+    day: AAAA-MM-DD (padrão: hoje)
+    """
+    reference = _parse_day(day)
+    start = reference - timedelta(days=reference.weekday())
+    end = start + timedelta(days=6)
+    label = "nesta semana" if start <= date.today() <= end else f"na semana de {speakable_date(start, with_year=False)}"
+    return _build_digest(start, end, "weekly_digest", label)
+
+
+def get_month_digest(month: Optional[str] = None) -> Dict:
+    """
+    Balanço do mês
+    month: AAAA-MM (padrão: mês atual)
+    """
+    if month:
+        try:
+            start = datetime.strptime(month, "%Y-%m").date()
+        except ValueError:
+            raise ValueError("Parâmetro 'mes' deve estar no formato AAAA-MM")
+    else:
+        start = date.today().replace(day=1)
+    end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    today = date.today()
+    label = "neste mês" if start <= today <= end else f"em {MESES[start.month - 1]} de {start.year}"
+    return _build_digest(start, end, "monthly_digest", label)
@@ -0,0 +1,160 @@
+"""
+Exportação em streaming (NDJSON) das sessões com a ordem do dia
+Pagina o Supabase por keyset em (opening_date, session_id) e junta a pauta em lotes,
+de modo que o uso de memória fica limitado a uma página, qualquer que seja o volume
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import logging
+
+import fast_json
+from supabase_rest import in_filter, is_configured, supabase_get, supabase_stream
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+EXPORT_DEFAULT_PAGE_SIZE = 200
+EXPORT_MAX_PAGE_SIZE = 1000
+AGENDA_PAGE_SIZE = 1000  # limite padrão de linhas por resposta do PostgREST
+
+
+def encode_cursor(opening_date: str, session_id: int) -> str:
+    """Cursor opaco com a posição da última sessão exportada"""
+    raw = json.dumps([opening_date, session_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Lança ValueError se o cursor for inválido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        opening_date, session_id = json.loads(raw)
+        return str(opening_date), int(session_id)
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+def parse_since(since: Optional[str]) -> Optional[str]:
+    """Valida o parâmetro since (data ou data/hora ISO 8601)"""
+    if not since:
+        return None
+    try:
+        datetime.fromisoformat(since.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError("Parâmetro 'since' deve estar no formato ISO 8601 (ex.: 2025-01-31)")
+    return since
+
+
+def _fetch_sessions_page(after: Optional[Tuple[str, int]], page_size: int) -> List[Dict]:
+    params = [
+        ("order", "opening_date.asc,session_id.asc"),
+        ("limit", str(page_size)),
+    ]
+    if after:
+        opening_date, session_id = after
+        params.append(("or", f'(opening_date.gt."{opening_date}",and(opening_date.eq."{opening_date}",session_id.gt.{session_id}))'))
+    return supabase_get("sessions", params)
+
+
+def _changed_since(session_ids: List[int], since: str) -> Set[int]:
+    """
+    Sessões da página alteradas desde `since`, na própria sessão ou em algum item de
+    pauta; as consultas se limitam aos ids da página, qualquer que seja o volume alterado
+    """
+    changed = {row["session_id"] for row in supabase_get("sessions", [
+        ("select", "session_id"),
+        ("session_id", in_filter(session_ids)),
+        ("updated_at", f"gte.{since}"),
+    ])}
+    pending = [session_id for session_id in session_ids if session_id not in changed]
+    offset = 0
+    while pending:
+        count = 0
+        for row in supabase_stream("session_order_of_day", [
+            ("select", "session_id"),
+            ("session_id", in_filter(pending)),
+            ("updated_at", f"gte.{since}"),
+            ("order", "session_id.asc,external_id.asc"),
+            ("limit", str(AGENDA_PAGE_SIZE)),
+            ("offset", str(offset)),
+        ]):
+            changed.add(row["session_id"])
+            count += 1
+        if count < AGENDA_PAGE_SIZE:
+            break
+        offset += AGENDA_PAGE_SIZE
+    return changed
+
+
+def _fetch_agendas(session_ids: List[int]) -> Dict[int, List[Dict]]:
+    """Busca a pauta de um lote de sessões, paginando se passar do limite do PostgREST"""
+    agendas: Dict[int, List[Dict]] = {session_id: [] for session_id in session_ids}
+    offset = 0
+    while True:
+        # Linhas completas (todas as colunas), lidas incrementalmente
+        count = 0
+        for row in supabase_stream("session_order_of_day", [
+            ("session_id", in_filter(session_ids)),
+            ("order", "session_id.asc,order_number.asc,external_id.asc"),
+            ("limit", str(AGENDA_PAGE_SIZE)),
+            ("offset", str(offset)),
+        ]):
+            agendas.setdefault(row["session_id"], []).append(row)
+            count += 1
+        if count < AGENDA_PAGE_SIZE:
+            return agendas
+        offset += AGENDA_PAGE_SIZE
+
+
+def iter_sessions_export(
+    cursor: Optional[str] = None,
+    since: Optional[str] = None,
+    page_size: int = EXPORT_DEFAULT_PAGE_SIZE
+) -> Iterator[str]:
+    """
+    Gera linhas NDJSON, uma por sessão, com a pauta em "ordem_dia"
+    Cada linha traz "cursor": passá-lo em ?cursor= retoma a exportação após aquela sessão
+    Com `since`, entram as sessões alteradas e as que tiveram itens de pauta alterados
+    Em caso de erro no meio do stream, a última linha é {"error": ..., "cursor": ...}
+    """
+    if not is_configured():
+        yield fast_json.dumps({"error": "Supabase não configurado"}) + "\n"
+        return
+
+    after = decode_cursor(cursor) if cursor else None
+    page_size = max(1, min(page_size, EXPORT_MAX_PAGE_SIZE))
+    exported = 0
+
+    try:
+        while True:
+            # Com since, a página do keyset é filtrada depois: o cursor avança pelas
+            # sessões examinadas, exportadas ou não
+            page = _fetch_sessions_page(after, page_size)
+            if not page:
+                break
+            sessions = page
+            if since:
+                changed = _changed_since([s["session_id"] for s in page], since)
+                sessions = [s for s in page if s["session_id"] in changed]
+
+            agendas = _fetch_agendas([s["session_id"] for s in sessions]) if sessions else {}
+            for session in sessions:
+                session["ordem_dia"] = agendas.get(session["session_id"], [])
+                session["cursor"] = encode_cursor(session["opening_date"], session["session_id"])
+                yield fast_json.dumps(session) + "\n"
+            exported += len(sessions)
+            after = (page[-1]["opening_date"], page[-1]["session_id"])
+
+            if len(page) < page_size:
+                break
+    except Exception as e:
+        logger.error(f"Error during sessions export after {exported} sessions: {e}")
+        yield fast_json.dumps({
+            "error": "Exportação interrompida",
+            "cursor": encode_cursor(*after) if after else cursor
+        }) + "\n"
+        return
+
+    logger.info(f"Sessions export finished: {exported} sessions")
@@ -0,0 +1,115 @@
+"""
+Codificação e decodificação de JSON
+Usa orjson quando instalado (bem mais rápido em payloads grandes, como exportação e
+estatísticas) e cai na biblioteca padrão caso contrário; a saída é a mesma nos dois casos
+Inclui um leitor incremental de arrays JSON, que devolve um elemento por vez sem
+carregar o corpo inteiro em memória
+"""
+import re
+import codecs
+from datetime import date
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, Union
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+BACKEND = "orjson" if orjson else "json"
+logger.info(f"JSON backend: {BACKEND}")
+
+
+def _default(value: Any) -> Any:
+    """Tipos não suportados nativamente (mesmas conversões do provider padrão do Flask)"""
+    if hasattr(value, "to_dict"):  # registros compactos (records.py)
+        return value.to_dict()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, "tolist"):  # escalares e arrays do NumPy
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps_bytes(value: Any) -> bytes:
+        """Serializa para UTF-8 compacto"""
+        return orjson.dumps(value, default=_default, option=_OPTIONS)
+
+    def loads(data: Union[bytes, bytearray, str]) -> Any:
+        return orjson.loads(data)
+else:
+    def dumps_bytes(value: Any) -> bytes:
+        """Serializa para UTF-8 compacto"""
+        return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def loads(data: Union[bytes, bytearray, str]) -> Any:
+        return json.loads(data)
+
+
+def dumps(value: Any) -> str:
+    return dumps_bytes(value).decode()
+
+
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+_COMPACT_AT = 1 << 16  # descarta o prefixo já lido do buffer a partir deste tamanho
+_decoder = json.JSONDecoder()
+
+
+def iter_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Lê um array JSON a partir de pedaços de bytes (ex.: response.iter_content) e
+    devolve os elementos um a um; a memória usada é proporcional ao maior elemento,
+    não ao array. Os elementos devem ser objetos ou arrays (caso das respostas do PostgREST).
+    """
+    chunks = iter(chunks)
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer, pos, started = "", 0, False
+
+    def fill() -> bool:
+        nonlocal buffer, pos
+        if pos > _COMPACT_AT:
+            buffer, pos = buffer[pos:], 0
+        for chunk in chunks:
+            text = utf8.decode(chunk)
+            if text:
+                buffer += text
+                return True
+        tail = utf8.decode(b"", final=True)
+        buffer += tail
+        return bool(tail)
+
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos >= len(buffer):
+            if not fill():
+                raise ValueError("Unexpected end of JSON array")
+            continue
+
+        char = buffer[pos]
+        if not started:
+            if char != "[":
+                raise ValueError("Expected a JSON array")
+            started = True
+            pos += 1
+        elif char == "]":
+            return
+        elif char == ",":
+            pos += 1
+        else:
+            try:
+                value, pos = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Elemento incompleto: lê mais dados (ou falha se o corpo acabou)
+                if not fill():
+                    raise
+                continue
+            yield value
@@ -0,0 +1,122 @@
+"""
+Compressão negociada das respostas (Accept-Encoding) e provider JSON do Flask
+Respostas acima de COMPRESS_MIN_BYTES são comprimidas com brotli (se instalado) ou gzip;
+respostas em streaming (exportação NDJSON) são comprimidas trecho a trecho, sem
+acumular o corpo em memória
+"""
+import os
+import zlib
+from typing import Iterable, Iterator, Optional
+import logging
+
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+
+import fast_json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", "5"))
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/x-ndjson", "text/plain"}
+RAW_BYTES_ENVIRON_KEY = "camara_radar.raw_bytes"
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify e request.get_json usando fast_json (orjson quando disponível)"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return fast_json.dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return fast_json.loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(fast_json.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
+class _Compressor:
+    """Interface única para gzip e brotli"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: formato gzip
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.process(data) if self.encoding == "br" else self._zlib.compress(data)
+
+    def flush(self) -> bytes:
+        """Esvazia o buffer sem encerrar o stream (o cliente já recebe o trecho)"""
+        return self._brotli.flush() if self.encoding == "br" else self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self.encoding == "br" else self._zlib.flush()
+
+
+def negotiate_encoding() -> Optional[str]:
+    """Melhor codificação aceita pelo cliente: br > gzip (respeitando q=0)"""
+    accepted = request.accept_encodings
+    if brotli and accepted["br"] > 0:
+        return "br"
+    if accepted["gzip"] > 0:
+        return "gzip"
+    return None
+
+
+def _compress_stream(chunks: Iterable, compressor: _Compressor) -> Iterator[bytes]:
+    """Comprime cada trecho e o envia imediatamente (linhas NDJSON chegam sem esperar o fim)"""
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def compress_response(response: Response) -> Response:
+    """after_request: comprime a resposta se o cliente aceitar e valer a pena"""
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 304)
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding()
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, _Compressor(encoding))
+        response.headers.pop("Content-Length", None)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    body = response.get_data()
+    request.environ[RAW_BYTES_ENVIRON_KEY] = len(body)
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    compressor = _Compressor(encoding)
+    response.set_data(compressor.compress(body) + compressor.finish())
+    response.headers["Content-Encoding"] = encoding
+    return response
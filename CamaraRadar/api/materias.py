@@ -0,0 +1,195 @@
+"""
+Cache de matérias (materia_id) da ordem do dia
+A mesma matéria aparece em várias sessões (primeira e segunda discussão, votação final);
+a ementa normalizada e encurtada e o rótulo falado ("Projeto de Lei Ordinária 12 de 2025")
+são calculados uma única vez por materia_id e reaproveitados pelos formatadores.
+O histórico de uma matéria (sessões em que foi pautada e resultados) vem de uma única
+consulta filtrada por materia_id e também fica em cache.
+"""
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from records import AgendaItem
+from shared_cache import shared_cache
+from speech_dates import speakable_date
+from supabase_rest import in_filter, is_configured, supabase_get, supabase_stream
+from tenants import TenantLocal
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+MATERIA_CACHE_TTL = int(os.environ.get("MATERIA_CACHE_TTL", str(7 * 24 * 3600)))  # Ementas não mudam
+MATERIA_HISTORY_TTL = int(os.environ.get("MATERIA_HISTORY_TTL", "600"))
+MATERIA_EMENTA_CHARS = int(os.environ.get("MATERIA_EMENTA_CHARS", "220"))
+
+# Siglas usadas no campo content e como são faladas
+SIGLAS = {
+    "PLO": "Projeto de Lei Ordinária",
+    "PLC": "Projeto de Lei Complementar",
+    "PL": "Projeto de Lei",
+    "PDL": "Projeto de Decreto Legislativo",
+    "PR": "Projeto de Resolução",
+    "PELO": "Proposta de Emenda à Lei Orgânica",
+    "REQ": "Requerimento",
+    "IND": "Indicação",
+    "MOC": "Moção",
+    "VET": "Veto",
+}
+
+# "PLO 12/2025", "Requerimento nº 345/2025", "Projeto de Lei n. 7 / 2024"
+# O marcador nº só conta como palavra própria ("do Plano Diretor nº 3" não vira "do Pla")
+_IDENTIFICATION_RE = re.compile(
+    r"^\s*(?P<tipo>[^\d\-–:]+?)\s*(?:\bn[º°o]?\.?\s*)?(?P<numero>\d+)(?:\s*/\s*(?P<ano>\d{4}))?",
+    re.IGNORECASE
+)
+_BOILERPLATE_RE = re.compile(r"^(ementa|assunto)\s*:\s*", re.IGNORECASE)
+
+
+def parse_identification(content: Optional[str]) -> Optional[Tuple[str, int, Optional[str]]]:
+    """(tipo por extenso, número, ano) do início do campo content; ano None se ausente"""
+    match = _IDENTIFICATION_RE.match(content or "")
+    if not match:
+        return None
+    tipo = " ".join(match.group("tipo").split())
+    tipo = SIGLAS.get(tipo.upper(), tipo)
+    return tipo, int(match.group("numero")), match.group("ano")
+
+
+def speakable_label(content: Optional[str]) -> Optional[str]:
+    """Rótulo falado da matéria a partir do campo content (None se não identificado)"""
+    parsed = parse_identification(content)
+    if not parsed or not parsed[2]:
+        return None
+    tipo, numero, ano = parsed
+    return f"{tipo} {numero} de {ano}"
+
+
+def matter_type(content: Optional[str]) -> str:
+    """Tipo de matéria para agrupar estatísticas ("Outros" se não identificado)"""
+    parsed = parse_identification(content)
+    if not parsed:
+        return "Outros"
+    tipo = parsed[0]
+    if tipo.isupper() and len(tipo) <= 5:
+        return tipo  # Siglas sem nome por extenso conhecido
+    return tipo.capitalize()
+
+
+def short_ementa(text: Optional[str], max_chars: int = MATERIA_EMENTA_CHARS) -> str:
+    """Normaliza espaços, remove prefixos e encurta em fronteira de palavra"""
+    text = _BOILERPLATE_RE.sub("", " ".join((text or "").split())).rstrip(". ")
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0].rstrip(",;: ")
+    return cut + "..."
+
+
+def build_entry(item) -> Dict:
+    """Entrada do cache a partir de um item de pauta (AgendaItem ou dict)"""
+    content = item.get("content") or ""
+    return {
+        "materia_id": item.get("materia_id"),
+        "rotulo": speakable_label(content) or short_ementa(content, 80),
+        "ementa_curta": short_ementa(item.get("ementa") or content),
+    }
+
+
+class MateriaIndex:
+    """
+    Entradas por materia_id: dict local ao processo (consulta O(1), sem desserializar)
+    com o cache compartilhado por trás, para que cada matéria seja processada uma vez por host
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, Dict] = {}
+
+    def lookup(self, item) -> Optional[Dict]:
+        """Entrada da matéria do item; None se o item não tiver materia_id"""
+        materia_id = item.get("materia_id")
+        if materia_id is None:
+            return None
+        entry = self._entries.get(materia_id)
+        if entry is None:
+            key = f"materia:{materia_id}"
+            entry = shared_cache.get(key)
+            if entry is None:
+                entry = build_entry(item)
+                shared_cache.put(key, entry, MATERIA_CACHE_TTL)
+            self._entries[materia_id] = entry
+        return entry
+
+
+materia_indexes = TenantLocal(MateriaIndex)  # Um índice por câmara
+
+
+def lookup_materia(item) -> Optional[Dict]:
+    return materia_indexes.get().lookup(item)
+
+
+def _fetch_history(materia_id: int) -> Optional[Dict]:
+    """Todas as vezes em que a matéria foi pautada, em ordem cronológica"""
+    items = list(supabase_stream("session_order_of_day", [
+        ("select", AgendaItem.select()),
+        ("materia_id", f"eq.{materia_id}"),
+        ("order", "session_id.asc,order_number.asc"),
+    ], AgendaItem))
+    if not items:
+        return None
+
+    sessions = {
+        session["session_id"]: session
+        for session in supabase_get("sessions", [
+            ("select", "session_id,opening_date,type"),
+            ("session_id", in_filter({item.session_id for item in items})),
+        ])
+    }
+
+    occurrences: List[Dict] = []
+    for item in items:
+        session = sessions.get(item.session_id, {})
+        resultado = (item.result or "").strip()
+        occurrences.append({
+            "session_id": item.session_id,
+            "data": (session.get("opening_date") or "").split("T")[0] or None,
+            "tipo_sessao": session.get("type"),
+            "order_number": item.order_number,
+            "resultado": resultado if resultado and resultado != "-" else None,
+        })
+    occurrences.sort(key=lambda o: (o["data"] or "", o["session_id"]))
+
+    entry = lookup_materia(items[0])
+    return {**entry, "ocorrencias": occurrences}
+
+
+def get_materia_history(materia_id: int) -> Optional[Dict]:
+    """
+    Histórico de uma matéria com texto para a Alexa
+    Retorna None se a matéria não aparecer em nenhuma pauta
+    """
+    if not is_configured():
+        return None
+
+    history = shared_cache.get_or_compute(
+        f"materia:historico:{materia_id}", lambda: _fetch_history(materia_id),
+        MATERIA_HISTORY_TTL, cache_if=bool
+    )
+    if not history:
+        return None
+
+    occurrences = history["ocorrencias"]
+    first, last = occurrences[0], occurrences[-1]
+    session_count = len({o["session_id"] for o in occurrences})
+    if session_count == 1:
+        text = f"{history['rotulo']} esteve na pauta em {speakable_date(first['data'])}"
+    else:
+        text = (
+            f"{history['rotulo']} esteve na pauta de {session_count} sessões, "
+            f"de {speakable_date(first['data'])} a {speakable_date(last['data'])}"
+        )
+    text += f". Trata de: {history['ementa_curta']}."
+    if last["resultado"]:
+        text += f" Último resultado: {last['resultado']}."
+
+    return {"texto_alexa": text, **history}
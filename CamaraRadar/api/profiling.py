@@ -0,0 +1,300 @@
+"""
+Profiling sob demanda das requisições
+Um profiler por amostragem (sys._current_frames) roda em paralelo à requisição e gera
+pilhas colapsadas (flamegraph.pl / speedscope) e um arquivo speedscope com os
+tempos das etapas marcadas com @timed. As requisições mais lentas ficam guardadas.
+"""
+import os
+import re
+import sys
+import json
+import hmac
+import heapq
+import random
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")  # Sem token, profiling sob demanda fica desativado
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "camara-radar-profiles"))
+PROFILE_KEEP_SLOWEST = int(os.environ.get("PROFILE_KEEP_SLOWEST", "20"))
+PROFILE_KEEP_REQUESTED = int(os.environ.get("PROFILE_KEEP_REQUESTED", "20"))  # Perfis pedidos (X-Profile) mantidos
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))  # Fração de requisições perfiladas automaticamente
+
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+PROFILE_FORMATS = {"collapsed": "collapsed.txt", "speedscope": "speedscope.json"}
+
+
+class SamplingProfiler:
+    """Amostra periodicamente a pilha de uma thread e conta pilhas repetidas"""
+
+    def __init__(self, thread_id: int, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[tuple(stack)] += 1
+            self.samples += 1
+
+
+class RequestProfile:
+    """Estado de profiling de uma requisição"""
+
+    def __init__(self, sampled: bool, requested: bool):
+        self.id = uuid.uuid4().hex
+        self.requested = requested
+        self.start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+        self.started_at = time.time()
+        self.spans: List[Dict] = []
+        self.sampler = SamplingProfiler(threading.get_ident()) if sampled else None
+        if self.sampler:
+            self.sampler.start()
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+_slowest: List = []  # heap (wall_ms, id, registro) com as requisições mais lentas
+_requested: deque = deque()  # perfis pedidos explicitamente, do mais antigo ao mais recente
+_slowest_lock = threading.Lock()
+
+
+def timed(name: str):
+    """
+    Decorator: registra a duração da função na requisição atual
+    Sem requisição em andamento, apenas chama a função
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                profile.spans.append({
+                    "name": name,
+                    "start_ms": round((start - profile.start) * 1000, 3),
+                    "duration_ms": round((end - start) * 1000, 3),
+                })
+        return wrapper
+    return decorator
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    """Confere o token de profiling (comparação em tempo constante)"""
+    return bool(PROFILE_TOKEN and token and hmac.compare_digest(token, PROFILE_TOKEN))
+
+
+def start_request(requested: bool) -> None:
+    """Inicia a coleta: amostragem se pedida (ou sorteada), tempos de etapas sempre"""
+    sampled = requested or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+    _current.set(RequestProfile(sampled, requested))
+
+
+def finish_request(method: str, path: str, status: int,
+                   bytes_sent: Optional[int] = None, bytes_raw: Optional[int] = None) -> Optional[Dict]:
+    """
+    Encerra a coleta da requisição atual e retorna o registro
+    bytes_sent/bytes_raw: tamanho do corpo enviado e antes da compressão (None em streaming)
+    Perfis amostrados são gravados em PROFILE_DIR
+    """
+    profile = _current.get()
+    if profile is None:
+        return None
+    _current.set(None)
+
+    wall_ms = (time.perf_counter() - profile.start) * 1000
+    cpu_ms = (time.thread_time() - profile.cpu_start) * 1000
+    if profile.sampler:
+        profile.sampler.stop()
+
+    record = {
+        "id": profile.id,
+        "method": method,
+        "path": path,
+        "status": status,
+        "wall_ms": round(wall_ms, 3),
+        "cpu_ms": round(cpu_ms, 3),
+        "bytes": bytes_sent,
+        "bytes_uncompressed": bytes_raw if bytes_raw is not None else bytes_sent,
+        "started_at": profile.started_at,
+        "spans": profile.spans,
+        "profiled": profile.sampler is not None,
+        "requested": profile.requested,
+    }
+
+    if profile.sampler:
+        try:
+            _write_profile(profile, record)
+        except OSError as e:
+            logger.error(f"Could not write profile {profile.id}: {e}")
+            record["profiled"] = False
+
+    _remember(record)
+    return record
+
+
+def _remember(record: Dict) -> None:
+    """
+    Guarda o registro entre os mais lentos e, se pedido explicitamente, entre os
+    PROFILE_KEEP_REQUESTED perfis pedidos mais recentes; arquivos de perfis que não
+    estão em nenhuma das duas listas são apagados
+    """
+    dropped = []
+    with _slowest_lock:
+        entry = (record["wall_ms"], record["id"], record)
+        if len(_slowest) < PROFILE_KEEP_SLOWEST:
+            heapq.heappush(_slowest, entry)
+        elif entry[0] <= _slowest[0][0]:
+            dropped.append(record)
+        else:
+            dropped.append(heapq.heapreplace(_slowest, entry)[2])
+
+        if record["profiled"] and record["requested"]:
+            _requested.append(record)
+            while len(_requested) > PROFILE_KEEP_REQUESTED:
+                dropped.append(_requested.popleft())
+
+        kept = {e[1] for e in _slowest} | {r["id"] for r in _requested}
+        dropped = [r for r in dropped if r["id"] not in kept]
+    for evicted in dropped:
+        _discard_profile(evicted)
+
+
+def _discard_profile(record: Dict) -> None:
+    """Remove os arquivos de um perfil que saiu das listas"""
+    if not record.get("profiled"):
+        return
+    for suffix in PROFILE_FORMATS.values():
+        try:
+            os.remove(os.path.join(PROFILE_DIR, f"{record['id']}.{suffix}"))
+        except OSError:
+            pass
+
+
+def slowest() -> List[Dict]:
+    """Requisições mais lentas deste worker, da mais lenta para a mais rápida"""
+    with _slowest_lock:
+        return [entry[2] for entry in sorted(_slowest, reverse=True)]
+
+
+def _frame_name(frame) -> str:
+    name, filename, line = frame
+    return f"{name} ({filename}:{line})"
+
+
+def to_collapsed(stacks: Counter) -> str:
+    """Formato de pilhas colapsadas: 'a;b;c 12' por linha"""
+    return "".join(
+        ";".join(_frame_name(f) for f in stack) + f" {count}\n"
+        for stack, count in stacks.most_common()
+    )
+
+
+def to_speedscope(profile: RequestProfile, record: Dict) -> Dict:
+    """Arquivo speedscope com o perfil amostrado e as etapas (@timed) como eventos"""
+    frames: List[Dict] = []
+    frame_index: Dict = {}
+
+    def index_of(key) -> int:
+        if key not in frame_index:
+            frame_index[key] = len(frames)
+            if isinstance(key, tuple):
+                frames.append({"name": key[0], "file": key[1], "line": key[2]})
+            else:
+                frames.append({"name": key})
+        return frame_index[key]
+
+    interval_ms = profile.sampler.interval * 1000
+    samples, weights = [], []
+    for stack, count in profile.sampler.stacks.items():
+        samples.append([index_of(f) for f in stack])
+        weights.append(count * interval_ms)
+
+    events = []
+    for span in sorted(profile.spans, key=lambda s: s["start_ms"]):
+        frame = index_of(span["name"])
+        events.append({"type": "O", "frame": frame, "at": span["start_ms"]})
+        events.append({"type": "C", "frame": frame, "at": span["start_ms"] + span["duration_ms"]})
+    # Eventos precisam fechar em ordem (pilha); etapas aninhadas vêm do próprio código
+    events.sort(key=lambda e: (e["at"], e["type"] == "O"))
+
+    title = f"{record['method']} {record['path']}"
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": title,
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": f"{title} (amostras)",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": record["wall_ms"],
+                "samples": samples,
+                "weights": weights,
+            },
+            {
+                "type": "evented",
+                "name": f"{title} (etapas)",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": record["wall_ms"],
+                "events": events,
+            },
+        ],
+    }
+
+
+def _write_profile(profile: RequestProfile, record: Dict) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, profile.id)
+    with open(f"{base}.{PROFILE_FORMATS['collapsed']}", "w") as f:
+        f.write(to_collapsed(profile.sampler.stacks))
+    with open(f"{base}.{PROFILE_FORMATS['speedscope']}", "w") as f:
+        json.dump(to_speedscope(profile, record), f)
+
+
+def load_profile(profile_id: str, fmt: str) -> Optional[str]:
+    """Lê um perfil gravado; None se não existir"""
+    if not PROFILE_ID_RE.match(profile_id) or fmt not in PROFILE_FORMATS:
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.{PROFILE_FORMATS[fmt]}")) as f:
+            return f.read()
+    except OSError:
+        return None
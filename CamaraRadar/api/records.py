@@ -0,0 +1,60 @@
+"""
+Registros compactos para linhas lidas do Supabase
+Usam __slots__ (sem dict por instância) e guardam só as colunas usadas; textos muito
+repetidos são internados. Aceitam row.get(...) e row[...], como os dicts originais,
+e viram dict ao serem serializados (fast_json, cache compartilhado)
+"""
+import sys
+from typing import Any, Dict, Tuple
+
+
+class Record:
+    """Base: campos em __slots__, na mesma ordem do `select` enviado ao PostgREST"""
+
+    __slots__: Tuple[str, ...] = ()
+    INTERNED: Tuple[str, ...] = ()  # colunas com poucos valores distintos
+
+    @classmethod
+    def select(cls) -> str:
+        """Valor do parâmetro `select` com exatamente as colunas do registro"""
+        return ",".join(cls.__slots__)
+
+    @classmethod
+    def from_row(cls, row: Dict) -> "Record":
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            value = row.get(name)
+            if name in cls.INTERNED and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(record, name, value)
+        return record
+
+    def get(self, name: str, default: Any = None) -> Any:
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()})"
+
+
+class AgendaItem(Record):
+    """Item da ordem do dia (session_order_of_day)"""
+
+    __slots__ = ("external_id", "session_id", "order_number", "materia_id", "content", "ementa", "result")
+    INTERNED = ("result",)
+
+
+class AttendanceRow(Record):
+    """Linha da lista de presença (session_attendance)"""
+
+    __slots__ = ("external_id", "session_id", "parliamentarian_id", "parliamentarian_name", "present", "created_at")
+    INTERNED = ("parliamentarian_name",)
@@ -0,0 +1,312 @@
+"""
+Replay de tráfego gravado (TRACE_RECORD_PATH) contra a aplicação, no mesmo processo
+Usa o test client do Flask, o Supabase informado (ex.: `supabase start` local) e um
+Gemini simulado, reproduzindo os intervalos originais entre as requisições (ou
+acelerados com --speed). Requisições encadeadas (/api/continuar e os intents de
+continuação) não são reproduzidas: o cursor e os atributos de sessão de que
+dependem não ficam no trace. Elas aparecem à parte no relatório. Ao final mostra a distribuição de latência, o tempo de
+CPU, os bytes enviados e a eficiência do cache, no total e por rota, para comparar
+branches sob a mesma carga.
+
+Uso:
+    python replay.py trace.tsv --supabase-url http://localhost:54321 --supabase-key <chave>
+    python replay.py trace.tsv --speed 10 --concurrency 4 --json resultado.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay de um trace do Câmara Radar")
+    parser.add_argument("trace", help="arquivo gravado com TRACE_RECORD_PATH")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="fator de velocidade (2 = duas vezes mais rápido, 0 = sem esperas)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="requisições simultâneas (com 1, o cache por rota é exato)")
+    parser.add_argument("--supabase-url", default=os.environ.get("SUPABASE_URL", "http://localhost:54321"))
+    parser.add_argument("--supabase-key", default=os.environ.get("SUPABASE_KEY"))
+    parser.add_argument("--gemini-latency-ms", type=float, default=800,
+                        help="latência simulada de cada chamada ao Gemini")
+    parser.add_argument("--real-gemini", action="store_true", help="usa o Gemini real (GEMINI_API_KEY)")
+    parser.add_argument("--accept-encoding", default="br, gzip",
+                        help="Accept-Encoding enviado (vazio = sem compressão)")
+    parser.add_argument("--limit", type=int, help="reproduz apenas as primeiras N requisições")
+    parser.add_argument("--json", dest="json_path", help="grava o relatório em JSON")
+    return parser.parse_args(argv)
+
+
+class FakeGeminiClient:
+    """Substituto do cliente Gemini: latência fixa e texto determinístico"""
+
+    class _Response:
+        def __init__(self, text: str):
+            self.text = text
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.models = self
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, model: str, contents: str):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return self._Response(f"Resumo simulado gerado a partir de {len(contents)} caracteres de dados.")
+
+
+# Rotas que retomam o cursor devolvido por uma resposta anterior
+CHAINED_PATHS = ("/api/continuar",)
+
+
+def route_label(entry) -> str:
+    return f"{entry.method} {entry.path.split('?')[0]}" + (f" [{entry.intent}]" if entry.intent else "")
+
+
+def is_chained(entry, continue_intents: Iterable[str]) -> bool:
+    """Depende do estado de uma resposta anterior (cursor ou atributos da sessão da Alexa)"""
+    return entry.path.split("?")[0] in CHAINED_PATHS or entry.intent in continue_intents
+
+
+def alexa_envelope(intent: str, application_id: str) -> Dict:
+    """Envelope mínimo da Alexa para o intent (ou tipo de requisição) gravado"""
+    request_types = {"LaunchRequest", "SessionEndedRequest"}
+    request_body = {
+        "type": intent if intent in request_types else "IntentRequest",
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+    if intent not in request_types:
+        request_body["intent"] = {"name": intent, "slots": {}}
+    return {
+        "version": "1.0",
+        "session": {"new": True, "attributes": {}, "application": {"applicationId": application_id}},
+        "context": {"System": {"application": {"applicationId": application_id}}},
+        "request": request_body,
+    }
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Percentil por posição mais próxima (valores já ordenados)"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[index], 3)
+
+
+def latency_summary(values: List[float]) -> Dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3) if values else None,
+        "p50_ms": percentile(values, 50),
+        "p90_ms": percentile(values, 90),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "max_ms": round(values[-1], 3) if values else None,
+    }
+
+
+def cache_summary(hits: int, misses: int) -> Dict:
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 3) if total else None}
+
+
+def server_timing(header: Optional[str], name: str) -> Optional[float]:
+    """Duração de uma métrica do cabeçalho Server-Timing (ex.: cpu;dur=1.5)"""
+    for metric in (header or "").split(","):
+        metric_name, _, params = metric.strip().partition(";")
+        if metric_name == name and params.startswith("dur="):
+            try:
+                return float(params[4:])
+            except ValueError:
+                return None
+    return None
+
+
+def cpu_summary(values: List[Optional[float]]) -> Dict:
+    values = sorted(v for v in values if v is not None)
+    return {
+        "mean_ms": round(sum(values) / len(values), 3) if values else None,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+    }
+
+
+def bytes_summary(values: List[Optional[int]]) -> Dict:
+    values = [v for v in values if v is not None]
+    return {"total": sum(values), "mean": round(sum(values) / len(values)) if values else None}
+
+
+def build_report(results: List[Dict], elapsed: float, gemini_calls: Optional[int],
+                 skipped: Optional[Dict[str, int]] = None) -> Dict:
+    by_route = defaultdict(list)
+    for result in results:
+        by_route[result["route"]].append(result)
+
+    routes = {}
+    for route, items in sorted(by_route.items(), key=lambda kv: -len(kv[1])):
+        routes[route] = {
+            **latency_summary([r["ms"] for r in items]),
+            "recorded_p50_ms": percentile(sorted(r["recorded_ms"] for r in items), 50),
+            "cpu": cpu_summary([r.get("cpu_ms") for r in items]),
+            "recorded_cpu_p50_ms": percentile(
+                sorted(r["recorded_cpu_ms"] for r in items if r.get("recorded_cpu_ms") is not None), 50
+            ),
+            "bytes": bytes_summary([r.get("bytes") for r in items]),
+            "cache": cache_summary(sum(r["hits"] for r in items), sum(r["misses"] for r in items)),
+            "status": dict(Counter(r["status"] for r in items)),
+        }
+
+    return {
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else None,
+        "latency": latency_summary([r["ms"] for r in results]),
+        "cpu": cpu_summary([r.get("cpu_ms") for r in results]),
+        "bytes": bytes_summary([r.get("bytes") for r in results]),
+        "cache": cache_summary(sum(r["hits"] for r in results), sum(r["misses"] for r in results)),
+        "status": dict(Counter(r["status"] for r in results)),
+        "gemini_calls": gemini_calls,
+        "routes": routes,
+        "skipped_chained": skipped or {},
+    }
+
+
+def print_report(report: Dict) -> None:
+    latency, cache = report["latency"], report["cache"]
+    print("=" * 78)
+    print(f"REPLAY: {report['requests']} requisições em {report['elapsed_s']}s "
+          f"({report['throughput_rps']} req/s)")
+    print("=" * 78)
+    print(f"Latência (ms): p50 {latency['p50_ms']}  p90 {latency['p90_ms']}  p95 {latency['p95_ms']}  "
+          f"p99 {latency['p99_ms']}  max {latency['max_ms']}")
+    print(f"CPU (ms): média {report['cpu']['mean_ms']}  p50 {report['cpu']['p50_ms']}  "
+          f"p95 {report['cpu']['p95_ms']}")
+    print(f"Bytes enviados: {report['bytes']['total']} (média {report['bytes']['mean']} por resposta)")
+    print(f"Cache: {cache['hits']} acertos, {cache['misses']} faltas (taxa {cache['hit_rate']})")
+    if report["gemini_calls"] is not None:
+        print(f"Chamadas ao Gemini simulado: {report['gemini_calls']}")
+    print(f"Status: {report['status']}")
+    if report["skipped_chained"]:
+        print(f"Não reproduzidas (dependem de cursor ou sessão anterior): "
+              f"{sum(report['skipped_chained'].values())} {report['skipped_chained']}")
+    print("-" * 78)
+    print(f"{'rota':<34}{'n':>6}{'p50':>10}{'p95':>10}{'max':>10}{'grav.p50':>10}"
+          f"{'cpu.p50':>10}{'bytes':>10}{'cache':>8}")
+    for route, stats in report["routes"].items():
+        hit_rate = stats["cache"]["hit_rate"]
+        cpu_p50, mean_bytes = stats["cpu"]["p50_ms"], stats["bytes"]["mean"]
+        print(f"{route[:33]:<34}{stats['count']:>6}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+              f"{stats['max_ms']:>10}{stats['recorded_p50_ms']:>10}"
+              f"{cpu_p50 if cpu_p50 is not None else '-':>10}{mean_bytes if mean_bytes is not None else '-':>10}"
+              f"{hit_rate if hit_rate is not None else '-':>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    # Ambiente do replay: cache frio e isolado, sem aquecimento, gravação ou verificação da Alexa
+    cache_path = os.path.join(tempfile.gettempdir(), f"camara-radar-replay-{os.getpid()}.bin")
+    os.environ["SUPABASE_URL"] = args.supabase_url
+    if args.supabase_key:
+        os.environ["SUPABASE_KEY"] = args.supabase_key
+    os.environ["SHARED_CACHE_PATH"] = cache_path
+    os.environ["CACHE_WARMER_ENABLED"] = "false"
+    os.environ["ALEXA_VERIFY_REQUESTS"] = "false"
+    os.environ.pop("TRACE_RECORD_PATH", None)
+
+    import alexa_endpoints
+    import server
+    from alexa_skill import CONTINUE_INTENTS
+    from shared_cache import shared_cache
+    from tenants import TENANTS
+    from traffic import load_trace
+
+    fake_gemini = None
+    if not args.real_gemini:
+        fake_gemini = FakeGeminiClient(args.gemini_latency_ms)
+        alexa_endpoints.gemini_client = fake_gemini
+
+    entries = load_trace(args.trace)[:args.limit]
+    skipped = Counter(route_label(e) for e in entries if is_chained(e, CONTINUE_INTENTS))
+    entries = [e for e in entries if not is_chained(e, CONTINUE_INTENTS)]
+    if not entries:
+        print("Trace vazio" + (" (só requisições encadeadas)" if skipped else ""))
+        return 1
+
+    local = threading.local()
+    counters_lock = threading.Lock()
+
+    def run(entry) -> Dict:
+        if not hasattr(local, "client"):
+            local.client = server.app.test_client()
+        tenant = TENANTS.get(entry.tenant)
+        path = f"/{tenant.slug}{entry.path}" if tenant else entry.path
+        kwargs = {"headers": {"Accept-Encoding": args.accept_encoding}} if args.accept_encoding else {}
+        if entry.intent:
+            application_id = (tenant and tenant.alexa_skill_id) or os.environ.get("ALEXA_SKILL_ID") or "replay"
+            kwargs["json"] = alexa_envelope(entry.intent, application_id)
+
+        with counters_lock:
+            hits, misses = shared_cache.hits, shared_cache.misses
+        start = time.perf_counter()
+        response = local.client.open(path, method=entry.method, **kwargs)
+        body = response.get_data()  # consome respostas em streaming
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        response.close()
+        with counters_lock:
+            hits, misses = shared_cache.hits - hits, shared_cache.misses - misses
+
+        return {
+            "route": route_label(entry),
+            "status": response.status_code,
+            "ms": elapsed_ms,
+            "recorded_ms": entry.wall_ms,
+            "cpu_ms": server_timing(response.headers.get("Server-Timing"), "cpu"),
+            "recorded_cpu_ms": entry.cpu_ms,
+            "bytes": len(body),
+            "hits": hits,
+            "misses": misses,
+        }
+
+    print(f"Reproduzindo {len(entries)} requisições (velocidade {args.speed or 'máxima'}, "
+          f"concorrência {args.concurrency})...")
+    first_ts = entries[0].ts
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            futures = []
+            for entry in entries:
+                if args.speed > 0:
+                    delay = (entry.ts - first_ts) / args.speed - (time.perf_counter() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+                futures.append(executor.submit(run, entry))
+            results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+    finally:
+        for path in (cache_path, cache_path + ".lock"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    report = build_report(results, elapsed, fake_gemini.calls if fake_gemini else None, dict(skipped))
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Relatório gravado em {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
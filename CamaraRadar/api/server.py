@@ -3,15 +3,142 @@ Servidor Flask simples para endpoints da Alexa
 Pode ser deployado no AWS Lambda usando Serverless Framework ou Zappa
 """
 import os
-from flask import Flask, jsonify, request
+import json
+import time
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 import logging
 from alexa_endpoints import get_daily_summary, get_sessions_summary, get_single_day_summary
+from shared_cache import shared_cache
+import profiling
+from speech_pages import EXPIRED_TEXT, get_page, get_single_day_paginated
+from attendance import get_attendance_summary, get_parliamentarian_attendance
+from voting_stats import get_voting_statistics
+from export import EXPORT_DEFAULT_PAGE_SIZE, decode_cursor, iter_sessions_export, parse_since
+from digests import get_month_digest, get_week_digest
+from materias import get_materia_history
+from alexa_skill import AlexaVerificationError, handle_alexa_request, is_valid_envelope, verify_request
+from cache_warmer import start_cache_warmer, warmers_status
+from http_compression import RAW_BYTES_ENVIRON_KEY, FastJSONProvider, compress_response
+from tenants import TENANTS, TenantMiddleware, all_tenants, bind_iter, current_tenant, set_current_tenant
+from traffic import TraceEntry, trace_recorder
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)  # jsonify com orjson quando disponível
+app.wsgi_app = TenantMiddleware(app.wsgi_app)  # /<slug>/api/... ou Host escolhem a câmara
 CORS(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+start_cache_warmer()
+
+
+@app.before_request
+def start_trace():
+    """Com TRACE_RECORD_PATH, guarda o início da requisição e os contadores do cache"""
+    if trace_recorder:
+        request.environ['camara_radar.trace'] = (
+            time.time(), time.perf_counter(), shared_cache.hits, shared_cache.misses
+        )
+
+
+@app.after_request
+def record_trace(response):
+    """
+    Grava a requisição no trace (roda por último entre os after_request)
+    Acertos/faltas de cache são a variação dos contadores do processo durante a requisição
+    """
+    started = request.environ.get('camara_radar.trace')
+    if started:
+        ts, start, hits, misses = started
+        profile = request.environ.get('camara_radar.profile') or {}
+        query = request.query_string.decode()
+        trace_recorder.record(TraceEntry(
+            ts=ts,
+            method=request.method,
+            path=request.path + (f"?{query}" if query else ""),
+            status=response.status_code,
+            wall_ms=(time.perf_counter() - start) * 1000,
+            cache_hits=shared_cache.hits - hits,
+            cache_misses=shared_cache.misses - misses,
+            tenant=request.environ['camara_radar.tenant'],
+            intent=request.environ.get('camara_radar.intent'),
+            cpu_ms=profile.get('cpu_ms'),
+            bytes_sent=profile.get('bytes'),
+        ))
+    return response
+
+
+@app.before_request
+def select_tenant():
+    """
+    Define a câmara da requisição e reserva uma vaga no limite de concorrência dela
+    O limite vale para todos os workers do host: uma câmara no limite recebe 429 sem
+    ocupar os workers das demais
+    """
+    tenant = TENANTS[request.environ['camara_radar.tenant']]
+    set_current_tenant(tenant)
+    slot = tenant.requests_slots.try_acquire()
+    if slot is None:
+        logger.warning(f"Tenant {tenant.slug} at concurrency limit ({tenant.max_concurrency})")
+        return jsonify({
+            "error": "too many requests",
+            "texto_alexa": "O serviço está ocupado no momento. Tente novamente em instantes."
+        }), 429
+    request.environ['camara_radar.slot'] = slot
+
+
+@app.before_request
+def start_profiling():
+    """
+    Profiling opt-in: cabeçalho X-Profile: 1 (ou ?profile=1) com X-Profile-Token válido
+    Sem pedido, registra apenas os tempos das etapas (e amostra PROFILE_SAMPLE_RATE)
+    """
+    requested = bool(request.headers.get('X-Profile') or request.args.get('profile'))
+    if requested and not profiling.is_authorized(request.headers.get('X-Profile-Token')):
+        requested = False
+    profiling.start_request(requested)
+
+
+@app.after_request
+def finish_profiling(response):
+    bytes_sent = None if response.is_streamed else response.content_length
+    record = profiling.finish_request(
+        request.method, request.path, response.status_code,
+        bytes_sent, request.environ.get(RAW_BYTES_ENVIRON_KEY)
+    )
+    if record:
+        request.environ['camara_radar.profile'] = record  # lido por record_trace
+        response.headers['Server-Timing'] = ", ".join(
+            [f"{span['name']};dur={span['duration_ms']}" for span in record['spans']]
+            + [f"cpu;dur={record['cpu_ms']}", f"total;dur={record['wall_ms']}"]
+        )
+        if record['profiled'] and record['requested']:
+            response.headers['X-Profile-Id'] = record['id']
+    return response
+
+
+@app.after_request
+def compress(response):
+    """
+    Compressão gzip/brotli negociada (registrada depois de finish_profiling, roda antes dele,
+    para que o registro da requisição traga o tamanho já comprimido)
+    """
+    return compress_response(response)
+
+
+@app.teardown_request
+def stop_profiling(error=None):
+    """Garante que o profiler pare mesmo se a requisição falhar antes do after_request"""
+    if error is not None:
+        profiling.finish_request(request.method, request.path, 500)
+
+
+@app.teardown_request
+def release_tenant_slot(error=None):
+    """Libera a vaga da câmara (em streaming, só quando a resposta termina)"""
+    slot = request.environ.pop('camara_radar.slot', None)
+    if slot is not None:
+        TENANTS[request.environ['camara_radar.tenant']].requests_slots.release(slot)
 
 
 @app.route('/health', methods=['GET'])
@@ -29,10 +156,38 @@ def debug_config():
         "supabase_key_configured": bool(os.environ.get("SUPABASE_KEY")),
         "gemini_key_configured": bool(os.environ.get("GEMINI_API_KEY")),
         "gemini_model": os.environ.get("GEMINI_MODEL", "not-set"),
-        "environment": os.environ.get("RENDER", "local")
+        "environment": os.environ.get("RENDER", "local"),
+        "tenant": current_tenant().slug,
+        "tenants": [tenant.describe() for tenant in all_tenants()],
+        "shared_cache": shared_cache.stats(),
+        "cache_warmer": warmers_status()
     })
 
 
+@app.route('/debug/profiles', methods=['GET'])
+def debug_profiles():
+    """Lista as requisições mais lentas deste worker (requer X-Profile-Token)"""
+    if not profiling.is_authorized(request.headers.get('X-Profile-Token')):
+        return jsonify({"error": "unauthorized"}), 401
+    return jsonify({"slowest": profiling.slowest()})
+
+
+@app.route('/debug/profiles/<profile_id>', methods=['GET'])
+def debug_profile(profile_id):
+    """
+    Baixa um perfil gravado (requer X-Profile-Token)
+    ?format=collapsed (flamegraph.pl) ou ?format=speedscope (padrão)
+    """
+    if not profiling.is_authorized(request.headers.get('X-Profile-Token')):
+        return jsonify({"error": "unauthorized"}), 401
+    fmt = request.args.get('format', 'speedscope')
+    content = profiling.load_profile(profile_id, fmt)
+    if content is None:
+        return jsonify({"error": "profile not found"}), 404
+    mimetype = 'application/json' if fmt == 'speedscope' else 'text/plain'
+    return Response(content, mimetype=mimetype)
+
+
 @app.route('/api/resumo', methods=['GET'])
 def resumo():
     """
@@ -86,6 +241,215 @@ def ultimo_dia():
         }), 500
 
 
+@app.route('/api/ultimo-dia/completo', methods=['GET'])
+def ultimo_dia_completo():
+    """
+    Endpoint para a pauta completa do último dia, em trechos falados
+    Retorna o primeiro trecho e um cursor para /api/continuar
+    """
+    try:
+        result = get_single_day_paginated()
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error in /api/ultimo-dia/completo: {e}", exc_info=True)
+        return jsonify({
+            "texto_alexa": "Desculpe, ocorreu um erro ao buscar as informações.",
+            "error": str(e)
+        }), 500
+
+
+@app.route('/api/continuar', methods=['GET'])
+def continuar():
+    """
+    Endpoint para o próximo trecho de uma fala paginada
+    Recebe o cursor retornado pelo trecho anterior (?cursor=...)
+    """
+    page = get_page(request.args.get('cursor', ''))
+    if not page:
+        return jsonify({
+            "texto_alexa": EXPIRED_TEXT,
+            "cursor": None
+        }), 404
+    return jsonify(page)
+
+
+@app.route('/api/semana', methods=['GET'])
+def semana():
+    """
+    Endpoint com o balanço da semana (a partir dos resumos diários)
+    Aceita ?data=AAAA-MM-DD para escolher a semana
+    """
+    try:
+        result = get_week_digest(request.args.get('data'))
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in /api/semana: {e}", exc_info=True)
+        return jsonify({
+            "texto_alexa": "Desculpe, ocorreu um erro ao montar o balanço da semana.",
+            "error": str(e)
+        }), 500
+
+
+@app.route('/api/mes', methods=['GET'])
+def mes():
+    """
+    Endpoint com o balanço do mês (a partir dos resumos diários)
+    Aceita ?mes=AAAA-MM
+    """
+    try:
+        result = get_month_digest(request.args.get('mes'))
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in /api/mes: {e}", exc_info=True)
+        return jsonify({
+            "texto_alexa": "Desculpe, ocorreu um erro ao montar o balanço do mês.",
+            "error": str(e)
+        }), 500
+
+
+@app.route('/api/presenca', methods=['GET'])
+def presenca():
+    """
+    Endpoint com resumo de presença dos vereadores
+    Responde a partir de agregados pré-calculados (atualizados incrementalmente)
+    """
+    try:
+        result = get_attendance_summary()
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error in /api/presenca: {e}", exc_info=True)
+        return jsonify({
+            "texto_alexa": "Desculpe, ocorreu um erro ao buscar a presença dos vereadores.",
+            "error": str(e)
+        }), 500
+
+
+@app.route('/api/vereador/<int:parliamentarian_id>', methods=['GET'])
+def vereador(parliamentarian_id):
+    """
+    Endpoint com a presença de um vereador (por parliamentarian_id)
+    """
+    try:
+        result = get_parliamentarian_attendance(parliamentarian_id)
+        if not result:
+            return jsonify({
+                "texto_alexa": "Não encontrei registros de presença para este vereador."
+            }), 404
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error in /api/vereador/{parliamentarian_id}: {e}", exc_info=True)
+        return jsonify({
+            "texto_alexa": "Desculpe, ocorreu um erro ao buscar a presença do vereador.",
+            "error": str(e)
+        }), 500
+
+
+@app.route('/api/materia/<int:materia_id>', methods=['GET'])
+def materia(materia_id):
+    """
+    Endpoint com o histórico de uma matéria (por materia_id) nas pautas
+    """
+    try:
+        result = get_materia_history(materia_id)
+        if not result:
+            return jsonify({
+                "texto_alexa": "Não encontrei esta matéria nas pautas da câmara."
+            }), 404
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error in /api/materia/{materia_id}: {e}", exc_info=True)
+        return jsonify({
+            "texto_alexa": "Desculpe, ocorreu um erro ao buscar a matéria.",
+            "error": str(e)
+        }), 500
+
+
+@app.route('/api/estatisticas', methods=['GET'])
+def estatisticas():
+    """
+    Endpoint com estatísticas de votação da ordem do dia
+    Aceita ?desde=AAAA-MM para limitar o período
+    """
+    try:
+        result = get_voting_statistics(request.args.get('desde'))
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in /api/estatisticas: {e}", exc_info=True)
+        return jsonify({
+            "texto_alexa": "Desculpe, ocorreu um erro ao calcular as estatísticas.",
+            "error": str(e)
+        }), 500
+
+
+@app.route('/api/exportar/sessoes', methods=['GET'])
+def exportar_sessoes():
+    """
+    Exportação em massa das sessões com pauta, em NDJSON (uma sessão por linha)
+    Parâmetros: ?cursor= (retomar), ?since= (sessão ou pauta alteradas desde), ?page_size=
+    """
+    cursor = request.args.get('cursor')
+    try:
+        if cursor:
+            decode_cursor(cursor)
+        since = parse_since(request.args.get('since'))
+        page_size = int(request.args.get('page_size', EXPORT_DEFAULT_PAGE_SIZE))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return Response(
+        stream_with_context(bind_iter(iter_sessions_export(cursor, since, page_size))),
+        mimetype='application/x-ndjson'
+    )
+
+
+@app.route('/alexa', methods=['POST'])
+def alexa():
+    """
+    Endpoint nativo da Alexa Skill
+    Recebe o envelope JSON da Alexa, verifica a assinatura e responde com SSML
+    """
+    raw_body = request.get_data()
+    try:
+        envelope = json.loads(raw_body)
+    except ValueError:
+        return jsonify({"error": "Invalid JSON body"}), 400
+
+    if not is_valid_envelope(envelope):
+        return jsonify({"error": "Invalid Alexa envelope"}), 400
+
+    alexa_request = envelope["request"]
+    request.environ['camara_radar.intent'] = (
+        alexa_request.get("intent", {}).get("name") or alexa_request.get("type")
+    )
+
+    try:
+        verify_request(request.headers, raw_body, envelope)
+    except AlexaVerificationError as e:
+        logger.warning(f"Rejected Alexa request: {e}")
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        return jsonify(handle_alexa_request(envelope))
+    except Exception as e:
+        logger.error(f"Error in /alexa: {e}", exc_info=True)
+        return jsonify({
+            "version": "1.0",
+            "response": {
+                "outputSpeech": {
+                    "type": "PlainText",
+                    "text": "Desculpe, ocorreu um erro ao buscar as informações."
+                },
+                "shouldEndSession": True
+            }
+        })
+
+
 if __name__ == '__main__':
     # Development mode
     port = int(os.environ.get('PORT', 5001))
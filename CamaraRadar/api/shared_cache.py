@@ -0,0 +1,402 @@
+"""
+Cache compartilhado entre os workers do gunicorn (arquivo mapeado em memória)
+Todos os processos do host enxergam as mesmas entradas: um resumo gerado por um
+worker é reaproveitado pelos demais, e só um worker gera cada chave por vez
+
+Layout do arquivo:
+    cabeçalho (64 bytes): magic, versão, número de slots, tamanho do slot
+    slots de tamanho fixo, agrupados em conjuntos de SHARED_CACHE_WAYS (associativo)
+    cada slot: seq | estado | hash | expira_em | último acesso | len(chave) | len(valor) | chave | valor
+
+Leitores não usam lock: conferem o contador `seq` antes e depois da cópia (seqlock)
+e descartam leituras concorrentes a uma escrita. Escritores usam lock por conjunto.
+
+Com várias câmaras (tenants), as chaves ganham o slug da câmara como prefixo e cada
+câmara tem sua própria partição de conjuntos, com `cache_slots` slots (padrão
+SHARED_CACHE_SLOTS): o arquivo cresce com o número de câmaras em vez de dividir um
+tamanho fixo, e o despejo LRU de uma câmara muito acessada nunca remove entradas das outras.
+"""
+import os
+import hashlib
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Union
+import logging
+
+import fast_json
+from tenants import all_tenants, current_tenant
+
+try:
+    import fcntl
+    import mmap
+except ImportError:  # Windows: cai no cache local por processo
+    fcntl = None
+    mmap = None
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+SHARED_CACHE_ENABLED = os.environ.get("SHARED_CACHE_ENABLED", "true").lower() != "false"
+SHARED_CACHE_PATH = os.environ.get(
+    "SHARED_CACHE_PATH", os.path.join(tempfile.gettempdir(), "camara-radar-cache.bin")
+)
+SHARED_CACHE_SLOTS = int(os.environ.get("SHARED_CACHE_SLOTS", "512"))  # Por câmara
+SHARED_CACHE_SLOT_SIZE = int(os.environ.get("SHARED_CACHE_SLOT_SIZE", "65536"))
+SHARED_CACHE_WAYS = 4
+
+MAGIC = b"CRSC"
+LAYOUT_VERSION = 1
+FILE_HEADER = struct.Struct("<4sIII")
+FILE_HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct("<IIQddII")  # seq, estado, hash, expira_em, acesso, len chave, len valor
+SEQ = struct.Struct("<I")
+ACCESS = struct.Struct("<d")
+ACCESS_OFFSET = 24  # posição do campo "último acesso" dentro do slot
+GENERATION_LOCK_STRIPES = 1024
+NESTED_GENERATION_WAIT = float(os.environ.get("NESTED_GENERATION_WAIT", "5"))
+READ_RETRIES = 3
+
+EMPTY, USED = 0, 1
+
+
+# TTL fixo ou calculado a partir do valor (ex.: textos de fallback expiram antes)
+TTL = Union[float, Callable[[Any], float]]
+
+
+def _resolve_ttl(ttl: TTL, value: Any) -> float:
+    return ttl(value) if callable(ttl) else ttl
+
+
+def _key_hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+class SharedCache:
+    """
+    Cache chave -> valor JSON com TTL, tamanho fixo e despejo LRU por conjunto
+    Sem fcntl/mmap (ou com SHARED_CACHE_ENABLED=false) usa um LRU local ao processo
+    `partitions` (slug -> slots) vem das câmaras configuradas; `slots` é o padrão de cada uma
+    """
+
+    def __init__(self, path: str, slots: int, slot_size: int, enabled: bool = True,
+                 partitions: Optional[Dict[str, int]] = None):
+        self.path = path
+        self.ways = SHARED_CACHE_WAYS
+        if partitions is None:
+            partitions = {tenant.slug: tenant.cache_slots or slots for tenant in all_tenants()}
+        # slug -> (primeiro conjunto, número de conjuntos)
+        self._partitions: Dict[str, tuple] = {}
+        first_set = 0
+        for slug, partition_slots in partitions.items():
+            partition_sets = max(1, int(partition_slots) // self.ways)
+            self._partitions[slug] = (first_set, partition_sets)
+            first_set += partition_sets
+        self.sets = max(1, first_set)
+        self.slot_size = slot_size
+        self.payload_size = slot_size - SLOT_HEADER.size
+        self.shared = enabled and fcntl is not None
+        self.hits = 0
+        self.misses = 0
+
+        self._pid = None
+        self._fd = None
+        self._map = None
+        self._open_lock = threading.Lock()
+        # fcntl só exclui outros processos; threads do mesmo processo usam estes locks
+        self._set_locks = [threading.Lock() for _ in range(min(self.sets, GENERATION_LOCK_STRIPES))]
+        self._generation_locks = [threading.Lock() for _ in range(GENERATION_LOCK_STRIPES)]
+        self._generation_fd = None
+        self._held = threading.local()  # stripes de geração mantidos por este thread
+
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()
+        self._local_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Arquivo mapeado
+    # ------------------------------------------------------------------
+
+    def _ensure_open(self) -> bool:
+        """Abre (ou reabre após fork) o arquivo mapeado; False se indisponível"""
+        if not self.shared:
+            return False
+        if self._pid == os.getpid():
+            return True
+
+        with self._open_lock:
+            if self._pid == os.getpid():
+                return True
+            try:
+                size = FILE_HEADER_SIZE + self.sets * self.ways * self.slot_size
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                fcntl.lockf(fd, fcntl.LOCK_EX, FILE_HEADER_SIZE, 0)
+                try:
+                    header = os.pread(fd, FILE_HEADER.size, 0)
+                    expected = FILE_HEADER.pack(MAGIC, LAYOUT_VERSION, self.sets * self.ways, self.slot_size)
+                    if header != expected or os.fstat(fd).st_size != size:
+                        # Arquivo novo ou com layout diferente: recria vazio
+                        os.ftruncate(fd, 0)
+                        os.ftruncate(fd, size)
+                        os.pwrite(fd, expected, 0)
+                finally:
+                    fcntl.lockf(fd, fcntl.LOCK_UN, FILE_HEADER_SIZE, 0)
+
+                self._map = mmap.mmap(fd, size)
+                self._fd = fd
+                self._generation_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+                self._pid = os.getpid()
+                logger.info(f"Shared cache mapped at {self.path} ({size // 1024} KiB)")
+                return True
+            except OSError as e:
+                logger.error(f"Could not open shared cache, using process-local cache: {e}")
+                self.shared = False
+                return False
+
+    def _slot_offset(self, set_index: int, way: int) -> int:
+        return FILE_HEADER_SIZE + (set_index * self.ways + way) * self.slot_size
+
+    def _read_slot(self, offset: int):
+        """Lê um slot de forma consistente; None se estiver sendo escrito"""
+        for _ in range(READ_RETRIES):
+            seq = SEQ.unpack_from(self._map, offset)[0]
+            if seq % 2:
+                time.sleep(0)
+                continue
+            header = SLOT_HEADER.unpack_from(self._map, offset)
+            key_len, value_len = header[5], header[6]
+            start = offset + SLOT_HEADER.size
+            data = self._map[start:start + key_len + value_len]
+            if SEQ.unpack_from(self._map, offset)[0] == seq:
+                return header, data[:key_len], data[key_len:]
+        return None
+
+    def _set_index(self, key_hash: int) -> int:
+        """Conjunto da chave dentro da partição da câmara atual"""
+        first_set, partition_sets = self._partitions.get(current_tenant().slug, (0, self.sets))
+        return first_set + key_hash % partition_sets
+
+    def _shared_get(self, key: bytes, now: float) -> Optional[bytes]:
+        key_hash = _key_hash(key)
+        set_index = self._set_index(key_hash)
+        for way in range(self.ways):
+            offset = self._slot_offset(set_index, way)
+            slot = self._read_slot(offset)
+            if not slot:
+                continue
+            header, slot_key, value = slot
+            if header[1] == USED and header[2] == key_hash and slot_key == key and header[3] > now:
+                ACCESS.pack_into(self._map, offset + ACCESS_OFFSET, now)
+                return value
+        return None
+
+    def _shared_put(self, key: bytes, value: bytes, expires_at: float, now: float) -> None:
+        key_hash = _key_hash(key)
+        set_index = self._set_index(key_hash)
+        lock_offset = self._slot_offset(set_index, 0)
+
+        with self._set_locks[set_index % len(self._set_locks)]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self.slot_size * self.ways, lock_offset)
+            try:
+                # Mesma chave > slot vazio ou expirado > menos usado recentemente
+                victim, victim_score = 0, None
+                for way in range(self.ways):
+                    offset = self._slot_offset(set_index, way)
+                    header = SLOT_HEADER.unpack_from(self._map, offset)
+                    start = offset + SLOT_HEADER.size
+                    if header[1] == USED and header[2] == key_hash and self._map[start:start + header[5]] == key:
+                        victim = way
+                        break
+                    score = -1.0 if header[1] != USED or header[3] <= now else header[4]
+                    if victim_score is None or score < victim_score:
+                        victim, victim_score = way, score
+
+                offset = self._slot_offset(set_index, victim)
+                seq = SEQ.unpack_from(self._map, offset)[0]
+                SEQ.pack_into(self._map, offset, seq + 1)  # ímpar: escrita em andamento
+                start = offset + SLOT_HEADER.size
+                self._map[start:start + len(key) + len(value)] = key + value
+                SLOT_HEADER.pack_into(self._map, offset, seq + 1, USED, key_hash, expires_at, now, len(key), len(value))
+                SEQ.pack_into(self._map, offset, seq + 2)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.slot_size * self.ways, lock_offset)
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _namespaced(key: str) -> str:
+        return f"{current_tenant().slug}|{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        """Retorna o valor em cache (ou None se ausente/expirado)"""
+        return self._lookup(key, count=True)
+
+    def _lookup(self, key: str, count: bool) -> Optional[Any]:
+        """get com contagem opcional: a releitura sob o lock de geração não é outro acesso"""
+        key = self._namespaced(key)
+        now = time.time()
+        if self._ensure_open():
+            raw = self._shared_get(key.encode(), now)
+        else:
+            with self._local_lock:
+                entry = self._local.get(key)
+                if entry and entry[0] > now:
+                    self._local.move_to_end(key)
+                    raw = entry[1]
+                else:
+                    raw = None
+
+        if raw is None:
+            if count:
+                self.misses += 1
+            return None
+        if count:
+            self.hits += 1
+        return fast_json.loads(raw)
+
+    def put(self, key: str, value: Any, ttl: float) -> bool:
+        """Grava o valor; False se não couber em um slot"""
+        raw = fast_json.dumps_bytes(value)
+        key = self._namespaced(key)
+        key_bytes = key.encode()
+        if len(key_bytes) + len(raw) > self.payload_size:
+            logger.warning(f"Shared cache value too large for key {key} ({len(raw)} bytes)")
+            return False
+
+        now = time.time()
+        if self._ensure_open():
+            self._shared_put(key_bytes, raw, now + ttl, now)
+        else:
+            with self._local_lock:
+                self._local[key] = (now + ttl, raw)
+                self._local.move_to_end(key)
+                while len(self._local) > self.sets * self.ways:
+                    self._local.popitem(last=False)
+        return True
+
+    def _held_stripes(self) -> set:
+        stripes = getattr(self._held, "stripes", None)
+        if stripes is None:
+            stripes = self._held.stripes = set()
+        return stripes
+
+    def _acquire_generation(self, stripe: int, wait: Optional[float]) -> bool:
+        """
+        Exclusão entre threads (Lock) e entre processos (fcntl) para o stripe
+        wait=None espera indefinidamente; com prazo, desiste e retorna False
+        """
+        if not self._generation_locks[stripe].acquire(timeout=-1 if wait is None else wait):
+            return False
+        if not self._ensure_open():
+            return True
+        if wait is None:
+            fcntl.lockf(self._generation_fd, fcntl.LOCK_EX, 1, stripe)
+            return True
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                fcntl.lockf(self._generation_fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, stripe)
+                return True
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self._generation_locks[stripe].release()
+                    return False
+                time.sleep(0.01)
+
+    def _release_generation(self, stripe: int) -> None:
+        if self._ensure_open():
+            fcntl.lockf(self._generation_fd, fcntl.LOCK_UN, 1, stripe)
+        self._generation_locks[stripe].release()
+
+    def _compute_and_put(self, key: str, compute: Callable[[], Any], ttl: TTL,
+                         cache_if: Optional[Callable[[Any], bool]]) -> Any:
+        value = compute()
+        if cache_if is None or cache_if(value):
+            self.put(key, value, _resolve_ttl(ttl, value))
+        return value
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: TTL,
+                       cache_if: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Retorna o valor em cache ou calcula e grava
+        Só um processo/thread calcula cada chave por vez; os demais esperam e leem o resultado
+        `ttl` pode ser uma função do valor calculado
+
+        Funções em cache chamam outras (resumo:ultimo_dia -> supabase:ultimo_dia). Se a chave
+        interna cair no stripe que o thread já detém, calcula direto (o fcntl é por processo e
+        um segundo lock/unlock soltaria o externo). Em outro stripe, a espera é limitada por
+        NESTED_GENERATION_WAIT: dois geradores aninhados em ordem inversa não travam, no pior
+        caso calculam a mesma chave duas vezes.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        stripe = _key_hash(self._namespaced(key).encode()) % GENERATION_LOCK_STRIPES
+        held = self._held_stripes()
+        if stripe in held:
+            return self._compute_and_put(key, compute, ttl, cache_if)
+
+        if not self._acquire_generation(stripe, NESTED_GENERATION_WAIT if held else None):
+            logger.warning(f"Timed out waiting for nested cache generation of {key}, computing anyway")
+            return self._compute_and_put(key, compute, ttl, cache_if)
+
+        held.add(stripe)
+        try:
+            value = self._lookup(key, count=False)
+            if value is not None:
+                return value
+            return self._compute_and_put(key, compute, ttl, cache_if)
+        finally:
+            held.discard(stripe)
+            self._release_generation(stripe)
+
+    def stats(self) -> dict:
+        """Contadores deste processo"""
+        total = self.hits + self.misses
+        return {
+            "shared": self.shared,
+            "path": self.path if self.shared else None,
+            "slots": self.sets * self.ways,
+            "slot_size": self.slot_size,
+            "partitions": {slug: sets * self.ways for slug, (_, sets) in self._partitions.items()},
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
+
+
+shared_cache = SharedCache(SHARED_CACHE_PATH, SHARED_CACHE_SLOTS, SHARED_CACHE_SLOT_SIZE, SHARED_CACHE_ENABLED)
+
+
+def shared_cached(prefix: str, ttl: TTL, cache_if: Optional[Callable[[Any], bool]] = None):
+    """
+    Decorator: guarda o retorno da função no cache compartilhado
+    A chave é o prefixo seguido dos argumentos (ex.: "supabase:sessoes_recentes:days=1:limit=5")
+    `func.refresh(...)` recalcula e regrava a entrada, ignorando o cache; `cache_ttl=`
+    substitui a validade do decorator (ex.: o aquecimento guarda até a próxima sessão)
+    """
+    def decorator(func):
+        def make_key(args, kwargs) -> str:
+            parts = [str(a) for a in args] + [f"{k}={v}" for k, v in sorted(kwargs.items())]
+            return ":".join([prefix, *parts])
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return shared_cache.get_or_compute(make_key(args, kwargs), lambda: func(*args, **kwargs), ttl, cache_if)
+
+        def refresh(*args, cache_ttl: Optional[TTL] = None, **kwargs):
+            value = func(*args, **kwargs)
+            if cache_if is None or cache_if(value):
+                value_ttl = ttl if cache_ttl is None else cache_ttl
+                shared_cache.put(make_key(args, kwargs), value, _resolve_ttl(value_ttl, value))
+            return value
+
+        wrapper.refresh = refresh
+        wrapper.uncached = func
+        return wrapper
+    return decorator
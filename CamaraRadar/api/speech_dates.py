@@ -0,0 +1,27 @@
+"""
+Datas faladas pela Alexa ("6 de janeiro de 2025")
+Usado pelos trechos paginados, pelos balanços e pelo histórico de matérias
+"""
+from datetime import date
+from typing import Optional, Union
+
+MESES = [
+    "janeiro", "fevereiro", "março", "abril", "maio", "junho",
+    "julho", "agosto", "setembro", "outubro", "novembro", "dezembro"
+]
+
+
+def speakable_date(value: Optional[Union[str, date]], with_year: bool = True) -> str:
+    """
+    Converte data ISO (ou data/hora, só o dia conta) em '6 de janeiro de 2025'
+    Sem o ano: '6 de janeiro'
+    """
+    if isinstance(value, date):
+        day = value
+    else:
+        try:
+            day = date.fromisoformat((value or "")[:10])
+        except ValueError:
+            return "data não informada"
+    text = f"{day.day} de {MESES[day.month - 1]}"
+    return f"{text} de {day.year}" if with_year else text
@@ -0,0 +1,169 @@
+"""
+Modo de fala paginado ("continuar ouvindo")
+O conteúdo completo do dia é processado uma única vez, dividido em trechos falados
+e guardado no cache compartilhado sob um cursor; cada "continuar" devolve o próximo
+trecho, qualquer que seja o worker que atenda a requisição
+"""
+import os
+import secrets
+import textwrap
+from typing import Dict, List, Optional
+import logging
+
+from alexa_endpoints import get_last_day_sessions
+from materias import lookup_materia
+from shared_cache import shared_cache
+from speech_dates import speakable_date
+from tenants import current_tenant
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+SPEECH_CHUNK_CHARS = int(os.environ.get("SPEECH_CHUNK_CHARS", "700"))  # ~45s de fala por trecho
+SPEECH_PAGES_TTL = int(os.environ.get("SPEECH_PAGES_TTL", "1800"))  # segundos
+
+CONTINUE_PROMPT = "Diga continuar para ouvir mais."
+EXPIRED_TEXT = "Não há mais conteúdo para continuar. Peça um novo resumo para começar de novo."
+
+
+def _sentence(text: str) -> str:
+    """Normaliza espaços e garante pontuação final"""
+    text = " ".join((text or "").split())
+    if text and text[-1] not in ".!?":
+        text += "."
+    return text
+
+
+def build_day_sentences(sessions: List[Dict]) -> List[str]:
+    """
+    Converte todas as sessões do dia e todos os itens de pauta em frases faladas
+    Diferente de format_sessions_for_llm, não descarta nenhum item nem encurta ementas;
+    matérias identificadas são anunciadas pelo rótulo do cache de matérias
+    """
+    sentences = []
+    seen_materias = set()
+    if len(sessions) > 1:
+        sentences.append(f"Foram realizadas {len(sessions)} sessões neste dia.")
+
+    for session in sessions:
+        sentences.append(_sentence(
+            f"Sessão {session.get('type', '').lower() or 'sem tipo informado'}, "
+            f"realizada em {speakable_date(session.get('opening_date', ''))}"
+        ))
+
+        ordem_dia = session.get("ordem_dia", [])
+        if not ordem_dia:
+            sentences.append("Pauta não disponível para esta sessão.")
+            continue
+
+        sentences.append(f"A pauta teve {len(ordem_dia)} itens.")
+        for i, item in enumerate(ordem_dia, 1):
+            texto = (item.get("ementa") or "").strip() or (item.get("content") or "").strip()
+            materia = lookup_materia(item)
+            if materia and materia["materia_id"] in seen_materias:
+                item_text = _sentence(f"Item {i}: {materia['rotulo']}, já mencionado")
+            elif materia:
+                seen_materias.add(materia["materia_id"])
+                item_text = _sentence(f"Item {i}, {materia['rotulo']}: {texto}")
+            elif texto:
+                item_text = _sentence(f"Item {i}: {texto}")
+            else:
+                continue
+            resultado = (item.get("result") or "").strip()
+            if resultado and resultado != "-":
+                item_text += " " + _sentence(f"Resultado: {resultado}")
+            sentences.append(item_text)
+
+    return sentences
+
+
+def split_into_chunks(sentences: List[str], max_chars: int = SPEECH_CHUNK_CHARS) -> List[str]:
+    """
+    Agrupa frases em trechos de até max_chars caracteres
+    Frases maiores que o limite são quebradas em fronteiras de palavra (e palavras
+    maiores que o limite, no meio, sem perder texto)
+    """
+    chunks = []
+    current = ""
+
+    for sentence in sentences:
+        pieces = [sentence]
+        if len(sentence) > max_chars:
+            pieces = textwrap.wrap(sentence, max_chars, break_on_hyphens=False)
+
+        for piece in pieces:
+            piece = piece.strip()
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}".strip()
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _page_key(token: str, index: int) -> str:
+    return f"fala:{token}:{index}"
+
+
+def _store(chunks: List[str]) -> str:
+    """Guarda cada trecho sob (token, índice) e retorna o token"""
+    token = secrets.token_urlsafe(12)
+    for index, chunk in enumerate(chunks):
+        shared_cache.put(_page_key(token, index), {"texto": chunk, "total": len(chunks)}, SPEECH_PAGES_TTL)
+    return token
+
+
+def _page_response(token: str, text: str, index: int, total: int) -> Dict:
+    """Monta a resposta de um trecho com o cursor do próximo"""
+    has_more = index + 1 < total
+    if has_more:
+        text += " " + CONTINUE_PROMPT
+    return {
+        "texto_alexa": text,
+        "pagina": index + 1,
+        "total_paginas": total,
+        "cursor": f"{token}.{index + 1}" if has_more else None
+    }
+
+
+def get_page(cursor: str) -> Optional[Dict]:
+    """
+    Retorna o trecho apontado pelo cursor, em tempo constante
+    Retorna None se o cursor for inválido ou tiver expirado
+    """
+    token, _, index_str = (cursor or "").rpartition(".")
+    if not token or not index_str.isdigit():
+        return None
+
+    index = int(index_str)
+    page = shared_cache.get(_page_key(token, index))
+    if not page:
+        return None
+    return _page_response(token, page["texto"], index, page["total"])
+
+
+def get_single_day_paginated() -> Dict:
+    """
+    Processa o conteúdo completo do último dia com sessões e retorna o primeiro trecho
+    Os demais trechos ficam guardados e são obtidos via get_page(cursor)
+    """
+    sessions = get_last_day_sessions()
+    if not sessions:
+        return {
+            "texto_alexa": f"Não encontrei sessões recentes na {current_tenant().name}.",
+            "pagina": 0,
+            "total_paginas": 0,
+            "cursor": None
+        }
+
+    chunks = split_into_chunks(build_day_sentences(sessions))
+    token = _store(chunks)
+    logger.info(f"Stored {len(chunks)} speech pages for {len(sessions)} sessions")
+
+    result = _page_response(token, chunks[0], 0, len(chunks))
+    result["sessions_count"] = len(sessions)
+    result["date"] = sessions[0].get("opening_date", "").split("T")[0]
+    return result
@@ -0,0 +1,85 @@
+"""
+Acesso compartilhado à API REST (PostgREST) do Supabase
+Usado pelos módulos de análise que fazem leituras em lote
+Cada câmara (tenant) usa seu próprio projeto Supabase e seu próprio pool de conexões
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Type, Union
+import logging
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+import fast_json
+from records import Record
+from tenants import current_tenant
+
+logger = logging.getLogger(__name__)
+
+# Lista de tuplas permite repetir a mesma coluna (ex.: intervalo de datas)
+Params = Union[Dict[str, str], Sequence[Tuple[str, str]]]
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def is_configured() -> bool:
+    """Indica se as credenciais do Supabase da câmara atual estão configuradas"""
+    return current_tenant().supabase_configured
+
+
+def supabase_headers() -> Dict[str, str]:
+    """Cabeçalhos de autenticação do Supabase da câmara atual"""
+    key = current_tenant().supabase_key
+    return {
+        "apikey": key,
+        "Authorization": f"Bearer {key}",
+        "Content-Type": "application/json"
+    }
+
+
+def supabase_get(table: str, params: Params, timeout: int = 30) -> List[Dict]:
+    """
+    Faz GET em uma tabela do Supabase e retorna as linhas
+    Lança exceção em caso de erro (o chamador decide o fallback)
+    """
+    tenant = current_tenant()
+    response = tenant.http.get(
+        f"{tenant.supabase_url}/rest/v1/{table}",
+        headers=supabase_headers(),
+        params=params,
+        timeout=timeout
+    )
+    response.raise_for_status()
+    return fast_json.loads(response.content)
+
+
+def supabase_stream(table: str, params: Params, record: Optional[Type[Record]] = None,
+                    timeout: int = 30) -> Iterator:
+    """
+    Como supabase_get, mas lê a resposta aos poucos e devolve uma linha por vez
+    (ou um registro compacto, se `record` for informado), sem montar a lista inteira
+    Usa ijson quando instalado; senão, o leitor incremental de fast_json
+    A conexão volta ao pool quando o gerador é esgotado ou fechado
+    """
+    tenant = current_tenant()
+    with tenant.http.get(
+        f"{tenant.supabase_url}/rest/v1/{table}",
+        headers=supabase_headers(),
+        params=params,
+        timeout=timeout,
+        stream=True
+    ) as response:
+        response.raise_for_status()
+        if ijson:
+            response.raw.decode_content = True
+            rows = ijson.items(response.raw, "item", use_float=True)
+        else:
+            rows = fast_json.iter_array(response.iter_content(STREAM_CHUNK_SIZE))
+        for row in rows:
+            yield record.from_row(row) if record else row
+
+
+def in_filter(values: Iterable) -> str:
+    """Monta filtro PostgREST 'in.(a,b,c)'"""
+    return "in.(" + ",".join(str(v) for v in values) + ")"
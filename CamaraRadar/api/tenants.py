@@ -0,0 +1,272 @@
+"""
+Suporte a várias câmaras municipais (tenants) em um único deploy
+Cada câmara tem seu próprio Supabase (com pool de conexões próprio), nome usado nos
+prompts e textos, partição do cache compartilhado e orçamentos de concorrência e de LLM,
+para que uma câmara muito acessada não prejudique as demais
+
+Configuração: TENANTS_FILE (caminho de um JSON) ou TENANTS_JSON (o próprio JSON) com uma lista:
+    [{"slug": "campina-grande", "name": "Câmara Municipal de Campina Grande",
+      "supabase_url_env": "CG_SUPABASE_URL", "supabase_key_env": "CG_SUPABASE_KEY",
+      "hosts": ["cg.camararadar.com.br"], "max_concurrency": 8, "llm_per_minute": 30,
+      "cache_slots": 512}]
+Sem configuração, há um único tenant montado a partir de SUPABASE_URL/SUPABASE_KEY.
+O tenant é escolhido pelo prefixo do caminho (/campina-grande/api/...) ou pelo Host.
+"""
+import os
+import json
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import fcntl
+except ImportError:  # Windows: limite apenas por processo
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+DEFAULT_TENANT_SLUG = os.environ.get("DEFAULT_TENANT", "campina-grande")
+DEFAULT_TENANT_NAME = "Câmara Municipal de Campina Grande"
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_LLM_PER_MINUTE = 30
+DEFAULT_POOL_SIZE = 10
+TENANT_SLOTS_DIR = os.environ.get("TENANT_SLOTS_DIR", tempfile.gettempdir())
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Limite de taxa: até `capacity` usos, repostos continuamente ao longo de um minuto"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = max(1, per_minute)
+        self.tokens = float(self.capacity)
+        self.rate = self.capacity / 60
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class ConcurrencySlots:
+    """
+    Limite de requisições simultâneas de uma câmara somado entre todos os workers do host
+    Cada vaga é um byte de um arquivo travado com fcntl: com workers síncronos do gunicorn
+    (uma requisição por processo) um semáforo local nunca chegaria ao limite. Se o worker
+    morrer, o sistema libera as vagas dele. Threads do mesmo processo (o fcntl é por processo)
+    são separadas pelo conjunto de vagas ocupadas localmente.
+    """
+
+    def __init__(self, path: str, limit: int):
+        self.path = path
+        self.limit = max(1, limit)
+        self._held: set = set()
+        self._lock = threading.Lock()
+        self._fd = None
+        self._pid = None
+
+    def _ensure_open(self) -> bool:
+        if fcntl is None:
+            return False
+        if self._pid != os.getpid():
+            # Após o fork, as travas do pai não valem no filho: recomeça com o próprio descritor
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._pid = os.getpid()
+            self._held = set()
+        return True
+
+    def try_acquire(self) -> Optional[int]:
+        """Índice da vaga reservada, ou None se a câmara já está no limite"""
+        with self._lock:
+            shared = self._ensure_open()
+            for slot in range(self.limit):
+                if slot in self._held:
+                    continue
+                if shared:
+                    try:
+                        fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, slot)
+                    except OSError:
+                        continue  # ocupada por outro worker
+                self._held.add(slot)
+                return slot
+            return None
+
+    def release(self, slot: int) -> None:
+        with self._lock:
+            if slot not in self._held:
+                return
+            self._held.discard(slot)
+            if self._ensure_open():
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, slot)
+
+
+class Tenant:
+    """Configuração e recursos isolados de uma câmara"""
+
+    def __init__(self, config: Dict, index: int):
+        self.index = index
+        self.slug = config["slug"]
+        self.name = config.get("name") or DEFAULT_TENANT_NAME
+        self.supabase_url = config.get("supabase_url") or os.environ.get(config.get("supabase_url_env", ""), "")
+        self.supabase_key = config.get("supabase_key") or os.environ.get(config.get("supabase_key_env", ""), "")
+        self.hosts = [h.lower() for h in config.get("hosts", [])]
+        self.alexa_skill_id = config.get("alexa_skill_id")
+        self.max_concurrency = int(config.get("max_concurrency", DEFAULT_MAX_CONCURRENCY))
+        self.llm_budget = TokenBucket(int(config.get("llm_per_minute", DEFAULT_LLM_PER_MINUTE)))
+        self.requests_slots = ConcurrencySlots(
+            os.path.join(TENANT_SLOTS_DIR, f"camara-radar-slots-{self.slug}.lock"), self.max_concurrency
+        )
+        self.cache_slots = config.get("cache_slots")  # None: SHARED_CACHE_SLOTS
+
+        # Pool de conexões próprio: pool_block faz o tenant esperar só pelas próprias conexões
+        pool_size = int(config.get("pool_size", DEFAULT_POOL_SIZE))
+        self.http = requests.Session()
+        self.http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True))
+        self.http.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True))
+
+    @property
+    def supabase_configured(self) -> bool:
+        return bool(self.supabase_url and self.supabase_key)
+
+    def describe(self) -> Dict:
+        return {
+            "slug": self.slug,
+            "name": self.name,
+            "hosts": self.hosts,
+            "supabase_configured": self.supabase_configured,
+            "max_concurrency": self.max_concurrency,
+            "cache_slots": self.cache_slots,
+            "llm_per_minute": self.llm_budget.capacity,
+        }
+
+
+def _load_config() -> List[Dict]:
+    raw = os.environ.get("TENANTS_JSON")
+    path = os.environ.get("TENANTS_FILE")
+    if path:
+        with open(path) as f:
+            raw = f.read()
+    if raw:
+        return json.loads(raw)
+    return [{
+        "slug": DEFAULT_TENANT_SLUG,
+        "name": DEFAULT_TENANT_NAME,
+        "supabase_url_env": "SUPABASE_URL",
+        "supabase_key_env": "SUPABASE_KEY",
+    }]
+
+
+TENANTS: Dict[str, Tenant] = {
+    config["slug"]: Tenant(config, index) for index, config in enumerate(_load_config())
+}
+_default_tenant = TENANTS.get(DEFAULT_TENANT_SLUG) or next(iter(TENANTS.values()))
+_by_host = {host: tenant for tenant in TENANTS.values() for host in tenant.hosts}
+_current: ContextVar[Optional[Tenant]] = ContextVar("tenant", default=None)
+
+logger.info(f"Tenants configured: {', '.join(TENANTS)}")
+
+
+def all_tenants() -> List[Tenant]:
+    return list(TENANTS.values())
+
+
+def current_tenant() -> Tenant:
+    """Tenant da requisição atual (ou o padrão, fora de requisições)"""
+    return _current.get() or _default_tenant
+
+
+def set_current_tenant(tenant: Tenant) -> None:
+    _current.set(tenant)
+
+
+@contextmanager
+def use_tenant(tenant: Tenant):
+    """Executa um bloco no contexto de um tenant (ex.: tarefas em segundo plano)"""
+    token = _current.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _current.reset(token)
+
+
+def bind_iter(iterator: Iterator[T]) -> Iterator[T]:
+    """Mantém o tenant atual ao consumir um gerador depois do fim da view (streaming)"""
+    tenant = current_tenant()
+    while True:
+        with use_tenant(tenant):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def bind_tenant(func: Callable[..., T]) -> Callable[..., T]:
+    """Envolve uma função para rodar em outras threads com o tenant atual"""
+    tenant = current_tenant()
+
+    def wrapper(*args, **kwargs):
+        with use_tenant(tenant):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def resolve_tenant(host: str, path: str) -> Tuple[Tenant, str, str]:
+    """
+    Escolhe o tenant pelo prefixo do caminho ou pelo Host
+    Retorna (tenant, prefixo removido, caminho restante)
+    """
+    segments = path.split("/", 2)
+    if len(segments) > 1 and segments[1] in TENANTS:
+        prefix = "/" + segments[1]
+        return TENANTS[segments[1]], prefix, path[len(prefix):] or "/"
+    tenant = _by_host.get((host or "").split(":")[0].lower(), _default_tenant)
+    return tenant, "", path
+
+
+class TenantMiddleware:
+    """Middleware WSGI: remove o prefixo do tenant do caminho e registra o tenant no environ"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        tenant, prefix, path = resolve_tenant(environ.get("HTTP_HOST", ""), environ.get("PATH_INFO", ""))
+        if prefix:
+            environ["SCRIPT_NAME"] = environ.get("SCRIPT_NAME", "") + prefix
+            environ["PATH_INFO"] = path
+        environ["camara_radar.tenant"] = tenant.slug
+        return self.wsgi_app(environ, start_response)
+
+
+class TenantLocal(Generic[T]):
+    """Uma instância por tenant, criada sob demanda (ex.: índices em memória)"""
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._instances: Dict[str, T] = {}
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        slug = current_tenant().slug
+        instance = self._instances.get(slug)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.setdefault(slug, self._factory())
+        return instance
@@ -0,0 +1,90 @@
+"""
+Testes do endpoint /alexa (envelopes malformados) e da separação das requisições
+encadeadas no replay
+"""
+import pytest
+
+import alexa_skill
+import replay
+from traffic import TraceEntry
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import server
+    monkeypatch.setattr(alexa_skill, "ALEXA_VERIFY_REQUESTS", False)
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize("envelope", [
+    [1],
+    "texto",
+    {"request": None},
+    {"request": {"type": "IntentRequest", "intent": None}},
+    {"session": None, "request": {"type": "LaunchRequest"}},
+    {"context": [], "request": {"type": "LaunchRequest"}},
+    {"context": {"System": "x"}, "request": {"type": "LaunchRequest"}},
+    {"context": {"System": {"application": "x"}}, "request": {"type": "LaunchRequest"}},
+    {"session": {"application": []}, "request": {"type": "LaunchRequest"}},
+    {"session": {"attributes": [1]}, "request": {"type": "IntentRequest", "intent": {"name": "ContinuarIntent"}}},
+])
+def test_malformed_envelope_is_rejected_with_json_400(client, envelope):
+    response = client.post("/alexa", json=envelope)
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid Alexa envelope"}
+
+
+def test_malformed_nested_objects_with_skill_id(client, monkeypatch):
+    monkeypatch.setattr(alexa_skill, "ALEXA_SKILL_ID", "amzn1.ask.skill.teste")
+    for envelope in ({"context": {"System": "x"}, "request": {}}, {"session": {"application": []}, "request": {}}):
+        response = client.post("/alexa", json=envelope)
+        assert response.status_code == 400
+        assert response.is_json
+
+
+def test_null_session_attributes_are_accepted(client):
+    envelope = replay.alexa_envelope("LaunchRequest", "replay")
+    envelope["session"]["attributes"] = None
+    assert client.post("/alexa", json=envelope).status_code == 200
+
+
+@pytest.mark.parametrize("timestamp", ["2026-10-19T10:00:00", "ontem", 12345, None])
+def test_timestamp_without_timezone_or_invalid_is_rejected(client, monkeypatch, timestamp):
+    monkeypatch.setattr(alexa_skill, "ALEXA_VERIFY_REQUESTS", True)
+    envelope = replay.alexa_envelope("LaunchRequest", "replay")
+    envelope["request"]["timestamp"] = timestamp
+    response = client.post("/alexa", json=envelope)
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid request timestamp"}
+
+
+def test_invalid_json_body(client):
+    response = client.post("/alexa", data=b"{", content_type="application/json")
+    assert response.status_code == 400
+
+
+def test_launch_request_is_answered(client):
+    response = client.post("/alexa", json=replay.alexa_envelope("LaunchRequest", "replay"))
+    assert response.status_code == 200
+    assert response.get_json()["version"] == "1.0"
+
+
+def _entry(path, intent=None):
+    return TraceEntry(0.0, "POST" if intent else "GET", path, 200, 1.0, 0, 0, "default", intent)
+
+
+def test_replay_skips_chained_requests():
+    assert replay.is_chained(_entry("/api/continuar?cursor=abc"), alexa_skill.CONTINUE_INTENTS)
+    assert replay.is_chained(_entry("/alexa", "ContinuarIntent"), alexa_skill.CONTINUE_INTENTS)
+    assert replay.is_chained(_entry("/alexa", "AMAZON.NextIntent"), alexa_skill.CONTINUE_INTENTS)
+    assert not replay.is_chained(_entry("/api/ultimo-dia"), alexa_skill.CONTINUE_INTENTS)
+    assert not replay.is_chained(_entry("/alexa", "UltimoDiaIntent"), alexa_skill.CONTINUE_INTENTS)
+
+
+def test_report_lists_skipped_routes_separately():
+    result = {"route": "GET /api/ultimo-dia", "status": 200, "ms": 2.0, "recorded_ms": 3.0, "hits": 1, "misses": 0}
+    skipped = {replay.route_label(_entry("/alexa", "ContinuarIntent")): 2}
+    report = replay.build_report([result], 1.0, None, skipped)
+    assert report["requests"] == 1
+    assert report["skipped_chained"] == {"POST /alexa [ContinuarIntent]": 2}
+    assert "POST /alexa [ContinuarIntent]" not in report["routes"]
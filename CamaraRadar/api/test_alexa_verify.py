@@ -0,0 +1,194 @@
+"""
+Testes da verificação das requisições da Alexa (alexa_skill.verify_request)
+Uma CA de teste substitui o bundle do certifi, e a cadeia é servida por um requests.get
+simulado; a assinatura é feita com a chave do certificado folha, como faz a Alexa
+"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+import alexa_skill
+from alexa_skill import AlexaVerificationError, to_ssml, verify_request
+
+CERT_URL = "https://s3.amazonaws.com/echo.api/echo-api-cert.pem"
+SKILL_ID = "amzn1.ask.skill.teste"
+
+
+def _certificate(subject, issuer, public_key, signing_key, ca, san=None, issuer_key=None):
+    now = datetime.now(timezone.utc)
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, subject)]))
+        .issuer_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, issuer)]))
+        .public_key(public_key)
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=30))
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(public_key), critical=False)
+        .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(issuer_key or public_key), critical=False)
+    )
+    if ca:
+        builder = builder.add_extension(x509.KeyUsage(
+            digital_signature=False, content_commitment=False, key_encipherment=False, data_encipherment=False,
+            key_agreement=False, key_cert_sign=True, crl_sign=True, encipher_only=False, decipher_only=False
+        ), critical=True)
+    else:
+        builder = builder.add_extension(x509.SubjectAlternativeName([x509.DNSName(san)]), critical=False)
+        builder = builder.add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.SERVER_AUTH]), critical=False)
+    return builder.sign(signing_key, hashes.SHA256())
+
+
+@pytest.fixture(scope="module")
+def pki():
+    ca_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    ca = _certificate("CA de teste", "CA de teste", ca_key.public_key(), ca_key, ca=True)
+    leaf_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    leaf = _certificate(alexa_skill.ALEXA_CERT_SAN, "CA de teste", leaf_key.public_key(), ca_key, ca=False,
+                        san=alexa_skill.ALEXA_CERT_SAN, issuer_key=ca_key.public_key())
+    other = _certificate("outro.example.com", "CA de teste", leaf_key.public_key(), ca_key, ca=False,
+                         san="outro.example.com", issuer_key=ca_key.public_key())
+    return SimpleNamespace(ca=ca, leaf=leaf, other=other, key=leaf_key)
+
+
+@pytest.fixture
+def alexa(pki, tmp_path, monkeypatch):
+    """Verificação ligada, CA de teste confiável e downloads da cadeia contados"""
+    bundle = tmp_path / "ca.pem"
+    bundle.write_bytes(pki.ca.public_bytes(serialization.Encoding.PEM))
+    monkeypatch.setattr(alexa_skill.certifi, "where", lambda: str(bundle))
+    monkeypatch.setattr(alexa_skill, "ALEXA_VERIFY_REQUESTS", True)
+    monkeypatch.setattr(alexa_skill, "ALEXA_SKILL_ID", None)
+    monkeypatch.setattr(alexa_skill, "_cert_cache", {})
+    state = SimpleNamespace(chain=pki.leaf, downloads=[])
+
+    def fake_get(url, timeout=None):
+        state.downloads.append(url)
+        pem = state.chain.public_bytes(serialization.Encoding.PEM)
+        return SimpleNamespace(content=pem, raise_for_status=lambda: None)
+
+    monkeypatch.setattr(alexa_skill.requests, "get", fake_get)
+    return state
+
+
+def _envelope(timestamp=None, application_id=SKILL_ID):
+    timestamp = timestamp or datetime.now(timezone.utc)
+    return {
+        "version": "1.0",
+        "context": {"System": {"application": {"applicationId": application_id}}},
+        "request": {"type": "LaunchRequest", "timestamp": timestamp.strftime("%Y-%m-%dT%H:%M:%SZ")},
+    }
+
+
+def _signed(pki, envelope, algorithm=hashes.SHA256()):
+    body = json.dumps(envelope).encode()
+    signature = base64.b64encode(pki.key.sign(body, padding.PKCS1v15(), algorithm)).decode()
+    header = "Signature-256" if isinstance(algorithm, hashes.SHA256) else "Signature"
+    return {"SignatureCertChainUrl": CERT_URL, header: signature}, body
+
+
+def test_valid_signature_is_accepted(pki, alexa):
+    headers, body = _signed(pki, _envelope())
+    verify_request(headers, body, json.loads(body))
+
+
+def test_legacy_sha1_signature_is_accepted(pki, alexa):
+    headers, body = _signed(pki, _envelope(), hashes.SHA1())
+    verify_request(headers, body, json.loads(body))
+
+
+def test_tampered_body_is_rejected(pki, alexa):
+    headers, body = _signed(pki, _envelope())
+    with pytest.raises(AlexaVerificationError, match="signature"):
+        verify_request(headers, body.replace(b"LaunchRequest", b"IntentRequest"), json.loads(body))
+
+
+def test_garbage_signature_is_rejected(pki, alexa):
+    headers, body = _signed(pki, _envelope())
+    headers["Signature-256"] = "não é base64"
+    with pytest.raises(AlexaVerificationError):
+        verify_request(headers, body, json.loads(body))
+
+
+def test_missing_signature_headers(pki, alexa):
+    _, body = _signed(pki, _envelope())
+    with pytest.raises(AlexaVerificationError, match="Missing"):
+        verify_request({"SignatureCertChainUrl": CERT_URL}, body, json.loads(body))
+
+
+@pytest.mark.parametrize("skew, accepted", [(0, True), (140, True), (-140, True), (160, False), (-160, False)])
+def test_timestamp_tolerance(pki, alexa, skew, accepted):
+    envelope = _envelope(datetime.now(timezone.utc) + timedelta(seconds=skew))
+    headers, body = _signed(pki, envelope)
+    if accepted:
+        verify_request(headers, body, envelope)
+    else:
+        with pytest.raises(AlexaVerificationError, match="tolerance"):
+            verify_request(headers, body, envelope)
+
+
+def test_skill_id_mismatch(pki, alexa, monkeypatch):
+    monkeypatch.setattr(alexa_skill, "ALEXA_SKILL_ID", SKILL_ID)
+    headers, body = _signed(pki, _envelope())
+    verify_request(headers, body, json.loads(body))
+
+    envelope = _envelope(application_id="amzn1.ask.skill.outra")
+    headers, body = _signed(pki, envelope)
+    with pytest.raises(AlexaVerificationError, match="application id"):
+        verify_request(headers, body, envelope)
+    assert alexa.downloads == [CERT_URL]  # recusada antes de baixar certificados
+
+
+def test_certificate_without_alexa_san_is_rejected(pki, alexa):
+    alexa.chain = pki.other
+    headers, body = _signed(pki, _envelope())
+    with pytest.raises(AlexaVerificationError, match="certificate chain"):
+        verify_request(headers, body, json.loads(body))
+
+
+def test_validated_certificate_is_cached(pki, alexa):
+    for _ in range(3):
+        headers, body = _signed(pki, _envelope())
+        verify_request(headers, body, json.loads(body))
+    assert alexa.downloads == [CERT_URL]
+
+
+@pytest.mark.parametrize("url", [
+    "http://s3.amazonaws.com/echo.api/echo-api-cert.pem",
+    "https://notamazon.com/echo.api/echo-api-cert.pem",
+    "https://s3.amazonaws.com.evil.com/echo.api/echo-api-cert.pem",
+    "https://s3.amazonaws.com/EcHo.aPi/echo-api-cert.pem",
+    "https://s3.amazonaws.com/invalid.path/echo-api-cert.pem",
+    "https://s3.amazonaws.com/echo.api/../x",
+    "https://s3.amazonaws.com/echo.api/../echo.api.evil/cert.pem",
+    "https://s3.amazonaws.com:563/echo.api/echo-api-cert.pem",
+])
+def test_rejected_certificate_urls(pki, alexa, url):
+    headers, body = _signed(pki, _envelope())
+    headers["SignatureCertChainUrl"] = url
+    with pytest.raises(AlexaVerificationError, match="Certificate URL"):
+        verify_request(headers, body, json.loads(body))
+    assert alexa.downloads == []
+
+
+@pytest.mark.parametrize("url", [
+    "https://s3.amazonaws.com/echo.api/echo-api-cert.pem",
+    "HTTPS://s3.AmazonAWS.com/echo.api/echo-api-cert.pem",
+    "https://s3.amazonaws.com:443/echo.api/echo-api-cert.pem",
+    "https://s3.amazonaws.com/echo.api/../echo.api/echo-api-cert.pem",
+])
+def test_accepted_certificate_urls(url):
+    alexa_skill._validate_cert_url(url)
+
+
+def test_to_ssml_escapes_and_splits_paragraphs():
+    assert to_ssml("**Resumo** de <hoje> & amanhã") == "<speak>Resumo de hoje e amanhã</speak>"
+    assert to_ssml("Primeiro.\n\n## Segundo   parágrafo.") == "<speak><p>Primeiro.</p><p>Segundo parágrafo.</p></speak>"
+    assert to_ssml(None) == "<speak></speak>"
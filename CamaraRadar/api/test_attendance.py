@@ -0,0 +1,153 @@
+"""
+Testes da presença dos vereadores (attendance.py)
+A session_attendance só registra presentes; as faltas vêm do elenco da legislatura
+"""
+import pytest
+
+import attendance
+from attendance import AttendanceIndex
+
+PRESENCA = {  # sessão -> vereadores presentes
+    1: [10, 11, 12],
+    2: [10, 11],
+    3: [10],
+    4: [10, 11],
+}
+
+
+def _sessions(ids, legislature="19ª"):
+    return [
+        {"session_id": s, "opening_date": f"2025-03-{s:02d}T18:00:00",
+         "legislature": legislature, "legislative_session": "1ª Sessão"}
+        for s in ids
+    ]
+
+
+def _rows(presence, first_external_id=1):
+    rows = []
+    for session_id, ids in presence.items():
+        for parliamentarian_id in ids:
+            external_id = first_external_id + len(rows)
+            rows.append({
+                "external_id": external_id, "session_id": session_id,
+                "parliamentarian_id": parliamentarian_id, "parliamentarian_name": f"Vereador {parliamentarian_id}",
+                "present": True, "created_at": f"2025-03-{session_id:02d}T20:00:{external_id % 60:02d}",
+            })
+    return rows
+
+
+@pytest.fixture
+def index(supabase, monkeypatch):
+    monkeypatch.setattr(attendance, "ATTENDANCE_PAGE_SIZE", 2)  # várias páginas por chave
+    supabase.tables["sessions"] = _sessions(PRESENCA)
+    supabase.tables["session_attendance"] = _rows(PRESENCA)
+    index = AttendanceIndex()
+    index.refresh(force=True)
+    return index
+
+
+def test_absences_inferred_from_legislature_roster(index):
+    assert (index.get(10)["presencas"], index.get(10)["ausencias"]) == (4, 0)
+    assert (index.get(11)["presencas"], index.get(11)["ausencias"]) == (3, 1)
+    assert (index.get(12)["presencas"], index.get(12)["ausencias"]) == (1, 3)
+
+
+def test_absence_streaks(index):
+    assert index.get(12)["ausencias_seguidas"] == 3
+    assert index.get(12)["maior_sequencia_ausencias"] == 3
+    assert index.get(11)["ausencias_seguidas"] == 0
+    assert index.get(11)["maior_sequencia_ausencias"] == 1
+    assert index.get(12)["ultima_sessao"] == "2025-03-01"
+
+
+def test_overview_ranks_absences(index):
+    overview = index.overview()
+    assert overview["sessoes_com_presenca"] == 4
+    assert overview["vereadores"] == 3
+    assert [v["parliamentarian_id"] for v in overview["mais_ausencias"]] == [12, 11]
+    assert overview["taxa_media_presenca"] == round((1 + 0.75 + 0.25) / 3, 3)
+
+
+def test_incremental_refresh_updates_streaks(index, supabase):
+    supabase.tables["sessions"] += _sessions([5])
+    supabase.tables["session_attendance"] += _rows({5: [12]}, first_external_id=100)
+    index.refresh(force=True)
+
+    assert index.get(12)["ausencias_seguidas"] == 0
+    assert index.get(12)["maior_sequencia_ausencias"] == 3
+    assert index.get(10)["ausencias"] == 1
+    assert index.get(11)["ausencias_seguidas"] == 1
+    assert index.overview()["sessoes_com_presenca"] == 5
+
+
+def test_rereading_rows_changes_nothing(index, supabase):
+    before = {pid: dict(index.get(pid)) for pid in (10, 11, 12)}
+    index._watermark = None  # relê a tabela inteira
+    index.refresh(force=True)
+    assert {pid: index.get(pid) for pid in (10, 11, 12)} == before
+
+
+def test_new_session_is_applied_without_rebuild(index, supabase, monkeypatch):
+    rebuilds = []
+    monkeypatch.setattr(index, "_rebuild", lambda: rebuilds.append(1))
+    supabase.tables["sessions"] += _sessions([5, 6])
+    supabase.tables["session_attendance"] += _rows({5: [10], 6: [10, 11]}, first_external_id=100)
+    index.refresh(force=True)
+
+    assert rebuilds == []
+    assert (index.get(12)["ausencias"], index.get(12)["ausencias_seguidas"]) == (5, 5)
+    assert index.get(12)["maior_sequencia_ausencias"] == 5
+    assert (index.get(11)["presencas"], index.get(11)["ausencias_seguidas"]) == (4, 0)
+
+
+def test_new_roster_member_triggers_rebuild(index, supabase):
+    supabase.tables["sessions"] += _sessions([5])
+    supabase.tables["session_attendance"] += _rows({5: [10, 13]}, first_external_id=100)
+    index.refresh(force=True)
+    assert (index.get(13)["presencas"], index.get(13)["ausencias"]) == (1, 4)  # faltas retroativas
+    assert index.get(13)["maior_sequencia_ausencias"] == 4
+
+
+def test_late_list_for_older_session_is_ordered(supabase):
+    supabase.tables["sessions"] = _sessions([1, 2, 3])
+    supabase.tables["session_attendance"] = _rows({1: [10, 11], 3: [10]})
+    index = AttendanceIndex()
+    index.refresh(force=True)
+    assert index.get(11)["ausencias_seguidas"] == 1
+
+    late = _rows({2: [10]}, first_external_id=100)  # lista da sessão 2 gravada por último
+    late[0]["created_at"] = "2025-03-10T08:00:00"
+    supabase.tables["session_attendance"] += late
+    index.refresh(force=True)
+    assert index.get(11)["ausencias"] == 2
+    assert index.get(11)["ausencias_seguidas"] == 2
+    assert index.get(11)["maior_sequencia_ausencias"] == 2
+
+
+def test_roster_is_per_legislature(supabase):
+    supabase.tables["sessions"] = _sessions([1, 2]) + _sessions([3], legislature="20ª")
+    supabase.tables["session_attendance"] = _rows({1: [10, 11], 2: [10, 11], 3: [20]})
+    index = AttendanceIndex()
+    index.refresh(force=True)
+    assert index.get(10)["ausencias"] == 0
+    assert index.get(20)["ausencias"] == 0
+
+
+def test_explicit_absence_row_counts_as_absent(supabase):
+    rows = _rows({1: [10, 11]})
+    rows[1]["present"] = False
+    supabase.tables["sessions"] = _sessions([1])
+    supabase.tables["session_attendance"] = rows
+    index = AttendanceIndex()
+    index.refresh(force=True)
+    assert (index.get(11)["presencas"], index.get(11)["ausencias"]) == (0, 1)
+
+
+def test_parliamentarian_text_mentions_streak(index, monkeypatch):
+    monkeypatch.setattr(attendance.attendance_indexes, "get", lambda: index)
+    result = attendance.get_parliamentarian_attendance(12)
+    assert result["ausencias"] == 3
+    assert result["taxa_presenca"] == 0.25
+    assert "Faltou às últimas 3 sessões" in result["texto_alexa"]
+    assert result["por_sessao_legislativa"]["1ª Sessão"]["taxa_presenca"] == 0.25
+    assert attendance.get_parliamentarian_attendance(999) is None
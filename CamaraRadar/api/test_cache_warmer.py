@@ -0,0 +1,145 @@
+"""
+Testes do aquecimento preditivo (cache_warmer.py)
+Calendário aprendido, janelas e validade das entradas aquecidas
+"""
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import alexa_endpoints
+import cache_warmer
+from cache_warmer import WARM_TIMEZONE, CacheWarmer, learn_schedule, next_window
+from shared_cache import shared_cache
+from tenants import current_tenant
+
+TERCA = datetime(2025, 3, 4, tzinfo=WARM_TIMEZONE)  # terça-feira
+
+
+def _session(day, hour=9, hours=3):
+    start = TERCA + timedelta(days=day, hours=hour)
+    return {"opening_date": start.isoformat(), "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=hours)).isoformat()}
+
+
+def test_learn_schedule_keeps_recurring_slots():
+    sessions = [_session(7 * week) for week in range(4)] + [_session(1, hour=15)]  # quarta só uma vez
+    schedule = learn_schedule(sessions)
+    assert schedule == {(1, 9): timedelta(hours=3)}
+
+
+def test_next_window_starts_at_expected_end():
+    schedule = {(1, 9): timedelta(hours=3)}
+    window = next_window(schedule, TERCA + timedelta(hours=8))
+    assert window == (TERCA + timedelta(hours=12), TERCA + timedelta(hours=12 + cache_warmer.WARM_WINDOW_HOURS))
+    assert next_window(schedule, TERCA + timedelta(hours=13)) == window  # janela em andamento
+    assert next_window({}, TERCA) is None
+
+
+def test_warm_ttl_lasts_until_next_window():
+    warmer = CacheWarmer(current_tenant())
+    warmer.schedule = {(1, 9): timedelta(hours=3), (3, 9): timedelta(hours=3)}  # terça e quinta
+    now = TERCA + timedelta(hours=13)  # dentro da janela de terça
+
+    expected = (TERCA + timedelta(days=2, hours=12) - now).total_seconds() + cache_warmer.WARM_POLL_MINUTES * 60
+    assert warmer.warm_ttl(now) == expected
+    assert warmer.warm_ttl(now) > alexa_endpoints.SUMMARY_CACHE_TTL
+
+
+def test_warm_ttl_is_capped(monkeypatch):
+    monkeypatch.setattr(cache_warmer, "WARM_MAX_TTL_HOURS", 24)
+    warmer = CacheWarmer(current_tenant())
+    warmer.schedule = {(1, 9): timedelta(hours=3)}  # semanal
+    assert warmer.warm_ttl(TERCA + timedelta(hours=13)) == 24 * 3600
+    warmer.schedule = {}
+    assert warmer.warm_ttl(TERCA) == 24 * 3600
+
+
+def _ttl(key):
+    expires, _ = shared_cache._local[f"{current_tenant().slug}|{key}"]
+    return expires - time.time()
+
+
+@pytest.fixture
+def last_day(supabase):
+    supabase.tables["sessions"] = [
+        {"session_id": 1, "opening_date": f"{date.today().isoformat()}T09:00:00", "type": "Ordinária", "title": "Sessão"}
+    ]
+    supabase.tables["session_order_of_day"] = [
+        {"external_id": 1, "session_id": 1, "order_number": 1, "materia_id": None,
+         "content": None, "ementa": "Ementa", "result": "Aprovado"}
+    ]
+    return supabase
+
+
+def test_warm_stores_summaries_until_next_window(last_day, monkeypatch):
+    monkeypatch.setattr(alexa_endpoints, "gemini_client", None)
+    warmer = CacheWarmer(current_tenant())
+    monkeypatch.setattr(warmer, "warm_ttl", lambda now: 3 * 24 * 3600)
+    warmer.warm()
+
+    assert _ttl("resumo:ultimo_dia") > 2 * 24 * 3600
+    assert _ttl("supabase:ultimo_dia") > 2 * 24 * 3600
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    assert _ttl("supabase:sessoes_recentes:days=1:limit=5") <= (midnight - now).total_seconds() + 1
+
+
+def test_warmed_llm_fallback_expires_quickly(last_day, monkeypatch):
+    class FailingGemini:
+        models = None
+
+        def __init__(self):
+            self.models = self
+
+        def generate_content(self, model, contents):
+            raise RuntimeError("fora do ar")
+
+    monkeypatch.setattr(alexa_endpoints, "gemini_client", FailingGemini())
+    warmer = CacheWarmer(current_tenant())
+    monkeypatch.setattr(warmer, "warm_ttl", lambda now: 3 * 24 * 3600)
+    warmer.warm()
+
+    assert _ttl("resumo:ultimo_dia") <= alexa_endpoints.FALLBACK_CACHE_TTL
+    assert _ttl("supabase:ultimo_dia") > 2 * 24 * 3600
+
+
+def test_revalidate_rewarms_only_when_data_changed(last_day, monkeypatch):
+    warmer = CacheWarmer(current_tenant())
+    warmed = []
+    monkeypatch.setattr(warmer, "warm", lambda: warmed.append(1))
+    warmer.last_fingerprint = warmer._fingerprint()
+
+    warmer._revalidate()
+    assert warmed == []
+    last_day.tables["session_order_of_day"].append(
+        {"external_id": 2, "session_id": 1, "order_number": 2, "materia_id": None,
+         "content": None, "ementa": "Nova", "result": None}
+    )
+    warmer._revalidate()
+    assert warmed == [1]
+    assert warmer.last_fingerprint == (1, 2)
+
+
+@pytest.mark.parametrize("minutes, expected_waits, revalidations", [(0, [10 * 3600], 0), (60, [3600], 1)])
+def test_loop_revalidates_outside_windows_only_when_enabled(monkeypatch, minutes, expected_waits, revalidations):
+    monkeypatch.setattr(cache_warmer, "WARM_REVALIDATE_MINUTES", minutes)
+    warmer = CacheWarmer(current_tenant())
+    warmer.learned_at = datetime.now(WARM_TIMEZONE)
+    monkeypatch.setattr(warmer, "_acquire_leadership", lambda: True)
+    monkeypatch.setattr(cache_warmer, "next_window",
+                        lambda schedule, now: (now + timedelta(hours=10), now + timedelta(hours=12)))
+    calls, waits = [], []
+    monkeypatch.setattr(warmer, "_revalidate", lambda: calls.append(1))
+
+    def wait(seconds):
+        waits.append(round(seconds))
+        if len(waits) == 1:
+            return False
+        warmer._stop.set()
+        return True
+
+    monkeypatch.setattr(warmer._stop, "wait", wait)
+    warmer._loop()
+    assert waits[:1] == expected_waits
+    assert len(calls) == revalidations
@@ -0,0 +1,169 @@
+"""
+Testes da compressão negociada (http_compression.py) e das métricas de CPU e bytes
+gravadas no trace e resumidas pelo replay
+"""
+import gzip
+import json
+import zlib
+
+import pytest
+from flask import Flask, Response, jsonify, request
+
+import http_compression
+import replay
+from http_compression import RAW_BYTES_ENVIRON_KEY, compress_response
+from traffic import TraceEntry
+
+brotli = pytest.importorskip("brotli")
+
+ROWS = [{"session_id": i, "title": f"Sessão Ordinária {i}", "ementa": "Dispõe sobre " * 20} for i in range(50)]
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.after_request(compress_response)
+    raw_sizes = []
+
+    @app.route("/grande")
+    def big():
+        return jsonify(ROWS)
+
+    @app.route("/pequena")
+    def small():
+        return jsonify({"ok": True})
+
+    @app.route("/texto")
+    def html():
+        return Response("<p>x</p>" * 500, mimetype="text/html")
+
+    @app.route("/export")
+    def export():
+        def lines():
+            for row in ROWS:
+                yield json.dumps(row, ensure_ascii=False) + "\n"
+        return Response(lines(), mimetype="application/x-ndjson")
+
+    @app.teardown_request
+    def keep_raw(error=None):
+        raw_sizes.append(request.environ.get(RAW_BYTES_ENVIRON_KEY))
+
+    client = app.test_client()
+    client.raw_sizes = raw_sizes
+    return client
+
+
+@pytest.mark.parametrize("accept, encoding", [
+    ("br, gzip", "br"),
+    ("gzip, deflate", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("identity", None),
+    (None, None),
+])
+def test_encoding_is_negotiated(client, accept, encoding):
+    headers = {"Accept-Encoding": accept} if accept else {}
+    response = client.get("/grande", headers=headers)
+    assert response.headers.get("Content-Encoding") == encoding
+    assert "Accept-Encoding" in response.headers["Vary"]
+    body = response.get_data()
+    decoded = {"br": brotli.decompress, "gzip": gzip.decompress, None: bytes}[encoding](body)
+    assert json.loads(decoded) == ROWS
+    if encoding:
+        assert len(body) < len(decoded)
+        assert response.content_length == len(body)
+
+
+def test_without_brotli_falls_back_to_gzip(client, monkeypatch):
+    monkeypatch.setattr(http_compression, "brotli", None)
+    response = client.get("/grande", headers={"Accept-Encoding": "br, gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+
+
+def test_responses_below_threshold_are_not_compressed(client, monkeypatch):
+    response = client.get("/pequena", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json() == {"ok": True}
+
+    size = len(response.get_data())
+    monkeypatch.setattr(http_compression, "COMPRESS_MIN_BYTES", size)
+    response = client.get("/pequena", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"  # o limite é inclusivo
+    assert client.raw_sizes[-1] == size
+
+
+def test_other_mimetypes_are_not_compressed(client):
+    response = client.get("/texto", headers={"Accept-Encoding": "br, gzip"})
+    assert "Content-Encoding" not in response.headers
+
+
+@pytest.mark.parametrize("encoding", ["br", "gzip"])
+def test_stream_is_compressed_chunk_by_chunk(client, encoding):
+    response = client.get("/export", headers={"Accept-Encoding": encoding}, buffered=False)
+    assert response.headers["Content-Encoding"] == encoding
+    assert "Content-Length" not in response.headers
+
+    if encoding == "br":
+        decompressor = brotli.Decompressor()
+        decompress = decompressor.process
+    else:
+        decompressor = zlib.decompressobj(31)
+        decompress = decompressor.decompress
+
+    chunks = list(response.response)
+    response.close()
+    assert len(chunks) > len(ROWS) // 2  # não acumulou o corpo
+    text = b""
+    for chunk in chunks[:-1]:
+        text += decompress(chunk)
+        assert text.endswith(b"\n")  # cada trecho decodifica até o fim de uma linha
+    text += decompress(chunks[-1])
+    assert [json.loads(line) for line in text.decode().splitlines()] == ROWS
+
+
+def test_trace_entry_round_trip_with_cpu_and_bytes():
+    entry = TraceEntry(1.5, "GET", "/api/ultimo-dia", 200, 12.5, 1, 0, "default", None, 3.25, 2048)
+    assert TraceEntry.from_line(entry.to_line()) == entry
+    streamed = entry._replace(bytes_sent=None)
+    assert TraceEntry.from_line(streamed.to_line()) == streamed
+
+
+def test_server_records_cpu_and_bytes_in_trace(monkeypatch):
+    import server
+    entries = []
+    monkeypatch.setattr(server, "trace_recorder", type("Recorder", (), {"record": lambda self, e: entries.append(e)})())
+    response = server.app.test_client().get("/health", headers={"Accept-Encoding": "gzip"})
+    entry, = entries
+    assert entry.bytes_sent == len(response.get_data())
+    assert entry.cpu_ms == replay.server_timing(response.headers["Server-Timing"], "cpu")
+
+
+def test_trace_v1_lines_are_still_read():
+    entry = TraceEntry.from_line("1.500\tPOST\t/alexa\t200\t12.500\t0\t2\tdefault\tLaunchRequest\n")
+    assert entry.intent == "LaunchRequest"
+    assert (entry.cpu_ms, entry.bytes_sent) == (None, None)
+
+
+def test_server_timing_parsing():
+    header = "supabase;dur=4.2, cpu;dur=1.75, total;dur=9.0"
+    assert replay.server_timing(header, "cpu") == 1.75
+    assert replay.server_timing(header, "gemini") is None
+    assert replay.server_timing(None, "cpu") is None
+
+
+def test_report_includes_cpu_and_bytes():
+    def result(route, cpu_ms, size, recorded_cpu=None):
+        return {"route": route, "status": 200, "ms": 5.0, "recorded_ms": 6.0, "hits": 0, "misses": 1,
+                "cpu_ms": cpu_ms, "recorded_cpu_ms": recorded_cpu, "bytes": size}
+
+    results = [result("GET /api/a", 2.0, 1000, 3.0), result("GET /api/a", 4.0, 3000, 5.0),
+               result("GET /api/b", None, 500)]
+    report = replay.build_report(results, 1.0, None)
+    assert report["bytes"] == {"total": 4500, "mean": 1500}
+    assert report["cpu"]["p50_ms"] == 2.0
+    route = report["routes"]["GET /api/a"]
+    assert route["cpu"] == {"mean_ms": 3.0, "p50_ms": 2.0, "p95_ms": 4.0}
+    assert route["recorded_cpu_p50_ms"] == 3.0
+    assert route["bytes"] == {"total": 4000, "mean": 2000}
+    assert report["routes"]["GET /api/b"]["cpu"]["mean_ms"] is None
+    replay.print_report(report)
@@ -0,0 +1,153 @@
+"""
+Testes dos balanços semanais e mensais (digests.py)
+Contagem de chamadas ao LLM, validade dos textos de fallback e paginação da pauta
+"""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import alexa_endpoints
+import digests
+from shared_cache import shared_cache
+
+DIAS = ["2025-03-03", "2025-03-05", "2025-03-06"]  # semana encerrada de 3 a 9 de março
+
+
+class FakeGemini:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.prompts = []
+        self.models = self
+
+    def generate_content(self, model, contents):
+        self.prompts.append(contents)
+        if self.fail:
+            raise RuntimeError("Gemini indisponível")
+        return SimpleNamespace(text=f"Resumo {len(self.prompts)}.")
+
+
+@pytest.fixture
+def week(supabase, monkeypatch):
+    supabase.max_rows = 4  # 15 itens de pauta: só chegam todos paginando
+    # Orçamento de LLM da câmara à vontade (o bucket real é compartilhado entre os testes)
+    monkeypatch.setattr(alexa_endpoints.current_tenant().llm_budget, "try_acquire", lambda: True)
+    monkeypatch.setattr(digests, "AGENDA_PAGE_SIZE", 4)
+    supabase.tables["sessions"] = [
+        {"session_id": i, "opening_date": f"{day}T18:00:00", "type": "Ordinária", "title": "Sessão"}
+        for i, day in enumerate(DIAS, 1)
+    ]
+    supabase.tables["session_order_of_day"] = [
+        {"external_id": session_id * 100 + n, "session_id": session_id, "order_number": n,
+         "materia_id": None, "content": None, "ementa": f"Ementa {session_id}.{n}", "result": "Aprovado"}
+        for session_id in range(1, 4) for n in range(1, 6)
+    ]
+    return supabase
+
+
+def _ttls(prefix):
+    now = time.time()
+    return {key.split("|", 1)[1]: expires - now for key, (expires, _) in shared_cache._local.items()
+            if key.split("|", 1)[1].startswith(prefix)}
+
+
+def test_llm_calls_counts_day_summaries_and_reduce(week, monkeypatch):
+    gemini = FakeGemini()
+    monkeypatch.setattr(alexa_endpoints, "gemini_client", gemini)
+
+    digest = digests.get_week_digest("2025-03-05")
+    assert digest["gemini_used"] is True
+    assert digest["llm_calls"] == 4
+    assert digest["dias_com_sessao"] == 3
+    assert all(ttl > digests.SUMMARY_CACHE_TTL for ttl in _ttls("resumo:").values())
+
+    assert digests.get_week_digest("2025-03-05") == digest
+    assert len(gemini.prompts) == 4
+
+
+def test_whole_agenda_reaches_day_summaries(week, monkeypatch):
+    gemini = FakeGemini()
+    monkeypatch.setattr(alexa_endpoints, "gemini_client", gemini)
+    digests.get_week_digest("2025-03-05")
+    day_prompts = [p for p in gemini.prompts if "Ementa" in p]
+    assert len(day_prompts) == 3
+    assert all(f"Ementa {i}.5" in "".join(day_prompts) for i in range(1, 4))
+
+
+def test_failed_llm_is_not_reported_nor_cached_long(week, monkeypatch):
+    monkeypatch.setattr(alexa_endpoints, "gemini_client", FakeGemini(fail=True))
+
+    digest = digests.get_week_digest("2025-03-05")
+    assert digest["gemini_used"] is False
+    assert digest["llm_calls"] == 0
+    assert digest["texto_alexa"].startswith("Na Câmara")  # reduce de fallback, não o do LLM
+    ttls = _ttls("resumo:")
+    assert len(ttls) == 4  # 3 dias + balanço
+    assert all(ttl <= alexa_endpoints.FALLBACK_CACHE_TTL for ttl in ttls.values())
+
+
+def test_recovers_after_fallback_expires(week, monkeypatch):
+    monkeypatch.setattr(alexa_endpoints, "gemini_client", FakeGemini(fail=True))
+    digests.get_week_digest("2025-03-05")
+    shared_cache._local.clear()  # fallback expirado
+
+    gemini = FakeGemini()
+    monkeypatch.setattr(alexa_endpoints, "gemini_client", gemini)
+    assert digests.get_week_digest("2025-03-05")["llm_calls"] == 4
+
+
+def test_exhausted_budget_counts_no_calls(week, monkeypatch):
+    gemini = FakeGemini()
+    monkeypatch.setattr(alexa_endpoints, "gemini_client", gemini)
+    monkeypatch.setattr(alexa_endpoints.current_tenant().llm_budget, "try_acquire", lambda: False)
+
+    digest = digests.get_week_digest("2025-03-05")
+    assert (digest["gemini_used"], digest["llm_calls"]) == (False, 0)
+    assert gemini.prompts == []
+
+
+def test_without_gemini_fallback_is_final(week, monkeypatch):
+    monkeypatch.setattr(alexa_endpoints, "gemini_client", None)
+
+    digest = digests.get_week_digest("2025-03-05")
+    assert (digest["gemini_used"], digest["llm_calls"]) == (False, 0)
+    assert all(ttl > digests.SUMMARY_CACHE_TTL for ttl in _ttls("resumo:").values())
+
+
+def test_cached_day_summaries_are_reused_by_month(week, monkeypatch):
+    gemini = FakeGemini()
+    monkeypatch.setattr(alexa_endpoints, "gemini_client", gemini)
+    digests.get_week_digest("2025-03-05")
+
+    month = digests.get_month_digest("2025-03")
+    assert month["llm_calls"] == 1  # só o reduce do mês
+    assert month["periodo"] == {"inicio": "2025-03-01", "fim": "2025-03-31"}
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        digests.get_week_digest("05/03/2025")
+    with pytest.raises(ValueError):
+        digests.get_month_digest("março")
+
+
+def test_day_summarized_before_agenda_is_not_cached_long(week, monkeypatch):
+    monkeypatch.setattr(alexa_endpoints, "gemini_client", FakeGemini())
+    monkeypatch.setattr(digests, "DIGEST_AGENDA_GRACE_DAYS", 10 ** 5)  # coleta da pauta ainda em aberto
+    week.tables["session_order_of_day"] = [i for i in week.tables["session_order_of_day"] if i["session_id"] != 2]
+
+    digest = digests.get_week_digest("2025-03-05")
+    assert digest["pauta_completa"] is False
+    ttls = _ttls("resumo:")
+    assert ttls.pop("resumo:dia:2025-03-05") <= digests.SUMMARY_CACHE_TTL
+    assert [ttl <= digests.SUMMARY_CACHE_TTL for ttl in ttls.values()].count(True) == 1  # o balanço
+    assert sum(ttl > digests.SUMMARY_CACHE_TTL for ttl in ttls.values()) == 2  # dias 3 e 6
+
+
+def test_day_without_agenda_settles_after_grace_period(week, monkeypatch):
+    monkeypatch.setattr(alexa_endpoints, "gemini_client", FakeGemini())
+    week.tables["session_order_of_day"] = [i for i in week.tables["session_order_of_day"] if i["session_id"] != 2]
+
+    digest = digests.get_week_digest("2025-03-05")
+    assert digest["pauta_completa"] is True
+    assert all(ttl > digests.SUMMARY_CACHE_TTL for ttl in _ttls("resumo:").values())
@@ -0,0 +1,106 @@
+"""
+Testes da exportação NDJSON (export.py)
+Cursores, retomada, paginação da pauta e o filtro since
+"""
+import json
+
+import pytest
+
+import export
+from export import decode_cursor, encode_cursor, iter_sessions_export, parse_since
+
+
+def _session(session_id, day, updated="2025-01-01T00:00:00"):
+    return {"session_id": session_id, "opening_date": f"2025-03-{day:02d}T18:00:00",
+            "title": f"Sessão {session_id}", "updated_at": updated}
+
+
+def _item(session_id, n, updated="2025-01-01T00:00:00"):
+    return {"external_id": session_id * 100 + n, "session_id": session_id, "order_number": n,
+            "content": f"Requerimento nº {n}/2025", "updated_at": updated}
+
+
+@pytest.fixture
+def sessions(supabase, monkeypatch):
+    supabase.max_rows = 3  # a pauta só chega inteira paginando
+    monkeypatch.setattr(export, "AGENDA_PAGE_SIZE", 3)
+    # Duas sessões no mesmo horário: o desempate do keyset é o session_id
+    supabase.tables["sessions"] = [_session(1, 3), _session(2, 5), _session(3, 5), _session(4, 10), _session(5, 12)]
+    supabase.tables["session_order_of_day"] = [_item(s, n) for s in range(1, 6) for n in range(1, 5)]
+    return supabase
+
+
+def _export(**kwargs):
+    return [json.loads(line) for line in iter_sessions_export(**kwargs)]
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2025-03-05T18:00:00", 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("2025-03-05T18:00:00", 42)
+    with pytest.raises(ValueError):
+        decode_cursor("não é cursor")
+
+
+def test_parse_since():
+    assert parse_since(None) is None
+    assert parse_since("2025-01-31T10:00:00Z") == "2025-01-31T10:00:00Z"
+    with pytest.raises(ValueError):
+        parse_since("31/01/2025")
+
+
+def test_export_pages_sessions_and_agendas(sessions):
+    lines = _export(page_size=2)
+    assert [s["session_id"] for s in lines] == [1, 2, 3, 4, 5]
+    assert all([i["order_number"] for i in s["ordem_dia"]] == [1, 2, 3, 4] for s in lines)
+
+
+def test_resume_from_cursor(sessions):
+    lines = _export(page_size=2)
+    resumed = _export(cursor=lines[1]["cursor"], page_size=2)  # parou no meio do empate de horário
+    assert [s["session_id"] for s in resumed] == [3, 4, 5]
+    assert resumed == lines[2:]
+
+
+def test_since_includes_sessions_with_changed_agenda(sessions):
+    sessions.tables["sessions"][3]["updated_at"] = "2025-04-01T00:00:00"  # sessão 4 alterada
+    sessions.tables["session_order_of_day"][5]["updated_at"] = "2025-04-02T00:00:00"  # item da sessão 2
+    lines = _export(since="2025-04-01", page_size=1)
+    assert [s["session_id"] for s in lines] == [2, 4]
+    assert len(lines[0]["ordem_dia"]) == 4
+
+
+def test_since_filters_are_bounded_by_the_page(supabase):
+    supabase.tables["sessions"] = [_session(i, 1 + i % 28) for i in range(1, 101)]
+    supabase.tables["session_order_of_day"] = [_item(i, 1, updated="2025-04-02T00:00:00") for i in range(1, 101)]
+    lines = _export(since="2025-04-01", page_size=10)
+    assert sorted(s["session_id"] for s in lines) == list(range(1, 101))
+    in_filters = [value for _, params in supabase.requests for column, value in params if column == "session_id"]
+    assert in_filters and all(value.count(",") < 10 for value in in_filters)
+
+
+def test_since_cursor_skips_unchanged_pages(sessions):
+    sessions.tables["sessions"][4]["updated_at"] = "2025-04-01T00:00:00"  # só a última sessão
+    lines = _export(since="2025-04-01", page_size=2)
+    assert [s["session_id"] for s in lines] == [5]
+    assert _export(since="2025-04-01", cursor=lines[0]["cursor"]) == []
+
+
+def test_since_without_changes(sessions):
+    assert _export(since="2025-04-01") == []
+
+
+def test_error_mid_stream_returns_resume_cursor(sessions, monkeypatch):
+    fetch = export._fetch_sessions_page
+    calls = []
+
+    def flaky(*args):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("conexão perdida")
+        return fetch(*args)
+
+    monkeypatch.setattr(export, "_fetch_sessions_page", flaky)
+    lines = _export(page_size=2)
+    assert lines[-1]["error"] == "Exportação interrompida"
+    assert decode_cursor(lines[-1]["cursor"]) == ("2025-03-05T18:00:00", 2)
@@ -0,0 +1,65 @@
+"""
+Testes do leitor incremental de arrays JSON (fast_json.iter_array)
+O corpo é cortado em todas as posições, inclusive no meio de caracteres UTF-8
+"""
+import json
+import random
+
+import pytest
+
+import fast_json
+from fast_json import iter_array
+
+ROWS = [
+    {"session_id": 1, "title": "Sessão Ordinária", "ementa": "Dispõe sobre a criação do conselho — \"aspas\""},
+    {"session_id": 2, "ordem": [1, 2, {"x": None}], "vazio": {}},
+    [],
+    {"texto": "emoji 🗳️ e acentuação: ção, ã, é", "n": -1.5e3, "ok": True},
+]
+BODY = json.dumps(ROWS, ensure_ascii=False, indent=1).encode()
+
+
+def _chunks(data, sizes):
+    pos = 0
+    for size in sizes:
+        yield data[pos:pos + size]
+        pos += size
+    yield data[pos:]
+
+
+def test_every_split_point():
+    for cut in range(1, len(BODY)):
+        assert list(iter_array([BODY[:cut], BODY[cut:]])) == ROWS, cut
+
+
+def test_byte_by_byte_and_random_chunks():
+    assert list(iter_array(BODY[i:i + 1] for i in range(len(BODY)))) == ROWS
+    rng = random.Random(7)
+    for _ in range(50):
+        sizes = [rng.randint(0, 9) for _ in range(len(BODY))]
+        assert list(iter_array(_chunks(BODY, sizes))) == ROWS
+
+
+def test_buffer_is_compacted_on_long_arrays(monkeypatch):
+    monkeypatch.setattr(fast_json, "_COMPACT_AT", 64)
+    rows = [{"i": i, "texto": "á" * (i % 5)} for i in range(500)]
+    body = json.dumps(rows, ensure_ascii=False).encode()
+    assert list(iter_array(body[i:i + 13] for i in range(0, len(body), 13))) == rows
+
+
+def test_elements_are_yielded_before_the_body_ends():
+    def chunks():
+        yield b'[{"a": 1},'
+        raise AssertionError("leu além do necessário")
+
+    assert next(iter_array(chunks())) == {"a": 1}
+
+
+@pytest.mark.parametrize("body", [b"", b"[", b'[{"a": 1}', b'[{"a": 1},{"b"', b'{"a": 1}'])
+def test_truncated_or_invalid_body_raises(body):
+    with pytest.raises(ValueError):
+        list(iter_array([body]))
+
+
+def test_empty_array():
+    assert list(iter_array([b" [ ", b"\n] "])) == []
@@ -0,0 +1,155 @@
+"""
+Testes do profiling sob demanda (profiling.py)
+Etapas @timed, formatos de saída, rotação dos arquivos e acesso a /debug/profiles
+"""
+import json
+import os
+import time
+from collections import Counter
+
+import pytest
+
+import profiling
+from profiling import load_profile, timed, to_collapsed, to_speedscope
+
+TOKEN = "token-de-teste"
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", TOKEN)
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0)
+    monkeypatch.setattr(profiling, "_slowest", [])
+    monkeypatch.setattr(profiling, "_requested", profiling.deque())
+
+
+@timed("interna")
+def _inner():
+    time.sleep(0.002)
+    return "ok"
+
+
+@timed("externa")
+def _outer():
+    return _inner()
+
+
+def _profiled_request(requested=True, path="/api/teste"):
+    profiling.start_request(requested)
+    _outer()
+    return profiling.finish_request("GET", path, 200, 10, 40)
+
+
+def test_timed_records_nested_spans():
+    record = _profiled_request(requested=False)
+    assert [s["name"] for s in record["spans"]] == ["interna", "externa"]  # fecha primeiro a interna
+    inner, outer = record["spans"]
+    assert outer["start_ms"] <= inner["start_ms"]
+    assert inner["duration_ms"] <= outer["duration_ms"] <= record["wall_ms"]
+    assert (record["bytes"], record["bytes_uncompressed"]) == (10, 40)
+    assert record["profiled"] is False
+
+
+def test_timed_without_request_just_calls():
+    assert _outer() == "ok"
+
+
+def test_to_collapsed():
+    stacks = Counter({
+        (("main", "server.py", 1), ("resumo", "server.py", 10)): 3,
+        (("main", "server.py", 1),): 1,
+    })
+    assert to_collapsed(stacks) == "main (server.py:1);resumo (server.py:10) 3\nmain (server.py:1) 1\n"
+
+
+def test_to_speedscope_has_samples_and_balanced_events():
+    profiling.start_request(True)
+    profile = profiling._current.get()
+    profile.sampler.stop()
+    profile.sampler.stacks = Counter({(("main", "server.py", 1), ("resumo", "server.py", 10)): 2})
+    profile.spans = [
+        {"name": "externa", "start_ms": 0.0, "duration_ms": 10.0},
+        {"name": "interna", "start_ms": 2.0, "duration_ms": 3.0},
+    ]
+    profiling._current.set(None)
+
+    data = to_speedscope(profile, {"method": "GET", "path": "/api/x", "wall_ms": 12.0})
+    frames = [f["name"] for f in data["shared"]["frames"]]
+    sampled, evented = data["profiles"]
+    assert sampled["samples"] == [[frames.index("main"), frames.index("resumo")]]
+    assert sampled["weights"] == [2 * profiling.PROFILE_INTERVAL_MS]
+    assert [(e["type"], frames[e["frame"]]) for e in evented["events"]] == [
+        ("O", "externa"), ("O", "interna"), ("C", "interna"), ("C", "externa")
+    ]
+
+
+def test_requested_profile_is_written_and_loadable():
+    record = _profiled_request()
+    assert record["profiled"] and record["requested"]
+    assert json.loads(load_profile(record["id"], "speedscope"))["name"] == "GET /api/teste"
+    assert load_profile(record["id"], "collapsed") is not None
+
+
+@pytest.mark.parametrize("profile_id, fmt", [
+    ("../../etc/passwd", "collapsed"),
+    ("0" * 31, "speedscope"),
+    ("A" * 32, "speedscope"),
+    ("0" * 32, "svg"),
+    ("0" * 32, "speedscope"),  # formato válido, arquivo inexistente
+])
+def test_load_profile_rejects_invalid_ids(profile_id, fmt):
+    assert load_profile(profile_id, fmt) is None
+
+
+def test_requested_profiles_are_rotated(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_KEEP_REQUESTED", 2)
+    monkeypatch.setattr(profiling, "PROFILE_KEEP_SLOWEST", 1)
+    records = [_profiled_request(path=f"/api/{i}") for i in range(4)]
+
+    kept = {r["id"] for r in profiling._requested} | {r["id"] for r in profiling.slowest()}
+    assert {r["id"] for r in records[2:]} <= kept
+    files = {name.split(".")[0] for name in os.listdir(tmp_path)}
+    assert files == kept
+    assert len(files) <= 3
+
+
+def test_sampled_profile_is_discarded_when_not_slow(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_KEEP_SLOWEST", 1)
+    profiling._slowest.append((10 ** 6, "f" * 32, {"id": "f" * 32, "profiled": False}))
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    _profiled_request(requested=False)
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.fixture
+def client():
+    import server
+    return server.app.test_client()
+
+
+def test_debug_profiles_require_token(client):
+    assert client.get("/debug/profiles").status_code == 401
+    assert client.get("/debug/profiles", headers={"X-Profile-Token": "errado"}).status_code == 401
+    assert client.get("/debug/profiles/" + "0" * 32, headers={"X-Profile-Token": "errado"}).status_code == 401
+
+
+def test_profile_round_trip_through_server(client):
+    response = client.get("/health", headers={"X-Profile": "1", "X-Profile-Token": TOKEN})
+    assert "cpu;dur=" in response.headers["Server-Timing"]
+    profile_id = response.headers["X-Profile-Id"]
+
+    headers = {"X-Profile-Token": TOKEN}
+    listed = client.get("/debug/profiles", headers=headers).get_json()["slowest"]
+    assert profile_id in [r["id"] for r in listed]
+    speedscope = client.get(f"/debug/profiles/{profile_id}", headers=headers)
+    assert speedscope.status_code == 200 and speedscope.get_json()["name"] == "GET /health"
+    collapsed = client.get(f"/debug/profiles/{profile_id}?format=collapsed", headers=headers)
+    assert collapsed.mimetype == "text/plain"
+    assert client.get("/debug/profiles/" + "0" * 32, headers=headers).status_code == 404
+
+
+def test_profile_request_without_valid_token_is_not_profiled(client):
+    response = client.get("/health", headers={"X-Profile": "1", "X-Profile-Token": "errado"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
@@ -0,0 +1,298 @@
+"""
+Testes do cache compartilhado (shared_cache.py)
+Cada teste usa um arquivo próprio em tmp_path; `shared=False` exercita o LRU local
+"""
+import threading
+import time
+from itertools import count
+from types import SimpleNamespace
+
+import pytest
+
+import shared_cache as shared_cache_module
+from shared_cache import GENERATION_LOCK_STRIPES, SharedCache, _key_hash
+
+
+@pytest.fixture(params=[True, False], ids=["mmap", "local"])
+def cache(request, tmp_path):
+    return SharedCache(str(tmp_path / "cache.bin"), slots=64, slot_size=1024, enabled=request.param)
+
+
+def _stripe(cache, key):
+    return _key_hash(cache._namespaced(key).encode()) % GENERATION_LOCK_STRIPES
+
+
+def _key_on_stripe(cache, prefix, stripe):
+    return next(f"{prefix}:{i}" for i in count() if _stripe(cache, f"{prefix}:{i}") == stripe)
+
+
+def _run_with_timeout(target, timeout=5):
+    """Executa em um thread e falha (em vez de travar a suíte) se não terminar"""
+    errors = []
+
+    def run():
+        try:
+            target()
+        except Exception as e:  # pragma: no cover - repassado abaixo
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "get_or_compute travou"
+    if errors:
+        raise errors[0]
+
+
+def test_nested_keys_on_same_stripe_do_not_deadlock(cache):
+    outer = "resumo:ultimo_dia"
+    inner = _key_on_stripe(cache, "supabase:ultimo_dia", _stripe(cache, outer))
+    results = {}
+
+    def run():
+        results["outer"] = cache.get_or_compute(
+            outer, lambda: {"inner": cache.get_or_compute(inner, lambda: [1, 2], 60)}, 60
+        )
+
+    _run_with_timeout(run)
+    assert results["outer"] == {"inner": [1, 2]}
+    assert cache.get(outer) == {"inner": [1, 2]}
+    assert cache.get(inner) == [1, 2]
+
+
+def test_nested_generation_in_opposite_order_does_not_deadlock(cache, monkeypatch):
+    monkeypatch.setattr(shared_cache_module, "NESTED_GENERATION_WAIT", 0.2)
+    key_a = "a:0"
+    key_b = _key_on_stripe(cache, "b", (_stripe(cache, key_a) + 1) % GENERATION_LOCK_STRIPES)
+    both_outer = threading.Barrier(2)
+
+    def nested(outer, inner):
+        def compute():
+            both_outer.wait(timeout=5)  # cada thread já detém o stripe externo
+            return cache.get_or_compute(inner, lambda: "valor", 60)
+        return lambda: cache.get_or_compute(outer, compute, 60)
+
+    threads = [
+        threading.Thread(target=nested(key_a, key_b), daemon=True),
+        threading.Thread(target=nested(key_b, key_a), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert not any(thread.is_alive() for thread in threads)
+    assert cache.get(key_a) == cache.get(key_b) == "valor"
+
+
+def test_generation_lock_released_after_nested_reentry(cache):
+    outer = "resumo:hoje"
+    inner = _key_on_stripe(cache, "supabase:hoje", _stripe(cache, outer))
+    _run_with_timeout(lambda: cache.get_or_compute(outer, lambda: cache.get_or_compute(inner, lambda: 1, 60), 60))
+
+    # Outro thread consegue gerar no mesmo stripe depois
+    _run_with_timeout(lambda: cache.get_or_compute(_key_on_stripe(cache, "outra", _stripe(cache, outer)),
+                                                   lambda: 2, 60))
+    assert cache.get(outer) == 1
+
+
+# ----------------------------------------------------------------------
+# Leitura, gravação e despejo
+# ----------------------------------------------------------------------
+
+class FakeClock:
+    """time.time controlado: cada chamada avança 1 ms (acessos sempre ordenados)"""
+
+    def __init__(self, start=1_000_000.0):
+        self.now = start
+
+    def __call__(self):
+        self.now += 0.001
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(shared_cache_module, "time",
+                        SimpleNamespace(time=fake, sleep=time.sleep, monotonic=time.monotonic))
+    return fake
+
+
+def _keys_in_same_set(cache, n):
+    by_set = {}
+    for i in count():
+        key = f"chave:{i}"
+        bucket = by_set.setdefault(cache._set_index(_key_hash(cache._namespaced(key).encode())), [])
+        bucket.append(key)
+        if len(bucket) == n:
+            return bucket
+
+
+def test_round_trip(cache):
+    value = {"texto_alexa": "Sessão ordinária — pauta com 3 itens", "itens": [1, 2.5, None, True]}
+    assert cache.get("resumo:x") is None
+    assert cache.put("resumo:x", value, 60)
+    assert cache.get("resumo:x") == value
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_put_overwrites_same_key(cache):
+    cache.put("k", 1, 60)
+    cache.put("k", 2, 60)
+    assert cache.get("k") == 2
+
+
+def test_expired_entry_is_a_miss(cache, clock):
+    cache.put("k", "valor", 10)
+    assert cache.get("k") == "valor"
+    clock.now += 11
+    assert cache.get("k") is None
+
+
+def test_value_larger_than_slot_is_rejected(cache):
+    assert not cache.put("grande", "x" * 2000, 60)
+    assert cache.get("grande") is None
+
+
+def test_cache_if_skips_falsy_results(cache):
+    assert cache.get_or_compute("vazio", lambda: [], 60, cache_if=bool) == []
+    assert cache.get("vazio") is None
+    calls = []
+    cache.get_or_compute("cheio", lambda: calls.append(1) or [1], 60, cache_if=bool)
+    cache.get_or_compute("cheio", lambda: calls.append(1) or [1], 60, cache_if=bool)
+    assert calls == [1]
+
+
+def test_entries_are_visible_to_other_processes(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    writer = SharedCache(path, slots=64, slot_size=1024)
+    reader = SharedCache(path, slots=64, slot_size=1024)  # outro worker, mesmo arquivo
+    writer.put("resumo:hoje", {"n": 1}, 60)
+    assert reader.get("resumo:hoje") == {"n": 1}
+
+
+def test_layout_change_recreates_file(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    SharedCache(path, slots=64, slot_size=1024).put("k", 1, 60)
+    resized = SharedCache(path, slots=64, slot_size=2048)
+    assert resized.get("k") is None
+    resized.put("k", 2, 60)
+    assert resized.get("k") == 2
+
+
+def test_lru_eviction_within_set(tmp_path, clock):
+    cache = SharedCache(str(tmp_path / "cache.bin"), slots=64, slot_size=1024)
+    keys = _keys_in_same_set(cache, cache.ways + 1)
+    for key in keys[:cache.ways]:
+        cache.put(key, key, 60)
+    cache.get(keys[0])  # keys[1] passa a ser o menos usado
+    cache.put(keys[-1], keys[-1], 60)
+
+    assert cache.get(keys[1]) is None
+    for key in [keys[0], *keys[2:]]:
+        assert cache.get(key) == key
+
+
+def test_expired_slot_is_reused_before_lru(tmp_path, clock):
+    cache = SharedCache(str(tmp_path / "cache.bin"), slots=64, slot_size=1024)
+    keys = _keys_in_same_set(cache, cache.ways + 1)
+    for i, key in enumerate(keys[:cache.ways]):
+        cache.put(key, key, 5 if i == 2 else 60)
+    clock.now += 10
+    cache.put(keys[-1], keys[-1], 60)
+    assert all(cache.get(key) == key for key in [*keys[:2], keys[3], keys[-1]])
+
+
+def test_local_cache_evicts_least_recently_used(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.bin"), slots=8, slot_size=1024, enabled=False)
+    for i in range(8):
+        cache.put(f"k{i}", i, 60)
+    cache.get("k0")
+    cache.put("k8", 8, 60)
+    assert cache.get("k1") is None
+    assert cache.get("k0") == 0 and cache.get("k8") == 8
+
+
+# ----------------------------------------------------------------------
+# Seqlock
+# ----------------------------------------------------------------------
+
+class RacingSeq:
+    """
+    Substitui SEQ: na conferência após a cópia, finge que um escritor terminou
+    uma gravação no meio da leitura (seq avançou) nas primeiras `races` vezes
+    """
+
+    def __init__(self, real, races):
+        self.real = real
+        self.races = races
+        self.reads = 0
+
+    def unpack_from(self, buffer, offset=0):
+        self.reads += 1
+        seq = self.real.unpack_from(buffer, offset)
+        if self.reads % 2 == 0 and self.races:
+            self.races -= 1
+            return (seq[0] + 2,)
+        return seq
+
+    def pack_into(self, *args):
+        return self.real.pack_into(*args)
+
+
+def test_torn_read_is_retried(tmp_path, monkeypatch):
+    cache = SharedCache(str(tmp_path / "cache.bin"), slots=64, slot_size=1024)
+    cache.put("k", {"v": 1}, 60)
+    racing = RacingSeq(shared_cache_module.SEQ, races=1)
+    monkeypatch.setattr(shared_cache_module, "SEQ", racing)
+
+    assert cache.get("k") == {"v": 1}
+    assert racing.reads >= 4  # uma leitura descartada e uma consistente
+
+
+def test_read_gives_up_while_slot_is_being_written(tmp_path, monkeypatch):
+    cache = SharedCache(str(tmp_path / "cache.bin"), slots=64, slot_size=1024)
+    cache.put("k", {"v": 1}, 60)
+    monkeypatch.setattr(shared_cache_module, "SEQ", RacingSeq(shared_cache_module.SEQ, races=1000))
+
+    assert cache.get("k") is None  # nunca devolve dados de uma escrita pela metade
+
+
+def test_odd_sequence_means_write_in_progress(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.bin"), slots=64, slot_size=1024)
+    cache.put("k", "v", 60)
+    set_index = cache._set_index(_key_hash(cache._namespaced("k").encode()))
+    offset = next(
+        cache._slot_offset(set_index, way) for way in range(cache.ways)
+        if shared_cache_module.SLOT_HEADER.unpack_from(cache._map, cache._slot_offset(set_index, way))[1]
+    )
+    seq = shared_cache_module.SEQ.unpack_from(cache._map, offset)[0]
+    shared_cache_module.SEQ.pack_into(cache._map, offset, seq + 1)
+    assert cache.get("k") is None
+    shared_cache_module.SEQ.pack_into(cache._map, offset, seq + 2)
+    assert cache.get("k") == "v"
+
+
+def test_shared_cached_decorator_and_refresh(tmp_path, monkeypatch):
+    cache = SharedCache(str(tmp_path / "cache.bin"), slots=64, slot_size=1024)
+    monkeypatch.setattr(shared_cache_module, "shared_cache", cache)
+    calls = []
+
+    @shared_cache_module.shared_cached("teste", 60)
+    def fetch(days, limit=5):
+        calls.append((days, limit))
+        return len(calls)
+
+    assert fetch(1, limit=5) == 1
+    assert fetch(1, limit=5) == 1
+    assert cache.get("teste:1:limit=5") == 1
+    assert fetch.refresh(1, limit=5) == 2
+    assert fetch(1, limit=5) == 2
+    assert calls == [(1, 5), (1, 5)]
+
+
+def test_get_or_compute_counts_one_access(cache):
+    cache.get_or_compute("frio", lambda: 1, 60)
+    assert (cache.hits, cache.misses) == (0, 1)
+    cache.get_or_compute("frio", lambda: 1, 60)
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,25 @@
+"""
+Testes das datas faladas (speech_dates.py)
+"""
+from datetime import date
+
+import pytest
+
+from speech_dates import speakable_date
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2025-01-06", "6 de janeiro de 2025"),
+    ("2025-03-10T18:30:00Z", "10 de março de 2025"),
+    ("2025-12-31T23:59:00-03:00", "31 de dezembro de 2025"),
+    (date(2025, 7, 1), "1 de julho de 2025"),
+    ("", "data não informada"),
+    (None, "data não informada"),
+    ("10/03/2025", "data não informada"),
+])
+def test_speakable_date(value, expected):
+    assert speakable_date(value) == expected
+
+
+def test_without_year():
+    assert speakable_date("2025-03-05", with_year=False) == "5 de março"
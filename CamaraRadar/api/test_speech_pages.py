@@ -0,0 +1,61 @@
+"""
+Testes do modo de fala paginado (speech_pages.py)
+Limites dos trechos e retomada pelo cursor
+"""
+import pytest
+
+import speech_pages
+from speech_pages import get_page, split_into_chunks
+
+
+def _words(chunks):
+    return " ".join(chunks).split()
+
+
+def test_sentences_are_grouped_up_to_the_limit():
+    sentences = ["Primeira frase.", "Segunda frase.", "Terceira frase maior."]
+    assert split_into_chunks(sentences, max_chars=30) == ["Primeira frase. Segunda frase.", "Terceira frase maior."]
+    assert split_into_chunks(sentences, max_chars=29) == ["Primeira frase.", "Segunda frase.", "Terceira frase maior."]
+
+
+def test_long_sentence_is_split_at_word_boundaries():
+    sentence = "Item 1: " + " ".join(f"palavra{i}" for i in range(60)) + "."
+    chunks = split_into_chunks([sentence, "Resultado: aprovado."], max_chars=50)
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert _words(chunks) == (sentence + " Resultado: aprovado.").split()
+
+
+def test_word_longer_than_limit_is_not_lost():
+    sentence = "Ementa: " + "x" * 25 + " fim-de-linha"
+    chunks = split_into_chunks([sentence], max_chars=10)
+    assert all(len(chunk) <= 10 for chunk in chunks)
+    assert "".join(chunks).replace(" ", "") == sentence.replace(" ", "")
+
+
+def test_empty_input():
+    assert split_into_chunks([]) == []
+
+
+def test_cursor_walks_every_page(monkeypatch):
+    sessions = [{"type": "Ordinária", "opening_date": "2025-03-10T18:00:00", "ordem_dia": [
+        {"ementa": f"Ementa do item {i} " + "com bastante texto " * 15, "result": "Aprovado"} for i in range(1, 9)
+    ]}]
+    monkeypatch.setattr(speech_pages, "get_last_day_sessions", lambda: sessions)
+    monkeypatch.setattr(speech_pages, "lookup_materia", lambda item: None)
+
+    page = speech_pages.get_single_day_paginated()
+    assert page["date"] == "2025-03-10"
+    texts = [page["texto_alexa"]]
+    while page["cursor"]:
+        assert page["texto_alexa"].endswith(speech_pages.CONTINUE_PROMPT)
+        page = get_page(page["cursor"])
+        texts.append(page["texto_alexa"])
+
+    assert page["pagina"] == page["total_paginas"] == len(texts) > 2
+    assert "10 de março de 2025" in texts[0]
+    assert "Ementa do item 8" in texts[-1]
+
+
+@pytest.mark.parametrize("cursor", ["", "sem-indice", "token.x", "token.0", None])
+def test_invalid_or_expired_cursor(cursor):
+    assert get_page(cursor) is None
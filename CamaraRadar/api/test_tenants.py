@@ -0,0 +1,159 @@
+"""
+Testes do suporte a várias câmaras (tenants.py)
+Escolha da câmara, limite de concorrência entre workers e partições do cache
+"""
+import os
+import threading
+
+import pytest
+
+import tenants
+from shared_cache import SharedCache, _key_hash
+from tenants import ConcurrencySlots, Tenant, TenantMiddleware, bind_tenant, current_tenant, use_tenant
+
+
+@pytest.fixture
+def slots(tmp_path):
+    return ConcurrencySlots(str(tmp_path / "slots.lock"), 2)
+
+
+def test_slots_limit_within_process(slots):
+    first, second = slots.try_acquire(), slots.try_acquire()
+    assert {first, second} == {0, 1}
+    assert slots.try_acquire() is None
+    slots.release(first)
+    assert slots.try_acquire() == first
+
+
+def test_release_is_idempotent(slots):
+    slot = slots.try_acquire()
+    slots.release(slot)
+    slots.release(slot)
+    assert {slots.try_acquire(), slots.try_acquire()} == {0, 1}
+    assert slots.try_acquire() is None
+
+
+@pytest.mark.skipif(not hasattr(os, "fork") or tenants.fcntl is None, reason="requer fork e fcntl")
+def test_slots_are_shared_between_workers(slots):
+    holding, release = os.pipe(), os.pipe()
+    pid = os.fork()
+    if pid == 0:  # outro worker do gunicorn: ocupa uma vaga até ser avisado
+        try:
+            slot = slots.try_acquire()
+            os.write(holding[1], b"1" if slot is not None else b"0")
+            os.read(release[0], 1)
+        finally:
+            os._exit(0)
+
+    assert os.read(holding[0], 1) == b"1"
+    assert slots.try_acquire() is not None
+    assert slots.try_acquire() is None  # a outra vaga é do outro processo
+
+    os.write(release[1], b"x")
+    os.waitpid(pid, 0)  # processo encerrado: o sistema libera a vaga dele
+    assert slots.try_acquire() is not None
+
+
+def test_threads_do_not_share_a_slot(slots):
+    results = []
+    barrier = threading.Barrier(4)
+
+    def acquire():
+        barrier.wait()
+        results.append(slots.try_acquire())
+
+    threads = [threading.Thread(target=acquire) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(r for r in results if r is not None) == [0, 1]
+    assert results.count(None) == 2
+
+
+def test_server_returns_429_at_limit(tmp_path, monkeypatch):
+    import server
+    tenant = current_tenant()
+    monkeypatch.setattr(tenant, "requests_slots", ConcurrencySlots(str(tmp_path / "s.lock"), 1))
+    client = server.app.test_client()
+    assert client.get("/health").status_code == 200  # vaga devolvida ao fim da requisição
+
+    held = tenant.requests_slots.try_acquire()
+    response = client.get("/health")
+    assert response.status_code == 429
+    assert "texto_alexa" in response.get_json()
+    tenant.requests_slots.release(held)
+    assert client.get("/health").status_code == 200
+
+
+# ----------------------------------------------------------------------
+# Escolha da câmara
+# ----------------------------------------------------------------------
+
+@pytest.fixture
+def two_tenants(monkeypatch):
+    a = Tenant({"slug": "cidade-a", "name": "Câmara A", "hosts": ["a.example.com"]}, 0)
+    b = Tenant({"slug": "cidade-b", "name": "Câmara B"}, 1)
+    monkeypatch.setattr(tenants, "TENANTS", {"cidade-a": a, "cidade-b": b})
+    monkeypatch.setattr(tenants, "_by_host", {"a.example.com": a})
+    monkeypatch.setattr(tenants, "_default_tenant", b)
+    return a, b
+
+
+def test_resolve_by_path_prefix_and_host(two_tenants):
+    a, b = two_tenants
+    assert tenants.resolve_tenant("", "/cidade-a/api/resumo") == (a, "/cidade-a", "/api/resumo")
+    assert tenants.resolve_tenant("a.example.com:443", "/api/resumo") == (a, "", "/api/resumo")
+    assert tenants.resolve_tenant("outro.example.com", "/api/resumo") == (b, "", "/api/resumo")
+    assert tenants.resolve_tenant("", "/cidade-b") == (b, "/cidade-b", "/")
+
+
+def test_middleware_moves_prefix_to_script_name(two_tenants):
+    seen = {}
+
+    def app(environ, start_response):
+        seen.update(environ)
+        return []
+
+    TenantMiddleware(app)({"PATH_INFO": "/cidade-a/api/presenca", "SCRIPT_NAME": ""}, None)
+    assert seen["camara_radar.tenant"] == "cidade-a"
+    assert (seen["SCRIPT_NAME"], seen["PATH_INFO"]) == ("/cidade-a", "/api/presenca")
+
+
+def test_bind_tenant_carries_tenant_to_other_threads(two_tenants):
+    a, _ = two_tenants
+    seen = []
+    with use_tenant(a):
+        task = bind_tenant(lambda: seen.append(current_tenant().slug))
+    thread = threading.Thread(target=task)
+    thread.start()
+    thread.join()
+    assert seen == ["cidade-a"]
+
+
+def test_cache_partitions_are_sized_and_isolated(two_tenants, tmp_path):
+    a, b = two_tenants
+    cache = SharedCache(str(tmp_path / "cache.bin"), slots=64, slot_size=1024,
+                        partitions={"cidade-a": 32, "cidade-b": 128})
+    assert cache.sets * cache.ways == 160
+    assert cache.stats()["partitions"] == {"cidade-a": 32, "cidade-b": 128}
+
+    with use_tenant(a):
+        sets_a = {cache._set_index(_key_hash(f"k{i}".encode())) for i in range(500)}
+        cache.put("resumo:hoje", "A", 60)
+    with use_tenant(b):
+        sets_b = {cache._set_index(_key_hash(f"k{i}".encode())) for i in range(500)}
+        assert cache.get("resumo:hoje") is None
+        cache.put("resumo:hoje", "B", 60)
+    with use_tenant(a):
+        assert cache.get("resumo:hoje") == "A"
+
+    assert sets_a == set(range(0, 8))
+    assert sets_b == set(range(8, 40))
+
+
+def test_cache_slots_from_tenant_config(two_tenants, tmp_path):
+    a, _ = two_tenants
+    a.cache_slots = 16
+    cache = SharedCache(str(tmp_path / "cache.bin"), slots=64, slot_size=1024)
+    assert cache.stats()["partitions"] == {"cidade-a": 16, "cidade-b": 64}
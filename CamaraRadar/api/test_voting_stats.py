@@ -0,0 +1,94 @@
+"""
+Testes das estatísticas de votação (voting_stats.py)
+Normalização do resultado, tipo de matéria (parser de materias.py) e agregados
+"""
+import pytest
+
+import voting_stats
+from materias import matter_type, parse_identification, speakable_label
+from voting_stats import VotingStats, normalize_result
+
+
+@pytest.mark.parametrize("text, category", [
+    ("Aprovado", "aprovado"),
+    ("APROVADO POR UNANIMIDADE", "aprovado"),
+    ("Rejeitado o pedido de adiamento", "rejeitado"),
+    ("Não aprovado", "rejeitado"),
+    ("Retirado de pauta", "retirado"),
+    ("Adiado por 2 sessões", "adiado"),
+    ("Pedido de vista", "pedido_de_vista"),
+    ("Prejudicado", "prejudicado"),
+    ("Lido em plenário", "outro"),
+    ("-", "sem_resultado"),
+    (None, "sem_resultado"),
+])
+def test_normalize_result(text, category):
+    assert voting_stats.RESULT_CATEGORIES[normalize_result(text)] == category
+
+
+@pytest.mark.parametrize("content, expected", [
+    ("Requerimento nº 12/2025", "Requerimento"),
+    ("REQUERIMENTO Nº 5/2025", "Requerimento"),
+    ("Projeto de Lei n. 7 / 2024", "Projeto de lei"),
+    ("Projeto de Lei do Plano Diretor nº 3/2025", "Projeto de lei do plano diretor"),
+    ("PLO 12/2025", "Projeto de lei ordinária"),
+    ("Moção 4", "Moção"),
+    ("PPL 3/2025", "PPL"),
+    ("Ata da sessão anterior", "Outros"),
+    (None, "Outros"),
+])
+def test_matter_type(content, expected):
+    assert matter_type(content) == expected
+
+
+def test_number_marker_is_a_word_of_its_own():
+    assert parse_identification("Projeto de Lei do Plano Diretor nº 3/2025") == \
+        ("Projeto de Lei do Plano Diretor", 3, "2025")
+    assert parse_identification("Indicação no 45/2025") == ("Indicação", 45, "2025")
+
+
+def test_speakable_label_expands_acronyms_and_needs_year():
+    assert speakable_label("PLO 012/2025") == "Projeto de Lei Ordinária 12 de 2025"
+    assert speakable_label("Requerimento nº 345/2025 - Solicita...") == "Requerimento 345 de 2025"
+    assert speakable_label("Moção 4") is None
+
+
+def _row(external_id, content, result, month="2025-03"):
+    return {"external_id": external_id, "content": content, "result": result,
+            "data_ordem": f"{month}-10", "updated_at": f"{month}-10T20:00:{external_id:02d}"}
+
+
+@pytest.fixture
+def stats(supabase, monkeypatch):
+    monkeypatch.setattr(voting_stats, "STATS_PAGE_SIZE", 2)
+    supabase.tables["session_order_of_day"] = [
+        _row(1, "PLO 1/2025", "Aprovado"),
+        _row(2, "Projeto de Lei Ordinária nº 2/2025", "Rejeitado"),
+        _row(3, "Requerimento nº 3/2025", "Aprovado", month="2025-04"),
+        _row(4, "Projeto de Lei do Plano Diretor nº 3/2025", "Adiado", month="2025-04"),
+        _row(5, None, "-", month="2025-04"),
+    ]
+    stats = VotingStats(capacity=2)  # força o crescimento dos arrays
+    stats.refresh(force=True)
+    return stats
+
+
+def test_compute_groups_acronym_with_full_name(stats):
+    result = stats.compute()
+    assert result["total_itens"] == 5
+    assert result["taxa_aprovacao"] == round(2 / 3, 3)
+    top = result["por_tipo"][0]
+    assert (top["tipo"], top["total"], top["aprovados"], top["rejeitados"]) == ("Projeto de lei ordinária", 2, 1, 1)
+    assert {t["tipo"] for t in result["por_tipo"]} == {
+        "Projeto de lei ordinária", "Requerimento", "Projeto de lei do plano diretor", "Outros"}
+    assert [m["mes"] for m in result["por_mes"]] == ["2025-03", "2025-04"]
+
+
+def test_refresh_updates_changed_rows(stats, supabase):
+    supabase.tables["session_order_of_day"][3] = _row(4, "Projeto de Lei do Plano Diretor nº 3/2025", "Aprovado",
+                                                      month="2025-05")
+    stats.refresh(force=True)
+    result = stats.compute()
+    assert result["total_itens"] == 5
+    assert result["resultados"]["aprovado"] == 3
+    assert stats.compute(voting_stats._month_key("2025-05"))["total_itens"] == 1
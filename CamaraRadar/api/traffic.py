@@ -0,0 +1,100 @@
+"""
+Gravação do tráfego real para replay (ver replay.py)
+Com TRACE_RECORD_PATH definido, cada requisição vira uma linha TSV com horário, rota,
+status, duração, acertos/faltas no cache compartilhado, o intent pedido para a Alexa
+(nunca o corpo da requisição), o tempo de CPU e os bytes enviados. Vários workers podem gravar no mesmo arquivo: cada linha
+é escrita com um único write em modo append.
+"""
+import os
+import threading
+from typing import List, NamedTuple, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+TRACE_RECORD_PATH = os.environ.get("TRACE_RECORD_PATH")
+
+TRACE_HEADER = ("# camara-radar trace v2: ts method path status wall_ms cache_hits cache_misses tenant intent "
+                "cpu_ms bytes\n")
+NONE = "-"
+
+
+class TraceEntry(NamedTuple):
+    ts: float  # horário de início (epoch, segundos)
+    method: str
+    path: str  # caminho com query string, sem o prefixo da câmara
+    status: int
+    wall_ms: float
+    cache_hits: int
+    cache_misses: int
+    tenant: str
+    intent: Optional[str]  # intent ou tipo da requisição da Alexa
+    cpu_ms: Optional[float] = None  # ausente em traces v1
+    bytes_sent: Optional[int] = None  # corpo enviado (comprimido); ausente em streaming e em traces v1
+
+    def to_line(self) -> str:
+        return "\t".join([
+            f"{self.ts:.3f}", self.method, self.path, str(self.status), f"{self.wall_ms:.3f}",
+            str(self.cache_hits), str(self.cache_misses), self.tenant, self.intent or NONE,
+            NONE if self.cpu_ms is None else f"{self.cpu_ms:.3f}",
+            NONE if self.bytes_sent is None else str(self.bytes_sent),
+        ]) + "\n"
+
+    @classmethod
+    def from_line(cls, line: str) -> "TraceEntry":
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) == 9:  # trace v1, sem CPU e bytes
+            fields += [NONE, NONE]
+        ts, method, path, status, wall_ms, hits, misses, tenant, intent, cpu_ms, bytes_sent = fields
+        return cls(
+            float(ts), method, path, int(status), float(wall_ms),
+            int(hits), int(misses), tenant, None if intent == NONE else intent,
+            None if cpu_ms == NONE else float(cpu_ms),
+            None if bytes_sent == NONE else int(bytes_sent),
+        )
+
+
+class TraceRecorder:
+    """Grava TraceEntry em um arquivo compartilhado entre processos"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_open(self) -> None:
+        # Após o fork do gunicorn, cada worker abre seu próprio descritor
+        if self._pid == os.getpid():
+            return
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._pid = os.getpid()
+        if os.fstat(self._fd).st_size == 0:
+            os.write(self._fd, TRACE_HEADER.encode())
+
+    def record(self, entry: TraceEntry) -> None:
+        try:
+            with self._lock:
+                self._ensure_open()
+                os.write(self._fd, entry.to_line().encode())
+        except OSError as e:
+            logger.error(f"Could not record trace entry: {e}")
+
+
+def load_trace(path: str) -> List[TraceEntry]:
+    """Lê um arquivo de trace (ignora o cabeçalho e linhas malformadas)"""
+    entries = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if line.startswith("#") or not line.strip():
+                continue
+            try:
+                entries.append(TraceEntry.from_line(line))
+            except ValueError:
+                logger.warning(f"Skipping malformed trace line {number}")
+    entries.sort(key=lambda e: e.ts)
+    return entries
+
+
+trace_recorder = TraceRecorder(TRACE_RECORD_PATH) if TRACE_RECORD_PATH else None
@@ -0,0 +1,284 @@
+"""
+Estatísticas de resultados de votação (tabela session_order_of_day)
+Carrega os itens de pauta em arrays colunares (NumPy), normaliza o texto livre
+de `result` em códigos categóricos e calcula taxas com operações vetorizadas
+"""
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from materias import matter_type
+from supabase_rest import is_configured, supabase_stream
+from tenants import TenantLocal
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+STATS_REFRESH_SECONDS = int(os.environ.get("STATS_REFRESH_SECONDS", "300"))
+STATS_PAGE_SIZE = 1000
+
+# Categorias de resultado (o índice é o código guardado no array)
+RESULT_CATEGORIES = [
+    "sem_resultado", "aprovado", "rejeitado", "retirado",
+    "adiado", "pedido_de_vista", "prejudicado", "outro"
+]
+SEM_RESULTADO, APROVADO, REJEITADO = 0, 1, 2
+
+# Ordem importa: "rejeitado o pedido de adiamento" deve cair em rejeitado
+_RESULT_PATTERNS = [
+    (re.compile(r"rejeitad|reprovad|não aprovad|nao aprovad"), REJEITADO),
+    (re.compile(r"aprovad"), APROVADO),
+    (re.compile(r"retirad"), 3),
+    (re.compile(r"adiad|adiament"), 4),
+    (re.compile(r"vista"), 5),
+    (re.compile(r"prejudicad"), 6),
+]
+
+def normalize_result(text: Optional[str]) -> int:
+    """Converte o texto livre do resultado em código categórico"""
+    text = (text or "").strip().lower()
+    if not text or text == "-":
+        return SEM_RESULTADO
+    for pattern, code in _RESULT_PATTERNS:
+        if pattern.search(text):
+            return code
+    return len(RESULT_CATEGORIES) - 1
+
+
+def _month_key(date_str: Optional[str]) -> int:
+    """'2025-03-10' -> ano * 12 + (mês - 1); -1 se não houver data"""
+    if not date_str or len(date_str) < 7:
+        return -1
+    try:
+        return int(date_str[:4]) * 12 + int(date_str[5:7]) - 1
+    except ValueError:
+        return -1
+
+
+def _month_label(key: int) -> str:
+    return f"{key // 12:04d}-{key % 12 + 1:02d}"
+
+
+def _rate(numerator, denominator):
+    """Divisão vetorizada que devolve NaN quando o denominador é zero"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / np.maximum(denominator, 1), np.nan)
+
+
+class VotingStats:
+    """
+    Itens de pauta em arrays colunares com crescimento amortizado
+
+    Linhas novas ou alteradas são lidas por paginação (updated_at, external_id)
+    e gravadas no lugar pelo external_id, então a atualização é incremental.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self._lock = threading.Lock()
+        self._size = 0
+        self._result = np.zeros(capacity, dtype=np.int8)
+        self._type = np.zeros(capacity, dtype=np.int16)
+        self._month = np.full(capacity, -1, dtype=np.int32)
+        self._rows: Dict[int, int] = {}  # external_id -> posição nos arrays
+        self._types: List[str] = []
+        self._type_codes: Dict[str, int] = {}
+        self._result_memo: Dict[str, int] = {}
+        self._watermark: Optional[Tuple[str, int]] = None
+        self._last_refresh = 0.0
+        self._version = 0
+        self._computed: Dict[Optional[int], Tuple[int, Dict]] = {}
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._result)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self._result = np.resize(self._result, capacity)
+        self._type = np.resize(self._type, capacity)
+        month = np.full(capacity, -1, dtype=np.int32)
+        month[:self._size] = self._month[:self._size]
+        self._month = month
+
+    def _type_code(self, name: str) -> int:
+        code = self._type_codes.get(name)
+        if code is None:
+            code = len(self._types)
+            self._types.append(name)
+            self._type_codes[name] = code
+        return code
+
+    def _result_code(self, text: Optional[str]) -> int:
+        text = text or ""
+        code = self._result_memo.get(text)
+        if code is None:
+            code = normalize_result(text)
+            self._result_memo[text] = code
+        return code
+
+    def add_row(self, row: Dict) -> None:
+        """Insere ou atualiza uma linha (por external_id) nos arrays"""
+        external_id = row.get("external_id")
+        index = self._rows.get(external_id)
+        if index is None:
+            self._grow(self._size + 1)
+            index = self._size
+            self._size += 1
+            self._rows[external_id] = index
+        self._result[index] = self._result_code(row.get("result"))
+        self._type[index] = self._type_code(matter_type(row.get("content")))
+        self._month[index] = _month_key(row.get("data_ordem"))
+        self._version += 1
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Busca linhas novas ou alteradas desde a última leitura
+        Limitado a uma atualização a cada STATS_REFRESH_SECONDS
+        """
+        if not is_configured():
+            return
+        if not force and time.time() - self._last_refresh < STATS_REFRESH_SECONDS:
+            return
+
+        with self._lock:
+            if not force and time.time() - self._last_refresh < STATS_REFRESH_SECONDS:
+                return
+            try:
+                loaded = 0
+                while True:
+                    params = [
+                        ("select", "external_id,content,result,data_ordem,updated_at"),
+                        ("order", "updated_at.asc,external_id.asc"),
+                        ("limit", str(STATS_PAGE_SIZE)),
+                    ]
+                    if self._watermark:
+                        updated_at, external_id = self._watermark
+                        params.append(("or", f'(updated_at.gt."{updated_at}",and(updated_at.eq."{updated_at}",external_id.gt.{external_id}))'))
+
+                    # Cada linha vai direto para os arrays, sem montar a página em memória
+                    count, last = 0, None
+                    for row in supabase_stream("session_order_of_day", params):
+                        self.add_row(row)
+                        count, last = count + 1, row
+                    if last:
+                        self._watermark = (last["updated_at"], last["external_id"])
+                    loaded += count
+                    if count < STATS_PAGE_SIZE:
+                        break
+
+                if loaded:
+                    logger.info(f"Voting stats updated with {loaded} rows ({self._size} total)")
+                self._last_refresh = time.time()
+            except Exception as e:
+                logger.error(f"Error refreshing voting stats: {e}")
+
+    def compute(self, since_month: Optional[int] = None) -> Dict:
+        """
+        Calcula contagens por resultado, por tipo de matéria e por mês
+        O resultado fica em cache até a próxima alteração dos dados
+        """
+        cached = self._computed.get(since_month)
+        if cached and cached[0] == self._version:
+            return cached[1]
+
+        version = self._version
+        size = self._size
+        result = self._result[:size]
+        types = self._type[:size]
+        month = self._month[:size]
+
+        if since_month is not None:
+            mask = month >= since_month
+            result, types, month = result[mask], types[mask], month[mask]
+
+        approved = (result == APROVADO).astype(np.int64)
+        rejected = (result == REJEITADO).astype(np.int64)
+
+        counts = np.bincount(result, minlength=len(RESULT_CATEGORIES))
+        decided = int(counts[APROVADO] + counts[REJEITADO])
+
+        # Por tipo de matéria
+        n_types = len(self._types)
+        type_total = np.bincount(types, minlength=n_types)
+        type_approved = np.bincount(types, weights=approved, minlength=n_types)
+        type_rejected = np.bincount(types, weights=rejected, minlength=n_types)
+        type_rate = _rate(type_approved, type_approved + type_rejected)
+        order = np.argsort(-type_total, kind="stable")
+
+        # Por mês (ignora itens sem data)
+        dated = month >= 0
+        months, inverse = np.unique(month[dated], return_inverse=True)
+        month_total = np.bincount(inverse, minlength=len(months))
+        month_approved = np.bincount(inverse, weights=approved[dated], minlength=len(months))
+        month_rejected = np.bincount(inverse, weights=rejected[dated], minlength=len(months))
+        month_rate = _rate(month_approved, month_approved + month_rejected)
+
+        stats = {
+            "total_itens": int(len(result)),
+            "resultados": {name: int(counts[i]) for i, name in enumerate(RESULT_CATEGORIES)},
+            "taxa_aprovacao": round(int(counts[APROVADO]) / decided, 3) if decided else None,
+            "por_tipo": [
+                {
+                    "tipo": self._types[i],
+                    "total": int(type_total[i]),
+                    "aprovados": int(type_approved[i]),
+                    "rejeitados": int(type_rejected[i]),
+                    "taxa_aprovacao": None if np.isnan(type_rate[i]) else round(float(type_rate[i]), 3),
+                }
+                for i in order if type_total[i] > 0
+            ],
+            "por_mes": [
+                {
+                    "mes": _month_label(int(key)),
+                    "total": int(month_total[i]),
+                    "aprovados": int(month_approved[i]),
+                    "rejeitados": int(month_rejected[i]),
+                    "taxa_aprovacao": None if np.isnan(month_rate[i]) else round(float(month_rate[i]), 3),
+                }
+                for i, key in enumerate(months)
+            ],
+        }
+
+        self._computed[since_month] = (version, stats)
+        return stats
+
+
+voting_stats_by_tenant = TenantLocal(VotingStats)  # Uma instância por câmara
+
+
+def get_voting_statistics(desde: Optional[str] = None) -> Dict:
+    """
+    Estatísticas de votação da ordem do dia
+    desde: mês inicial no formato AAAA-MM (opcional)
+    """
+    since_month = None
+    if desde:
+        since_month = _month_key(desde)
+        if since_month < 0:
+            raise ValueError("Parâmetro 'desde' deve estar no formato AAAA-MM")
+
+    voting_stats = voting_stats_by_tenant.get()
+    voting_stats.refresh()
+    stats = voting_stats.compute(since_month)
+
+    if not stats["total_itens"]:
+        return {"texto_alexa": "Ainda não há resultados de votação registrados.", **stats}
+
+    resultados = stats["resultados"]
+    text = (
+        f"Foram analisados {stats['total_itens']} itens de pauta. "
+        f"{resultados['aprovado']} foram aprovados e {resultados['rejeitado']} rejeitados"
+    )
+    if stats["taxa_aprovacao"] is not None:
+        text += f", uma taxa de aprovação de {round(stats['taxa_aprovacao'] * 100)} por cento"
+    text += "."
+    if stats["por_tipo"]:
+        top = stats["por_tipo"][0]
+        text += f" O tipo de matéria mais frequente foi {top['tipo'].lower()}, com {top['total']} itens."
+
+    return {"texto_alexa": text, **stats}